@@ -1,48 +1,133 @@
 from flask_admin import Admin, expose, AdminIndexView
+from flask_admin.actions import action
 from flask_admin.contrib.sqla import ModelView
 from flask_login import current_user
-from flask import redirect, url_for
-from app import app, db
-from models import User, TrashPost
+from flask import flash, redirect, url_for
+from app import db
+from models import User, TrashPost, ArchivedPost, PlatformStats
+from cache import page_cache
+from feed import feed_hub
+import moderation
+import transitions
 
 class MyModelView(ModelView):
     def is_accessible(self):
         return current_user.is_authenticated and getattr(current_user, 'is_admin', False)
 
     def inaccessible_callback(self, name, **kwargs):
-        return redirect(url_for('login'))
+        return redirect(url_for('main.login'))
+
+    def after_model_change(self, form, model, is_created):
+        page_cache.invalidate_all()
+
+    def after_model_delete(self, model):
+        page_cache.invalidate_all()
+
+class UserView(MyModelView):
+    column_exclude_list = ('password_hash',)
+    column_searchable_list = ('username', 'email')
+    column_filters = ('user_type', 'is_suspended')
+    column_default_sort = ('created_at', True)
+    page_size = 50
+
+    def _delete(self, user_ids):
+        removed, post_ids, image_files = moderation.delete_users(user_ids)
+        db.session.commit()
+        moderation.discard_images(image_files)
+        feed_hub.posts_removed(post_ids, 'deleted')
+        page_cache.invalidate_all()
+        return removed
+
+    def delete_model(self, model):
+        # The ORM cascade would load and delete every post and review one row at a time.
+        return bool(self._delete([model.id]))
+
+    @action('delete', 'Delete', 'Delete the selected users and all of their posts?')
+    def action_delete(self, ids):
+        flash(f'{len(self._delete([int(i) for i in ids]))} user(s) deleted.', 'success')
+
+    @action('suspend', 'Suspend', 'Suspend the selected users?')
+    def action_suspend(self, ids):
+        changed = moderation.suspend_users([int(i) for i in ids])
+        db.session.commit()
+        flash(f'{len(changed)} user(s) suspended.', 'success')
+
+    @action('unsuspend', 'Unsuspend')
+    def action_unsuspend(self, ids):
+        changed = moderation.suspend_users([int(i) for i in ids], suspended=False)
+        db.session.commit()
+        flash(f'{len(changed)} user(s) unsuspended.', 'success')
+
+class TrashPostView(MyModelView):
+    column_filters = ('status', 'trash_type')
+    column_default_sort = ('created_at', True)
+    page_size = 50
+
+    def _delete(self, post_ids):
+        removed, image_files = moderation.delete_posts(post_ids)
+        db.session.commit()
+        moderation.discard_images(image_files)
+        feed_hub.posts_removed(removed, 'deleted')
+        page_cache.invalidate_posts(removed)
+        return removed
+
+    def delete_model(self, model):
+        return bool(self._delete([model.id]))
+
+    @action('delete', 'Delete', 'Delete the selected posts?')
+    def action_delete(self, ids):
+        flash(f'{len(self._delete([int(i) for i in ids]))} post(s) deleted.', 'success')
+
+    @action('expire', 'Mark expired', 'Take the selected posts off the marketplace?')
+    def action_expire(self, ids):
+        post_ids = [int(i) for i in ids]
+        expired = transitions.expire_posts(post_ids)
+        db.session.commit()
+        page_cache.invalidate_posts(post_ids)
+        feed_hub.posts_removed(post_ids, 'expired')
+        flash(f'{expired} post(s) marked expired.', 'success')
+
+class ArchivedPostView(MyModelView):
+    # History only; archive_posts.py is the one writer.
+    can_create = False
+    can_edit = False
+    can_delete = False
+    column_filters = ('status', 'trash_type')
+    column_default_sort = ('archived_at', True)
+    page_size = 50
 
 class MyAdminIndexView(AdminIndexView):
     @expose('/')
     def index(self):
-        total_users = User.query.count()
-        total_posts = TrashPost.query.count()
-        total_earnings = db.session.query(db.func.sum(TrashPost.price)).filter(TrashPost.status == 'completed').scalar() or 0.0
+        platform = PlatformStats.current()
 
         return self.render(
             'admin/dashboard.html',
-            total_users=total_users,
-            total_posts=total_posts,
-            total_earnings=f'{total_earnings:,.2f}'
+            total_users=platform.total_users,
+            total_posts=platform.total_posts,
+            total_earnings=f'{platform.total_sales:,.2f}'
         )
 
     def is_accessible(self):
         return current_user.is_authenticated and getattr(current_user, 'is_admin', False)
 
     def inaccessible_callback(self, name, **kwargs):
-        return redirect(url_for('login'))
+        return redirect(url_for('main.login'))
 
 
-admin = Admin(
-    app,
-    name='TrashToTreasure',
-    template_mode='bootstrap4',
-    index_view=MyAdminIndexView(
-        name="Dashboard",
-        template='admin/dashboard.html',
-        url='/admin'
+def init_admin(app):
+    admin = Admin(
+        app,
+        name='TrashToTreasure',
+        template_mode='bootstrap4',
+        index_view=MyAdminIndexView(
+            name="Dashboard",
+            template='admin/dashboard.html',
+            url='/admin'
+        )
     )
-)
 
-admin.add_view(MyModelView(User, db.session))
-admin.add_view(MyModelView(TrashPost, db.session))
\ No newline at end of file
+    admin.add_view(UserView(User, db.session))
+    admin.add_view(TrashPostView(TrashPost, db.session))
+    admin.add_view(ArchivedPostView(ArchivedPost, db.session, name='Archive'))
+    return admin
@@ -0,0 +1,274 @@
+import json
+from datetime import date, datetime
+from decimal import Decimal
+from functools import wraps
+from flask import Blueprint, abort, current_app, request
+from flask_login import current_user, login_user
+from werkzeug.exceptions import HTTPException
+from app import db
+from models import User, TrashPost, Review, Offer
+from pagination import page_args, keyset_paginate
+from search import search_posts
+from querycount import query_budget
+from geo import valid_coordinates
+from images import DEFAULT_IMAGE
+from variants import variant_url
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+api_v1 = Blueprint('api_v1', __name__, url_prefix='/api/v1')
+
+MAX_BATCH = 100
+
+
+def _default(value):
+    if isinstance(value, Decimal):
+        return str(value)
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    raise TypeError(f'{type(value).__name__} is not JSON serializable')
+
+
+def dumps(payload):
+    if orjson is not None:
+        return orjson.dumps(payload, default=_default)
+    return json.dumps(payload, default=_default, separators=(',', ':'), ensure_ascii=False).encode()
+
+
+def respond(payload, status=200):
+    return current_app.response_class(dumps(payload), status=status, mimetype='application/json')
+
+
+def error(message, status):
+    return respond({'error': message}, status)
+
+
+def _image(width):
+    def get(post):
+        if post.image_pending or post.image_file == DEFAULT_IMAGE:
+            return None
+        return variant_url(post.image_file, width)
+    return get
+
+
+def _owner(post):
+    return {'id': post.owner.id, 'username': post.owner.username, 'rating': post.owner.average_rating()}
+
+
+POST_FIELDS = {
+    'id': lambda p: p.id,
+    'trash_type': lambda p: p.trash_type,
+    'quantity': lambda p: p.quantity,
+    'price_per_kg': lambda p: p.price_per_kg,
+    'is_negotiable': lambda p: p.is_negotiable,
+    'location': lambda p: p.location,
+    'description': lambda p: p.description,
+    'status': lambda p: p.status,
+    'phone_number': lambda p: p.phone_number,
+    'google_map_link': lambda p: p.google_map_link,
+    'latitude': lambda p: p.latitude,
+    'longitude': lambda p: p.longitude,
+    'distance_km': lambda p: round(p.distance_km, 2) if hasattr(p, 'distance_km') else None,
+    'created_at': lambda p: p.created_at,
+    'updated_at': lambda p: p.updated_at,
+    'completed_at': lambda p: p.completed_at,
+    'final_weight_kg': lambda p: p.final_weight_kg,
+    'final_price_per_kg': lambda p: p.final_price_per_kg,
+    'total_transaction_value': lambda p: p.total_transaction_value,
+    'image_pending': lambda p: p.image_pending,
+    'image_url': _image(800),
+    'thumbnail_url': _image(200),
+    'owner': _owner,
+}
+DEFAULT_POST_FIELDS = ('id', 'trash_type', 'quantity', 'price_per_kg', 'location', 'status', 'created_at', 'thumbnail_url', 'owner')
+
+REVIEW_FIELDS = {
+    'id': lambda r: r.id,
+    'rating': lambda r: r.rating,
+    'comment': lambda r: r.comment,
+    'created_at': lambda r: r.created_at,
+    'post_id': lambda r: r.post_id,
+    'reviewer': lambda r: {'id': r.reviewer.id, 'username': r.reviewer.username},
+}
+DEFAULT_REVIEW_FIELDS = tuple(REVIEW_FIELDS)
+
+
+class FieldError(ValueError):
+    pass
+
+
+def requested_fields(available, default):
+    raw = request.args.get('fields')
+    if not raw:
+        return default
+    fields = tuple(dict.fromkeys(name.strip() for name in raw.split(',') if name.strip()))
+    unknown = [name for name in fields if name not in available]
+    if unknown:
+        raise FieldError(f"unknown field(s): {', '.join(unknown)}")
+    return fields
+
+
+def serialize(obj, fields, available):
+    return {name: available[name](obj) for name in fields}
+
+
+def serialize_posts(posts, fields=None):
+    fields = fields or requested_fields(POST_FIELDS, DEFAULT_POST_FIELDS)
+    return [serialize(post, fields, POST_FIELDS) for post in posts]
+
+
+def listing(items, next_cursor=None):
+    return {'data': items, 'next_cursor': next_cursor}
+
+
+def api_login_required(view):
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        if not current_user.is_authenticated:
+            return error('authentication required', 401)
+        return view(*args, **kwargs)
+    return wrapper
+
+
+@api_v1.errorhandler(FieldError)
+def _field_error(exc):
+    return error(str(exc), 400)
+
+
+@api_v1.errorhandler(HTTPException)
+def _http_error(exc):
+    return error(exc.description, exc.code)
+
+
+@api_v1.route('/login', methods=['POST'])
+def login():
+    payload = request.get_json(silent=True) or {}
+    user = User.query.filter_by(email=payload.get('email', '')).first()
+    if user is None or not user.check_password(payload.get('password', '')):
+        return error('invalid email or password', 401)
+    if user.is_suspended:
+        return error('account suspended', 403)
+    login_user(user, remember=bool(payload.get('remember')))
+    return respond({'id': user.id, 'username': user.username, 'user_type': user.user_type})
+
+
+@api_v1.route('/posts')
+@query_budget(6)
+def posts():
+    cursor, per_page = page_args()
+    query = request.args.get('query', '')
+    min_rating = request.args.get('min_rating', type=float)
+    lat, lon = request.args.get('lat', type=float), request.args.get('lon', type=float)
+
+    if valid_coordinates(lat, lon):
+        radius = request.args.get('radius', type=float)
+        if radius:
+            found = TrashPost.get_near(lat, lon, max(0.5, min(radius, 100)), per_page, min_seller_rating=min_rating)
+        else:
+            found = TrashPost.get_nearest(lat, lon, per_page, 100, min_seller_rating=min_rating)
+        return respond(listing(serialize_posts(found)))
+
+    if query:
+        page = search_posts(query, cursor, per_page)
+    else:
+        page = TrashPost.get_available(cursor, per_page, min_seller_rating=min_rating)
+    return respond(listing(serialize_posts(page.items), page.next_cursor))
+
+
+@api_v1.route('/posts/batch')
+@query_budget(2)
+def posts_batch():
+    try:
+        ids = [int(part) for part in request.args.get('ids', '').split(',') if part.strip()]
+    except ValueError:
+        return error('ids must be a comma separated list of integers', 400)
+    if not ids:
+        return error('ids is required', 400)
+    if len(ids) > MAX_BATCH:
+        return error(f'at most {MAX_BATCH} ids per request', 400)
+
+    fields = requested_fields(POST_FIELDS, DEFAULT_POST_FIELDS)
+    found = TrashPost.query.options(db.joinedload(TrashPost.owner)).filter(TrashPost.id.in_(ids)).all()
+    by_id = {post.id: post for post in found}
+    return respond({
+        'data': serialize_posts([by_id[i] for i in dict.fromkeys(ids) if i in by_id], fields),
+        'missing': [i for i in dict.fromkeys(ids) if i not in by_id],
+    })
+
+
+@api_v1.route('/posts/<int:post_id>')
+@query_budget(3)
+def post_detail(post_id):
+    fields = requested_fields(POST_FIELDS, tuple(POST_FIELDS))
+    post = TrashPost.find(post_id) or abort(404)
+    payload = serialize(post, fields, POST_FIELDS)
+    if post.status == 'available' and request.args.get('bids', '1') != '0':
+        payload['bids'] = Offer.summary(post.id)
+    return respond(payload)
+
+
+@api_v1.route('/users/<int:user_id>')
+@query_budget(2)
+def user_detail(user_id):
+    user = User.query.get_or_404(user_id)
+    return respond({
+        'id': user.id,
+        'username': user.username,
+        'user_type': user.user_type,
+        'rating': user.average_rating(),
+        'rating_count': user.rating_count,
+    })
+
+
+@api_v1.route('/users/<int:user_id>/reviews')
+@query_budget(2)
+def user_reviews(user_id):
+    cursor, per_page = page_args()
+    fields = requested_fields(REVIEW_FIELDS, DEFAULT_REVIEW_FIELDS)
+    query = Review.query.filter_by(reviewee_id=user_id).options(db.joinedload(Review.reviewer))
+    page = keyset_paginate(query, Review, cursor, per_page)
+    return respond(listing([serialize(review, fields, REVIEW_FIELDS) for review in page.items], page.next_cursor))
+
+
+@api_v1.route('/dashboard')
+@api_login_required
+@query_budget(6)
+def dashboard():
+    # Everything either dashboard page shows, in one round trip.
+    fields = requested_fields(POST_FIELDS, DEFAULT_POST_FIELDS)
+    if current_user.user_type == 'collector':
+        purchases = TrashPost.query.filter_by(collector_id=current_user.id, status='completed').options(
+            db.joinedload(TrashPost.owner)
+        ).order_by(TrashPost.completed_at.desc()).limit(10).all()
+        return respond({
+            'user_type': 'collector',
+            'stats': {
+                'completed_count': len(purchases),
+                'total_spent': sum(p.total_transaction_value for p in purchases if p.total_transaction_value),
+            },
+            'recent_purchases': serialize_posts(purchases, fields),
+            'open_offers': [
+                {'id': o.id, 'post_id': o.post_id, 'price_per_kg': o.price_per_kg, 'weight_kg': o.weight_kg, 'expires_at': o.expires_at}
+                for o in Offer.query.filter(Offer.collector_id == current_user.id, Offer.open_filter()).all()
+            ],
+        })
+
+    posts = TrashPost.query.filter_by(user_id=current_user.id).options(db.joinedload(TrashPost.owner)).order_by(TrashPost.created_at.desc()).all()
+    total_kg_sold = TrashPost.kg_sold(current_user.id)
+    offers = Offer.pending_for_seller(current_user.id)
+    return respond({
+        'user_type': current_user.user_type,
+        'stats': {
+            'total_kg_sold': total_kg_sold,
+            'total_earnings': current_user.total_earnings or Decimal('0'),
+        },
+        'posts': serialize_posts(posts, fields),
+        'offers': [
+            {'id': o.id, 'post_id': o.post_id, 'collector': o.collector.username, 'weight_kg': o.weight_kg,
+             'price_per_kg': o.price_per_kg, 'total_value': o.total_value, 'expires_at': o.expires_at}
+            for o in offers
+        ],
+    })
@@ -4,15 +4,23 @@ from flask_sqlalchemy import SQLAlchemy
 from flask_login import LoginManager
 from sqlalchemy.orm import DeclarativeBase
 from werkzeug.middleware.proxy_fix import ProxyFix
+from compression import CompressionMiddleware
 from flask_migrate import Migrate
+from querycount import init_query_counter
+from metrics import init_metrics
+from database import configure_database, include_in_migrations
+from images import image_pipeline
+from variants import init_image_variants
+from cache import page_cache
+from identity import identity_cache
+from feed import feed_hub
+from assets import init_assets
 
 
 basedir = os.path.abspath(os.path.dirname(__file__))
 
 instance_path = os.path.join(basedir, 'instance')
 
-os.makedirs(instance_path, exist_ok=True)
-
 
 class Base(DeclarativeBase):
     pass
@@ -21,31 +29,69 @@ db = SQLAlchemy(model_class=Base)
 login_manager = LoginManager()
 migrate = Migrate()
 
-app = Flask(__name__)
-app.secret_key = "a-very-secret-key-for-development"
-app.wsgi_app = ProxyFix(app.wsgi_app, x_proto=1, x_host=1)
-
-
-app.config["SQLALCHEMY_DATABASE_URI"] = "sqlite:///" + os.path.join(instance_path, 'database.db')
-app.config["SQLALCHEMY_TRACK_MODIFICATIONS"] = False
-
-
-UPLOAD_FOLDER = os.path.join(basedir, 'static/post_pics')
-os.makedirs(UPLOAD_FOLDER, exist_ok=True) 
-app.config['UPLOAD_FOLDER'] = UPLOAD_FOLDER
-
-
-db.init_app(app)
-login_manager.init_app(app)
-migrate.init_app(app, db)
-
-login_manager.login_view = 'login'
+login_manager.login_view = 'main.login'
 login_manager.login_message = 'Please log in to access this page.'
 login_manager.login_message_category = 'info'
 
 @login_manager.user_loader
 def load_user(user_id):
-    from models import User
-    return User.query.get(int(user_id))
-
-from routes import *
\ No newline at end of file
+    user = identity_cache.load(int(user_id))
+    # Suspending a user ends their existing sessions too.
+    return user if user is not None and user.is_active else None
+
+
+def create_app(config=None):
+    os.makedirs(instance_path, exist_ok=True)
+
+    app = Flask(__name__, instance_path=instance_path)
+    app.secret_key = "a-very-secret-key-for-development"
+    app.wsgi_app = ProxyFix(app.wsgi_app, x_proto=1, x_host=1)
+    app.wsgi_app = CompressionMiddleware(
+        app.wsgi_app,
+        level=int(os.environ.get('COMPRESS_LEVEL', 6)),
+        brotli_quality=int(os.environ.get('COMPRESS_BROTLI_QUALITY', 4)),
+        minimum_size=int(os.environ.get('COMPRESS_MIN_SIZE', 500))
+    )
+
+    configure_database(app, os.path.join(instance_path, 'database.db'))
+    app.config["SQLALCHEMY_TRACK_MODIFICATIONS"] = False
+
+    app.config['POSTS_PER_PAGE'] = int(os.environ.get('POSTS_PER_PAGE', 24))
+    app.config['MAX_POSTS_PER_PAGE'] = 100
+    app.config['STREAM_LISTINGS'] = os.environ.get('STREAM_LISTINGS', '0') == '1'
+    # Flask-Admin (and the PIL it pulls in) roughly doubles create_app(); processes that never serve /admin can skip it.
+    app.config['ADMIN_ENABLED'] = os.environ.get('ADMIN_ENABLED', '1') == '1'
+
+    app.config['UPLOAD_FOLDER'] = os.path.join(basedir, 'static/post_pics')
+    # Pictures of archived posts; only served through the /img variants, so it can sit on slower storage.
+    app.config['COLD_UPLOAD_FOLDER'] = os.environ.get('COLD_UPLOAD_FOLDER', os.path.join(instance_path, 'cold_pics'))
+    app.config.update(config or {})
+    os.makedirs(app.config['UPLOAD_FOLDER'], exist_ok=True)
+
+    db.init_app(app)
+    login_manager.init_app(app)
+    migrate.init_app(app, db, render_as_batch=True, include_name=include_in_migrations)
+    init_query_counter(app)
+    init_metrics(app)
+    image_pipeline.init_app(app)
+    init_image_variants(app)
+    page_cache.init_app(app)
+    identity_cache.init_app(app)
+    feed_hub.init_app(app)
+    init_assets(app)
+
+    # Imported here rather than at the top so models and scripts can import db without pulling in every view.
+    from routes import main
+    from api import api_v1
+    app.register_blueprint(main)
+    app.register_blueprint(api_v1)
+    if app.config['ADMIN_ENABLED']:
+        from admin import init_admin
+        init_admin(app)
+
+    with app.app_context():
+        engine = db.engine
+    # gunicorn --preload forks workers from a process that already built the engine; a pooled
+    # connection shared across processes corrupts both ends, so each worker starts with an empty pool.
+    os.register_at_fork(after_in_child=lambda: engine.dispose(close=False))
+    return app
@@ -0,0 +1,83 @@
+import time
+from datetime import datetime, timedelta
+from flask import current_app
+from app import db
+from models import TrashPost, ArchivedPost, Offer
+from images import move_images
+from cache import page_cache
+from feed import feed_hub
+import transitions
+
+ARCHIVED_COLUMNS = [column.name for column in ArchivedPost.__table__.columns if column.name != 'archived_at']
+
+
+def _cutoff(name, default, now):
+    return now - timedelta(days=current_app.config.get(name, default))
+
+
+def expire_stale(now=None, batch=None):
+    # Available posts nobody has bid on or edited for ARCHIVE_STALE_DAYS.
+    now = now or datetime.utcnow()
+    untouched_since = _cutoff('ARCHIVE_STALE_DAYS', 60, now)
+    post_ids = db.session.scalars(
+        db.select(TrashPost.id).where(TrashPost.status == 'available', TrashPost.updated_at < untouched_since)
+        .order_by(TrashPost.updated_at).limit(batch or current_app.config.get('ARCHIVE_BATCH', 500))
+    ).all()
+    if not post_ids:
+        return 0
+    expired = transitions.expire_posts(post_ids, now, untouched_since=untouched_since)
+    db.session.commit()
+    page_cache.invalidate_posts(post_ids)
+    feed_hub.posts_removed(post_ids, 'expired')
+    return expired
+
+
+def archive_batch(now=None, batch=None):
+    # Moves one batch of finished posts out of trash_post; returns how many moved.
+    now = now or datetime.utcnow()
+    finished = db.or_(
+        db.and_(TrashPost.status == 'completed', TrashPost.completed_at < _cutoff('ARCHIVE_COMPLETED_DAYS', 90, now)),
+        db.and_(TrashPost.status == 'expired', TrashPost.updated_at < _cutoff('ARCHIVE_EXPIRED_DAYS', 30, now)),
+    )
+    doomed = db.session.execute(
+        db.select(TrashPost.id, TrashPost.image_file).where(finished)
+        .order_by(TrashPost.id).limit(batch or current_app.config.get('ARCHIVE_BATCH', 500))
+    ).all()
+    if not doomed:
+        return 0
+
+    post_ids = [post_id for post_id, _ in doomed]
+    # Both statuses are final, so the rows cannot change between the copy and the delete.
+    moving = db.and_(TrashPost.id.in_(post_ids), finished)
+    db.session.execute(db.insert(ArchivedPost).from_select(
+        ARCHIVED_COLUMNS + ['archived_at'],
+        db.select(*(TrashPost.__table__.c[name] for name in ARCHIVED_COLUMNS), db.literal(now)).where(moving)
+    ))
+    # The winning bid's terms are on the post itself; the closed bid book is not kept.
+    db.session.execute(db.delete(Offer).where(Offer.post_id.in_(post_ids)).execution_options(synchronize_session=False))
+    db.session.execute(db.delete(TrashPost).where(moving).execution_options(synchronize_session=False))
+    db.session.commit()
+
+    # Pictures move only after the commit; until they do, variants are still found in the hot folder.
+    move_images([image_file for _, image_file in doomed], current_app.config['UPLOAD_FOLDER'], current_app.config['COLD_UPLOAD_FOLDER'])
+    page_cache.invalidate_posts(post_ids)
+    return len(post_ids)
+
+
+def run(now=None, batch=None, pause=0, limit=None):
+    now = now or datetime.utcnow()
+    expired = archived = 0
+    while limit is None or expired < limit:
+        count = expire_stale(now, batch)
+        if not count:
+            break
+        expired += count
+        time.sleep(pause)
+    while limit is None or archived < limit:
+        count = archive_batch(now, batch)
+        if not count:
+            break
+        archived += count
+        # Short transactions with gaps between them leave room for the site's own writes.
+        time.sleep(pause)
+    return expired, archived
@@ -0,0 +1,18 @@
+import argparse
+from app import create_app
+from archive import run
+
+app = create_app()
+
+def archive_posts(batch, pause, limit):
+    with app.app_context():
+        expired, archived = run(batch=batch, pause=pause, limit=limit)
+        print(f"{expired} stale posts expired, {archived} posts archived.")
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Expire stale posts and move finished ones to the archive. Safe to run from cron.')
+    parser.add_argument('--batch', type=int, help='posts per transaction (default ARCHIVE_BATCH, 500)')
+    parser.add_argument('--pause', type=float, default=0.2, help='seconds to wait between batches')
+    parser.add_argument('--limit', type=int, help='stop after roughly this many posts of each kind')
+    args = parser.parse_args()
+    archive_posts(args.batch, args.pause, args.limit)
@@ -0,0 +1,142 @@
+import gzip
+import hashlib
+import json
+import mimetypes
+import os
+import re
+import threading
+from flask import abort, current_app, request, send_file, url_for
+from werkzeug.security import safe_join
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+ONE_YEAR = 365 * 24 * 3600
+
+# bundle name -> sources under static/, concatenated in order
+BUNDLES = {
+    'css/site.css': ['css/base.css', 'css/home.css', 'css/how_it_works.css'],
+    'css/custom.css': ['css/custom.css'],
+    'js/main.js': ['js/main.js'],
+    'js/feed.js': ['js/feed.js'],
+}
+
+ENCODINGS = (('br', '.br'), ('gzip', '.gz'))
+
+_manifest = None
+_lock = threading.Lock()
+
+
+def minify_css(source):
+    source = re.sub(r'/\*.*?\*/', '', source, flags=re.S)
+    source = re.sub(r'\s+', ' ', source)
+    source = re.sub(r'\s*([{};,>])\s*', r'\1', source)
+    source = re.sub(r':\s+', ':', source)
+    return source.replace(';}', '}').strip() + '\n'
+
+
+def minify_js(source):
+    # Conservative on purpose: only whole-line comments and indentation go, so strings and regexes are untouched.
+    source = re.sub(r'/\*.*?\*/', '', source, flags=re.S)
+    lines = (line.strip() for line in source.splitlines())
+    return '\n'.join(line for line in lines if line and not line.startswith('//')) + '\n'
+
+
+def _minify(name, source):
+    if name.endswith('.css'):
+        return minify_css(source)
+    if name.endswith('.js'):
+        return minify_js(source)
+    return source
+
+
+def _write(path, data):
+    tmp = f'{path}.{os.getpid()}.tmp'
+    with open(tmp, 'wb') as f:
+        f.write(data)
+    os.replace(tmp, path)
+
+
+def build_assets(static_folder, output_folder):
+    os.makedirs(output_folder, exist_ok=True)
+    manifest = {}
+    for name, sources in BUNDLES.items():
+        parts = []
+        for source in sources:
+            with open(os.path.join(static_folder, source), encoding='utf-8') as f:
+                parts.append(f.read())
+        data = _minify(name, '\n'.join(parts)).encode('utf-8')
+
+        stem, ext = os.path.splitext(name)
+        hashed = f'{stem}.{hashlib.sha256(data).hexdigest()[:12]}{ext}'
+        target = os.path.join(output_folder, hashed)
+        if not os.path.exists(target):
+            os.makedirs(os.path.dirname(target), exist_ok=True)
+            _write(target + '.gz', gzip.compress(data, 9, mtime=0))
+            if brotli is not None:
+                _write(target + '.br', brotli.compress(data, quality=11))
+            _write(target, data)
+        manifest[name] = hashed
+
+    _write(os.path.join(output_folder, 'manifest.json'), json.dumps(manifest, indent=2, sort_keys=True).encode())
+    return manifest
+
+
+def _sources_changed(static_folder, manifest_path):
+    if not os.path.exists(manifest_path):
+        return True
+    built = os.path.getmtime(manifest_path)
+    sources = {source for group in BUNDLES.values() for source in group}
+    return any(os.path.getmtime(os.path.join(static_folder, source)) > built for source in sources)
+
+
+def load_manifest(app):
+    global _manifest
+    with _lock:
+        if _manifest is None:
+            folder = app.config['ASSETS_FOLDER']
+            manifest_path = os.path.join(folder, 'manifest.json')
+            stale = app.config['ASSETS_AUTO_BUILD'] and _sources_changed(app.static_folder, manifest_path)
+            if stale or not os.path.exists(manifest_path):
+                _manifest = build_assets(app.static_folder, folder)
+            else:
+                with open(manifest_path) as f:
+                    _manifest = json.load(f)
+        return _manifest
+
+
+def asset_url(name):
+    hashed = load_manifest(current_app).get(name)
+    if hashed is None:
+        return url_for('static', filename=name)
+    return url_for('asset', filename=hashed)
+
+
+def serve_asset(filename):
+    path = safe_join(current_app.config['ASSETS_FOLDER'], filename)
+    if path is None or filename == 'manifest.json' or not os.path.isfile(path):
+        abort(404)
+
+    encoding = None
+    for name, suffix in ENCODINGS:
+        if request.accept_encodings[name] > 0 and os.path.isfile(path + suffix):
+            encoding, path = name, path + suffix
+            break
+
+    # The mimetype comes from the original name, not the .gz/.br sibling on disk.
+    response = send_file(path, mimetype=mimetypes.guess_type(filename)[0], conditional=True, max_age=ONE_YEAR)
+    if encoding:
+        response.headers['Content-Encoding'] = encoding
+    response.vary.add('Accept-Encoding')
+    response.cache_control.public = True
+    response.cache_control.immutable = True
+    return response
+
+
+def init_assets(app):
+    app.config.setdefault('ASSETS_FOLDER', os.path.join(app.static_folder, 'dist'))
+    app.config.setdefault('ASSETS_AUTO_BUILD', os.environ.get('ASSETS_AUTO_BUILD', '1') == '1')
+    app.add_url_rule('/assets/<path:filename>', 'asset', serve_asset)
+    app.add_template_global(asset_url)
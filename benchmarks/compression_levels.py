@@ -0,0 +1,77 @@
+import argparse
+import os
+import sys
+import tempfile
+import time
+from decimal import Decimal
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def seed(app, db, posts, users):
+    from models import User, TrashPost
+
+    with app.app_context():
+        db.create_all()
+        admin = User.create('admin', 'admin@example.com', 'secret')
+        admin.is_admin = True
+        owners = [admin] + [User.create(f'user{i}', f'user{i}@example.com', 'secret') for i in range(users)]
+        db.session.add_all(
+            TrashPost(owners[i % len(owners)].id, ('plastic', 'paper', 'metal', 'glass')[i % 4], 10 + i % 90,
+                      f'Mirpur {i % 12}, Dhaka', 'Clean, sorted and ready for pickup.', Decimal('12.50'), i % 2 == 0,
+                      '01700000000', None)
+            for i in range(posts)
+        )
+        db.session.commit()
+
+
+def fetch_pages(app, per_page):
+    client = app.test_client()
+    pages = {'/posts': client.get(f'/posts?per_page={per_page}', headers={'Accept-Encoding': 'identity'}).data}
+    client.post('/login', data={'email': 'admin@example.com', 'password': 'secret'})
+    pages['/admin/users'] = client.get('/admin/users', headers={'Accept-Encoding': 'identity'}).data
+    return pages
+
+
+def measure(stream_factory, body, repeat):
+    started = time.process_time()
+    for _ in range(repeat):
+        stream = stream_factory()
+        out = stream.compress(body) + stream.finish()
+    return len(out), (time.process_time() - started) / repeat * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Bytes saved and CPU spent per response at each compression level.')
+    parser.add_argument('--posts', type=int, default=100)
+    parser.add_argument('--users', type=int, default=500)
+    parser.add_argument('--repeat', type=int, default=50)
+    args = parser.parse_args()
+
+    folder = tempfile.mkdtemp()
+    os.environ['DATABASE_URL'] = 'sqlite:///' + os.path.join(folder, 'compression.db')
+
+    from app import create_app, db
+    import compression
+
+    app = create_app({'WTF_CSRF_ENABLED': False, 'PAGE_CACHE_ENABLED': False})
+    seed(app, db, args.posts, args.users)
+    pages = fetch_pages(app, min(args.posts, app.config['MAX_POSTS_PER_PAGE']))
+
+    codecs = [(f'gzip-{level}', lambda level=level: compression.GzipStream(level)) for level in (1, 6, 9)]
+    if compression.brotli is not None:
+        codecs += [(f'br-{quality}', lambda quality=quality: compression.BrotliStream(quality)) for quality in (1, 4, 6, 11)]
+    else:
+        print('brotli not installed; reporting gzip only')
+
+    for path, body in pages.items():
+        print(f"\n{path}: {len(body):,} bytes uncompressed")
+        print(f"{'codec':>8}  {'bytes':>9}  {'saved':>6}  {'cpu ms/resp':>11}")
+        for name, factory in codecs:
+            size, cpu_ms = measure(factory, body, args.repeat)
+            print(f"{name:>8}  {size:>9,}  {1 - size / len(body):>6.1%}  {cpu_ms:>11.3f}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,117 @@
+import argparse
+import multiprocessing
+import os
+import sqlite3
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from database import SQLITE_PRAGMAS, apply_sqlite_pragmas
+
+SCHEMA = """
+CREATE TABLE user (id INTEGER PRIMARY KEY, total_earnings NUMERIC(10, 2) DEFAULT 0);
+CREATE TABLE trash_post (
+    id INTEGER PRIMARY KEY, user_id INTEGER, trash_type VARCHAR(50), status VARCHAR(20),
+    collector_id INTEGER, final_weight_kg FLOAT, created_at DATETIME DEFAULT CURRENT_TIMESTAMP
+);
+"""
+
+
+def connect(path, tuned):
+    if tuned:
+        connection = sqlite3.connect(path, timeout=SQLITE_PRAGMAS['busy_timeout'] / 1000)
+        apply_sqlite_pragmas(connection)
+    else:
+        # What the app ran with before: rollback journal, synchronous=FULL, pysqlite's 5s wait.
+        connection = sqlite3.connect(path)
+    return connection
+
+
+def setup(path, tuned, posts):
+    connection = connect(path, tuned)
+    connection.executescript(SCHEMA)
+    connection.executemany("INSERT INTO user (id) VALUES (?)", [(i,) for i in range(1, 101)])
+    connection.executemany(
+        "INSERT INTO trash_post (user_id, trash_type, status) VALUES (?, 'plastic', 'available')",
+        [(i % 100 + 1,) for i in range(posts)]
+    )
+    connection.commit()
+    connection.close()
+
+
+def writer(path, tuned, deadline, posts, results):
+    connection = connect(path, tuned)
+    commits = locked = 0
+    seed = os.getpid()
+    while time.time() < deadline:
+        seed = (seed * 1103515245 + 12345) % 2 ** 31
+        post_id = seed % posts + 1
+        try:
+            # Same shape as make_offer followed by accept_offer: read, then two writes.
+            connection.execute("SELECT status FROM trash_post WHERE id = ?", (post_id,)).fetchone()
+            connection.execute("UPDATE trash_post SET status = 'negotiating', collector_id = 1, final_weight_kg = 3 WHERE id = ?", (post_id,))
+            connection.execute("UPDATE user SET total_earnings = total_earnings + 1 WHERE id = ?", (post_id % 100 + 1,))
+            connection.commit()
+            commits += 1
+        except sqlite3.OperationalError:
+            connection.rollback()
+            locked += 1
+    connection.close()
+    results.put(('writer', commits, locked, 0.0))
+
+
+def reader(path, tuned, deadline, results):
+    connection = connect(path, tuned)
+    reads = locked = 0
+    slowest = 0.0
+    while time.time() < deadline:
+        started = time.perf_counter()
+        try:
+            connection.execute(
+                "SELECT id, trash_type FROM trash_post WHERE status = 'available' ORDER BY created_at DESC LIMIT 24"
+            ).fetchall()
+            connection.commit()
+            reads += 1
+        except sqlite3.OperationalError:
+            locked += 1
+        slowest = max(slowest, time.perf_counter() - started)
+    connection.close()
+    results.put(('reader', reads, locked, slowest))
+
+
+def run(tuned, writers, readers, seconds, posts):
+    with tempfile.TemporaryDirectory() as folder:
+        path = os.path.join(folder, 'bench.db')
+        setup(path, tuned, posts)
+        results = multiprocessing.Queue()
+        deadline = time.time() + seconds
+        procs = [multiprocessing.Process(target=writer, args=(path, tuned, deadline, posts, results)) for _ in range(writers)]
+        procs += [multiprocessing.Process(target=reader, args=(path, tuned, deadline, results)) for _ in range(readers)]
+        for proc in procs:
+            proc.start()
+        rows = [results.get() for _ in procs]
+        for proc in procs:
+            proc.join()
+
+    commits = sum(r[1] for r in rows if r[0] == 'writer')
+    write_errors = sum(r[2] for r in rows if r[0] == 'writer')
+    reads = sum(r[1] for r in rows if r[0] == 'reader')
+    read_errors = sum(r[2] for r in rows if r[0] == 'reader')
+    slowest_read = max([r[3] for r in rows if r[0] == 'reader'] or [0.0])
+    label = 'tuned (WAL)' if tuned else 'default'
+    print(f"{label:<12} {commits / seconds:>10.0f} {write_errors:>10} {reads / seconds:>10.0f} {read_errors:>10} {slowest_read * 1000:>12.1f}")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Concurrent SQLite write throughput before/after the connect-time pragmas.')
+    parser.add_argument('--writers', type=int, default=4)
+    parser.add_argument('--readers', type=int, default=2)
+    parser.add_argument('--seconds', type=float, default=5)
+    parser.add_argument('--posts', type=int, default=10000)
+    args = parser.parse_args()
+
+    print(f"{args.writers} writer / {args.readers} reader processes, {args.seconds:g}s each")
+    print(f"{'mode':<12} {'commits/s':>10} {'locked':>10} {'reads/s':>10} {'read errs':>10} {'max read ms':>12}")
+    for tuned in (False, True):
+        run(tuned, args.writers, args.readers, args.seconds, args.posts)
@@ -0,0 +1,236 @@
+import argparse
+import os
+import random
+import sys
+import time
+from collections import defaultdict
+from datetime import datetime, timedelta
+from decimal import Decimal
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+PASSWORD = 'password'
+BATCH = 5000
+
+TRASH_TYPES = (
+    ('plastic bottles', 18), ('paper', 12), ('cardboard', 10), ('iron', 35), ('aluminium cans', 90),
+    ('copper wire', 650), ('glass', 4), ('e-waste', 120), ('newspaper', 14), ('batteries', 60),
+)
+# Neighbourhood, latitude, longitude
+AREAS = (
+    ('Mirpur', 23.8223, 90.3654), ('Dhanmondi', 23.7465, 90.3760), ('Gulshan', 23.7925, 90.4078),
+    ('Uttara', 23.8759, 90.3795), ('Mohammadpur', 23.7662, 90.3589), ('Banani', 23.7937, 90.4066),
+    ('Motijheel', 23.7330, 90.4172), ('Badda', 23.7806, 90.4267), ('Tejgaon', 23.7639, 90.3889),
+    ('Old Dhaka', 23.7104, 90.4074),
+)
+DESCRIPTION_WORDS = (
+    'clean', 'sorted', 'dry', 'bundled', 'mixed', 'household', 'office', 'factory', 'shop', 'bulk',
+    'pickup', 'today', 'weekend', 'bags', 'sacks', 'boxes', 'কাগজ', 'প্লাস্টিক', 'লোহা', 'বোতল',
+)
+
+
+def _money(value):
+    return Decimal(value).quantize(Decimal('0.01'))
+
+
+class Generator:
+    def __init__(self, users, posts, reviews, offers, seed, days=365):
+        self.counts = {'users': users, 'posts': posts, 'reviews': reviews, 'offers': offers}
+        self.random = random.Random(seed)
+        self.now = datetime(2026, 10, 1)
+        self.days = days
+        self.ratings = defaultdict(lambda: [0, 0])
+        self.earnings = defaultdict(Decimal)
+        self.daily = defaultdict(lambda: {'new_users': 0, 'new_posts': 0, 'completed_transactions': 0, 'sales': Decimal('0'), 'profit': Decimal('0')})
+        self.completed = []
+        self.available = []
+
+    def _moment(self):
+        return self.now - timedelta(seconds=self.random.randrange(self.days * 86400))
+
+    def users(self, password_hash):
+        collectors = max(1, self.counts['users'] // 5)
+        self.collector_ids = list(range(1, collectors + 1))
+        self.seller_ids = list(range(collectors + 1, self.counts['users'] + 1))
+        for user_id in range(1, self.counts['users'] + 1):
+            created = self._moment()
+            self.daily[created.date()]['new_users'] += 1
+            yield {
+                'id': user_id, 'username': f'user{user_id}', 'email': f'user{user_id}@example.com',
+                'password_hash': password_hash, 'user_type': 'collector' if user_id <= collectors else 'user',
+                'is_admin': False, 'total_earnings': Decimal('0'), 'created_at': created,
+                'rating_sum': 0, 'rating_count': 0,
+            }
+
+    def posts(self):
+        from geo import encode_geohash
+        from transitions import PLATFORM_FEE
+
+        rng = self.random
+        for post_id in range(1, self.counts['posts'] + 1):
+            trash_type, base_price = rng.choice(TRASH_TYPES)
+            area, lat, lon = rng.choice(AREAS)
+            lat, lon = round(lat + rng.uniform(-0.02, 0.02), 6), round(lon + rng.uniform(-0.02, 0.02), 6)
+            created = self._moment()
+            seller = rng.choice(self.seller_ids)
+            price = _money(base_price * rng.uniform(0.7, 1.3))
+            quantity = rng.randint(1, 500)
+            row = {
+                'id': post_id, 'user_id': seller, 'trash_type': trash_type, 'quantity': quantity,
+                'location': f'{area}, Dhaka', 'description': ' '.join(rng.choices(DESCRIPTION_WORDS, k=8)),
+                'status': 'available', 'collector_id': None, 'price_per_kg': price, 'is_negotiable': rng.random() < 0.5,
+                'created_at': created, 'completed_at': None, 'updated_at': created,
+                'final_weight_kg': None, 'final_price_per_kg': None, 'total_transaction_value': None, 'platform_profit': None,
+                'phone_number': f'017{rng.randrange(10 ** 8):08d}',
+                'google_map_link': f'https://maps.google.com/?q={lat},{lon}',
+                'latitude': lat, 'longitude': lon, 'geohash': encode_geohash(lat, lon), 'image_file': 'default.jpg',
+            }
+            self.daily[created.date()]['new_posts'] += 1
+
+            completed_at = created + timedelta(hours=rng.randint(1, 240))
+            if rng.random() < 0.3 and completed_at < self.now:
+                # A bid buys the whole lot.
+                weight = float(quantity)
+                final_price = _money(price * Decimal(str(rng.uniform(0.8, 1.05))))
+                total = _money(Decimal(str(weight)) * final_price)
+                profit = _money(total * PLATFORM_FEE)
+                collector = rng.choice(self.collector_ids)
+                row.update(
+                    status='completed', collector_id=collector, completed_at=completed_at, updated_at=completed_at,
+                    final_weight_kg=weight, final_price_per_kg=final_price,
+                    total_transaction_value=total, platform_profit=profit,
+                )
+                self.earnings[seller] += total - profit
+                day = self.daily[completed_at.date()]
+                day['completed_transactions'] += 1
+                day['sales'] += total
+                day['profit'] += profit
+                self.completed.append((post_id, seller, collector, completed_at))
+            else:
+                self.available.append((post_id, quantity))
+            yield row
+
+    def reviews(self):
+        rng = self.random
+        wanted = self.counts['reviews']
+        made = 0
+        review_id = 0
+        candidates = list(self.completed)
+        rng.shuffle(candidates)
+        for post_id, seller, collector, completed_at in candidates:
+            # Each side of a completed sale may review the other once.
+            for reviewer, reviewee in ((seller, collector), (collector, seller)):
+                if made >= wanted:
+                    return
+                if rng.random() < 0.2:
+                    continue
+                rating = rng.choices((1, 2, 3, 4, 5), weights=(3, 4, 12, 35, 46))[0]
+                review_id += 1
+                made += 1
+                self.ratings[reviewee][0] += rating
+                self.ratings[reviewee][1] += 1
+                yield {
+                    'id': review_id, 'rating': rating, 'comment': rng.choice(('Smooth pickup.', 'On time.', 'Fair weight.', 'ভালো ব্যবহার', None)),
+                    'created_at': completed_at + timedelta(hours=rng.randint(1, 72)),
+                    'post_id': post_id, 'reviewer_id': reviewer, 'reviewee_id': reviewee,
+                }
+
+    def offers(self):
+        rng = self.random
+        for offer_id in range(1, min(self.counts['offers'], len(self.available) * 3) + 1):
+            created = self.now - timedelta(hours=rng.randint(0, 60))
+            post_id, quantity = rng.choice(self.available)
+            weight = float(quantity)
+            price = _money(rng.uniform(3, 120))
+            yield {
+                'id': offer_id, 'post_id': post_id, 'collector_id': rng.choice(self.collector_ids),
+                'weight_kg': weight, 'price_per_kg': price, 'total_value': _money(Decimal(str(weight)) * price),
+                'status': 'pending', 'created_at': created, 'expires_at': created + timedelta(hours=72), 'decided_at': None,
+            }
+
+
+def bulk_insert(db, table, rows, label):
+    started, total, batch = time.perf_counter(), 0, []
+    for row in rows:
+        batch.append(row)
+        if len(batch) == BATCH:
+            db.session.execute(table.insert(), batch)
+            db.session.commit()
+            total += len(batch)
+            batch = []
+    if batch:
+        db.session.execute(table.insert(), batch)
+        db.session.commit()
+        total += len(batch)
+    print(f"{label:>8}: {total:>9,} rows in {time.perf_counter() - started:6.1f}s")
+    return total
+
+
+def generate(app, users=100_000, posts=1_000_000, reviews=500_000, offers=None, seed=42):
+    from werkzeug.security import generate_password_hash
+    from app import db
+    from models import User, TrashPost, Review, Offer, DailyStats
+    from search import rebuild_search_index
+    import stats
+
+    generator = Generator(users, posts, reviews, posts // 5 if offers is None else offers, seed)
+    with app.app_context():
+        db.create_all()
+        if db.session.query(User.id).first() is not None:
+            raise SystemExit('The database already has users; point DATABASE_URL at an empty database.')
+
+        # Hashing is deliberately slow, so every generated account shares one hash.
+        bulk_insert(db, User.__table__, generator.users(generate_password_hash(PASSWORD)), 'users')
+        bulk_insert(db, TrashPost.__table__, generator.posts(), 'posts')
+        bulk_insert(db, Review.__table__, generator.reviews(), 'reviews')
+        bulk_insert(db, Offer.__table__, generator.offers(), 'offers')
+
+        user_updates = [
+            {'uid': user_id, 'rating_sum': generator.ratings[user_id][0], 'rating_count': generator.ratings[user_id][1],
+             'total_earnings': generator.earnings[user_id]}
+            for user_id in set(generator.ratings) | set(generator.earnings)
+        ]
+        if user_updates:
+            db.session.execute(
+                User.__table__.update().where(User.__table__.c.id == db.bindparam('uid')).values(
+                    rating_sum=db.bindparam('rating_sum'), rating_count=db.bindparam('rating_count'),
+                    total_earnings=db.bindparam('total_earnings'),
+                ),
+                user_updates
+            )
+        bulk_insert(db, DailyStats.__table__, ({'day': day, **values} for day, values in sorted(generator.daily.items())), 'days')
+        stats.reconcile()
+        started = time.perf_counter()
+        buckets = stats.rebuild_rollups()
+        print(f"{'rollups':>8}: {buckets:>9,} rows in {time.perf_counter() - started:6.1f}s")
+
+        started = time.perf_counter()
+        with db.engine.begin() as connection:
+            indexed = rebuild_search_index(connection)
+        print(f"{'search':>8}: {indexed:>9,} rows in {time.perf_counter() - started:6.1f}s")
+    return generator
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Fill the database named by DATABASE_URL with synthetic marketplace data.')
+    parser.add_argument('--users', type=int, default=100_000)
+    parser.add_argument('--posts', type=int, default=1_000_000)
+    parser.add_argument('--reviews', type=int, default=500_000)
+    parser.add_argument('--offers', type=int, default=None, help='pending offers (default: posts / 5)')
+    parser.add_argument('--scale', type=float, default=1.0, help='multiply every volume, e.g. 0.01 for a quick run')
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+
+    from app import create_app
+    app = create_app()
+    scaled = lambda n: max(1, int(n * args.scale))
+    generate(
+        app, scaled(args.users), scaled(args.posts), scaled(args.reviews),
+        None if args.offers is None else scaled(args.offers), args.seed
+    )
+    print(f"Every account's password is '{PASSWORD}'.")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,107 @@
+import argparse
+import os
+import sys
+import tempfile
+import threading
+import time
+from decimal import Decimal
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Race collectors and sellers through the offer book and check for lost updates.')
+    parser.add_argument('--posts', type=int, default=50)
+    parser.add_argument('--threads', type=int, default=8)
+    args = parser.parse_args()
+
+    folder = tempfile.mkdtemp()
+    os.environ['DATABASE_URL'] = 'sqlite:///' + os.path.join(folder, 'contention.db')
+
+    from app import create_app, db
+    from models import User, TrashPost, Offer
+    import transitions
+
+    app = create_app()
+    with app.app_context():
+        db.create_all()
+        seller = User.create('seller', 'seller@example.com', 'secret')
+        collectors = [User.create(f'collector{i}', f'c{i}@example.com', 'secret', user_type='collector') for i in range(args.threads)]
+        posts = [TrashPost.create(seller.id, 'plastic', 100, 'Dhaka', '', Decimal('10.00'), True, '01700000000', None) for _ in range(args.posts)]
+        seller_id = seller.id
+        collector_ids = [c.id for c in collectors]
+        post_ids = [p.id for p in posts]
+
+    placed = {post_id: [] for post_id in post_ids}
+    accepted = {post_id: [] for post_id in post_ids}
+    errors = []
+    start = threading.Barrier(args.threads)
+
+    def offer_worker(collector_id, price):
+        start.wait()
+        for post_id in post_ids:
+            with app.app_context():
+                try:
+                    post = db.session.get(TrashPost, post_id)
+                    if transitions.place_offer(post, collector_id, float(post.quantity), Decimal(price)):
+                        db.session.commit()
+                        placed[post_id].append(collector_id)
+                    else:
+                        db.session.rollback()
+                except Exception as exc:
+                    errors.append(repr(exc))
+
+    def accept_worker(collector_id):
+        # Every thread plays a seller clicking "accept" on a different bid for the same post.
+        start.wait()
+        for post_id in post_ids:
+            with app.app_context():
+                try:
+                    post = db.session.get(TrashPost, post_id)
+                    offer = Offer.query.filter_by(post_id=post_id, collector_id=collector_id).first()
+                    if offer and transitions.accept_offer(post, offer.id):
+                        db.session.commit()
+                        accepted[post_id].append(collector_id)
+                    else:
+                        db.session.rollback()
+                except Exception as exc:
+                    errors.append(repr(exc))
+
+    def run(target, arg_list):
+        threads = [threading.Thread(target=target, args=a) for a in arg_list]
+        started = time.perf_counter()
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        return time.perf_counter() - started
+
+    offer_time = run(offer_worker, [(cid, f'{10 + i}.00') for i, cid in enumerate(collector_ids)])
+    accept_time = run(accept_worker, [(cid,) for cid in collector_ids])
+
+    with app.app_context():
+        seller = db.session.get(User, seller_id)
+        completed = TrashPost.query.filter_by(status='completed').all()
+        expected = sum(p.total_transaction_value - p.platform_profit for p in completed)
+        stored = seller.total_earnings
+        winners_match = all(accepted[p.id] and p.collector_id == accepted[p.id][0] for p in completed)
+        statuses = dict(db.session.query(Offer.status, db.func.count(Offer.id)).group_by(Offer.status).all())
+
+    lost_offers = [pid for pid, c in placed.items() if len(c) != args.threads]
+    double_accepts = [pid for pid, c in accepted.items() if len(c) != 1]
+    print(f"{args.threads} threads x {args.posts} posts")
+    print(f"offers:  {offer_time:.2f}s, posts missing a collector's bid: {len(lost_offers)}")
+    print(f"accepts: {accept_time:.2f}s, posts accepted != 1 time: {len(double_accepts)}")
+    print(f"offer statuses: {statuses}")
+    print(f"seller earnings stored {stored}, expected {expected}")
+    print(f"completed post carries the accepted collector: {winners_match}")
+    print(f"errors: {len(errors)}" + (f" (first: {errors[0]})" if errors else ''))
+
+    ok = (not lost_offers and not double_accepts and winners_match and not errors
+          and Decimal(stored) == Decimal(expected) and statuses.get('pending', 0) == 0)
+    print('PASS' if ok else 'FAIL')
+    return 0 if ok else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,154 @@
+import argparse
+import json
+import os
+import shutil
+import signal
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.request
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from suite import _children, _free_port
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+HEAVY_MODULES = ('flask_admin', 'PIL', 'pyarrow', 'wtforms', 'alembic')
+WARM_PAGES = ('/', '/how-it-works', '/posts', '/login', '/register')
+
+# Runs in a fresh interpreter, so nothing is cached from a previous import.
+PROBE = '''
+import json, sys, time
+started = time.perf_counter()
+import app
+imported = time.perf_counter()
+app.create_app()
+created = time.perf_counter()
+with open('/proc/self/status') as f:
+    rss = next(int(line.split()[1]) for line in f if line.startswith('VmRSS:'))
+print(json.dumps({
+    'import_ms': (imported - started) * 1000, 'create_app_ms': (created - imported) * 1000,
+    'rss_mb': rss / 1024, 'loaded': [name for name in %r if name in sys.modules],
+}))
+''' % (HEAVY_MODULES,)
+
+
+def probe_imports(runs, env):
+    samples = []
+    for _ in range(runs):
+        output = subprocess.run([sys.executable, '-c', PROBE], cwd=ROOT, env=env, capture_output=True, text=True, check=True).stdout
+        samples.append(json.loads(output.strip().splitlines()[-1]))
+    return {
+        'import_ms': round(statistics.median(s['import_ms'] for s in samples), 1),
+        'create_app_ms': round(statistics.median(s['create_app_ms'] for s in samples), 1),
+        'rss_mb': round(statistics.median(s['rss_mb'] for s in samples), 1),
+        'loaded': samples[-1]['loaded'],
+    }
+
+
+def smaps(pid):
+    # Pss splits each shared page between the processes mapping it, so summing it over workers gives real usage.
+    values = {}
+    with open(f'/proc/{pid}/smaps_rollup') as f:
+        for line in f:
+            name, _, rest = line.partition(':')
+            if rest.strip().endswith('kB'):
+                values[name] = int(rest.split()[0]) / 1024
+    return {
+        'rss_mb': values.get('Rss', 0.0), 'pss_mb': values.get('Pss', 0.0),
+        'private_mb': values.get('Private_Clean', 0.0) + values.get('Private_Dirty', 0.0),
+    }
+
+
+def measure_workers(workers, preload, env, warm_requests):
+    if shutil.which('gunicorn') is None:
+        raise SystemExit('gunicorn is not installed; pip install -r requirements_for_vscode.txt.')
+    port = _free_port()
+    base_url = f'http://127.0.0.1:{port}'
+    started = time.perf_counter()
+    process = subprocess.Popen(
+        ['gunicorn', '-w', str(workers), '-b', f'127.0.0.1:{port}', '--log-level', 'warning', 'main:app'],
+        cwd=ROOT, env=dict(env, GUNICORN_PRELOAD='1' if preload else '0'),
+    )
+    try:
+        deadline = time.time() + 60
+        # Ready once every worker has been forked and one of them answers.
+        while len(_children(process.pid)) < workers or not _get(base_url + '/how-it-works'):
+            if time.time() > deadline:
+                raise SystemExit('gunicorn did not start within 60s')
+            time.sleep(0.05)
+        ready_ms = (time.perf_counter() - started) * 1000
+
+        for _ in range(warm_requests):
+            for page in WARM_PAGES:
+                _get(base_url + page)
+        pids = _children(process.pid)
+        per_worker = [smaps(pid) for pid in pids]
+        master = smaps(process.pid)
+    finally:
+        process.send_signal(signal.SIGTERM)
+        try:
+            process.wait(10)
+        except subprocess.TimeoutExpired:
+            process.kill()
+
+    mean = lambda name: round(statistics.mean(w[name] for w in per_worker), 1)
+    return {
+        'ready_ms': round(ready_ms), 'worker_rss_mb': mean('rss_mb'), 'worker_pss_mb': mean('pss_mb'),
+        'worker_private_mb': mean('private_mb'),
+        'total_pss_mb': round(master['pss_mb'] + sum(w['pss_mb'] for w in per_worker), 1),
+    }
+
+
+def _get(url):
+    try:
+        with urllib.request.urlopen(url, timeout=10) as response:
+            response.read()
+            return True
+    except OSError:
+        return False
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Cold-start import time and per-worker memory with and without gunicorn --preload.')
+    parser.add_argument('--runs', type=int, default=5, help='fresh interpreters per import measurement')
+    parser.add_argument('--workers', type=int, default=4)
+    parser.add_argument('--warm-requests', type=int, default=20, help='rounds over the warm-up pages before memory is read')
+    parser.add_argument('--skip-workers', action='store_true', help='only measure imports')
+    parser.add_argument('--save', metavar='PATH', help='write the results as JSON')
+    args = parser.parse_args()
+
+    folder = tempfile.mkdtemp()
+    env = dict(os.environ, DATABASE_URL='sqlite:///' + os.path.join(folder, 'startup.db'))
+    os.environ['DATABASE_URL'] = env['DATABASE_URL']
+    from app import create_app, db
+    with create_app().app_context():
+        db.create_all()
+
+    report = {'imports': {}, 'workers': {}}
+    print(f"{'startup':<22} {'import ms':>10} {'create_app ms':>14} {'RSS MB':>8}  heavy modules loaded")
+    for label, admin in (('full', '1'), ('ADMIN_ENABLED=0', '0')):
+        result = probe_imports(args.runs, dict(env, ADMIN_ENABLED=admin))
+        report['imports'][label] = result
+        print(f"{label:<22} {result['import_ms']:>10.1f} {result['create_app_ms']:>14.1f} {result['rss_mb']:>8.1f}  {', '.join(result['loaded']) or '-'}")
+
+    if not args.skip_workers:
+        print(f"\n{args.workers} workers{'':<12} {'ready ms':>10} {'RSS/worker':>11} {'PSS/worker':>11} {'private/worker':>15} {'total PSS':>10}")
+        for label, preload in (('no preload', False), ('--preload', True)):
+            result = measure_workers(args.workers, preload, env, args.warm_requests)
+            report['workers'][label] = result
+            print(f"{label:<22} {result['ready_ms']:>10} {result['worker_rss_mb']:>11.1f} {result['worker_pss_mb']:>11.1f} "
+                  f"{result['worker_private_mb']:>15.1f} {result['total_pss_mb']:>10.1f}")
+
+    if args.save:
+        with open(args.save, 'w') as f:
+            json.dump(report, f, indent=2, sort_keys=True)
+        print(f'results written to {args.save}')
+    shutil.rmtree(folder, ignore_errors=True)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,426 @@
+import argparse
+import http.cookiejar
+import io
+import json
+import os
+import re
+import resource
+import secrets
+import shutil
+import signal
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+import urllib.error
+import urllib.parse
+import urllib.request
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+SCENARIOS = ('posts', 'posts_search', 'user_dashboard', 'collector_dashboard', 'make_offer', 'accept_offer', 'create_post')
+METRICS = ('p50_ms', 'p99_ms', 'rps')
+CSRF = re.compile(r'name="csrf_token" type="hidden" value="([^"]+)"')
+
+
+def percentile(samples, fraction):
+    ordered = sorted(samples)
+    if not ordered:
+        return 0.0
+    return ordered[min(len(ordered) - 1, int(round(fraction * (len(ordered) - 1))))]
+
+
+def png_bytes(width=1200, height=900):
+    from PIL import Image
+
+    image = Image.frombytes('RGB', (width, height), secrets.token_bytes(width * height * 3))
+    buffer = io.BytesIO()
+    image.save(buffer, 'PNG')
+    return buffer.getvalue()
+
+
+class ClientSession:
+    def __init__(self, app):
+        self.client = app.test_client()
+
+    def get(self, path):
+        response = self.client.get(path)
+        return response.status_code, response.get_data(as_text=True)
+
+    def post(self, path, data=None, json_body=None, files=None):
+        if json_body is not None:
+            response = self.client.post(path, json=json_body)
+        else:
+            data = dict(data or {})
+            for name, (filename, content, _) in (files or {}).items():
+                data[name] = (io.BytesIO(content), filename)
+            response = self.client.post(path, data=data, content_type='multipart/form-data' if files else None)
+        return response.status_code, response.get_data(as_text=True)
+
+
+class _NoRedirect(urllib.request.HTTPRedirectHandler):
+    def redirect_request(self, *args, **kwargs):
+        return None
+
+
+class HttpSession:
+    def __init__(self, base_url):
+        self.base_url = base_url
+        self.opener = urllib.request.build_opener(urllib.request.HTTPCookieProcessor(http.cookiejar.CookieJar()), _NoRedirect)
+
+    def _send(self, request):
+        try:
+            with self.opener.open(request, timeout=60) as response:
+                return response.status, response.read().decode('utf-8', 'replace')
+        except urllib.error.HTTPError as exc:
+            return exc.code, exc.read().decode('utf-8', 'replace')
+
+    def get(self, path):
+        return self._send(urllib.request.Request(self.base_url + path))
+
+    def post(self, path, data=None, json_body=None, files=None):
+        if json_body is not None:
+            body, content_type = json.dumps(json_body).encode(), 'application/json'
+        elif files:
+            body, content_type = _multipart(data or {}, files)
+        else:
+            body, content_type = urllib.parse.urlencode(data or {}).encode(), 'application/x-www-form-urlencoded'
+        return self._send(urllib.request.Request(self.base_url + path, data=body, headers={'Content-Type': content_type}))
+
+
+def _multipart(fields, files):
+    boundary = secrets.token_hex(16)
+    parts = []
+    for name, value in fields.items():
+        parts.append(f'--{boundary}\r\nContent-Disposition: form-data; name="{name}"\r\n\r\n{value}\r\n'.encode())
+    for name, (filename, content, content_type) in files.items():
+        parts.append(
+            f'--{boundary}\r\nContent-Disposition: form-data; name="{name}"; filename="{filename}"\r\n'
+            f'Content-Type: {content_type}\r\n\r\n'.encode() + content + b'\r\n'
+        )
+    parts.append(f'--{boundary}--\r\n'.encode())
+    return b''.join(parts), f'multipart/form-data; boundary={boundary}'
+
+
+def login(session, email, password):
+    status, _ = session.post('/api/v1/login', json_body={'email': email, 'password': password})
+    if status != 200:
+        raise SystemExit(f'could not log in as {email} ({status})')
+
+
+class Fixtures:
+    def __init__(self, app, requests, password):
+        from app import db
+        from models import User, TrashPost, Offer
+        import transitions
+
+        self.password = password
+        with app.app_context():
+            # The busiest seller and collector make the dashboards representative of a heavy account.
+            self.seller = db.session.query(User).join(TrashPost, TrashPost.user_id == User.id).filter(
+                User.user_type == 'user'
+            ).group_by(User.id).order_by(db.func.count(TrashPost.id).desc()).first()
+            self.collector = db.session.query(User).join(TrashPost, TrashPost.collector_id == User.id).group_by(
+                User.id
+            ).order_by(db.func.count(TrashPost.id).desc()).first()
+            if self.seller is None or self.collector is None:
+                raise SystemExit('No data to benchmark; run benchmarks/generate_data.py first.')
+            self.seller_email, self.collector_email = self.seller.email, self.collector.email
+
+            # Offers the collector has not bid on yet, and the seller's own posts to accept bids on.
+            offered = db.session.query(Offer.post_id).filter(Offer.collector_id == self.collector.id, Offer.open_filter())
+            available = TrashPost.query.filter(TrashPost.status == 'available', TrashPost.user_id != self.seller.id, TrashPost.id.not_in(offered))
+            self.offer_posts = [(p.id, p.quantity) for p in available.order_by(TrashPost.id).limit(requests)]
+            own = TrashPost.query.filter_by(user_id=self.seller.id, status='available').order_by(TrashPost.id).limit(requests).all()
+            self.accept_offers = []
+            for post in own:
+                existing = Offer.query.filter(Offer.post_id == post.id, Offer.collector_id == self.collector.id, Offer.open_filter()).first()
+                if existing is None and transitions.place_offer(post, self.collector.id, float(post.quantity), post.price_per_kg):
+                    db.session.flush()
+                    existing = Offer.query.filter(Offer.post_id == post.id, Offer.collector_id == self.collector.id, Offer.open_filter()).first()
+                if existing is not None:
+                    self.accept_offers.append(existing.id)
+            db.session.commit()
+            self.query = TrashPost.query.filter_by(status='available').order_by(TrashPost.id.desc()).first().trash_type.split()[0]
+        self._lock = threading.Lock()
+
+    def take(self, name):
+        with self._lock:
+            items = getattr(self, name)
+            return items.pop() if items else None
+
+
+def scenario_calls(name, fixtures, image):
+    if name == 'posts':
+        return 'anonymous', lambda s: s.get('/posts')
+    if name == 'posts_search':
+        return 'anonymous', lambda s: s.get('/posts?query=' + urllib.parse.quote(fixtures.query))
+    if name == 'user_dashboard':
+        return 'seller', lambda s: s.get('/dashboard')
+    if name == 'collector_dashboard':
+        return 'collector', lambda s: s.get('/collector/dashboard')
+
+    if name == 'make_offer':
+        def make_offer(s):
+            taken = fixtures.take('offer_posts')
+            if taken is None:
+                return None
+            post_id, quantity = taken
+            return s.post(f'/post/{post_id}/offer', data={'final_weight': str(quantity), 'final_price_per_kg': '10.00'})
+        return 'collector', make_offer
+
+    if name == 'accept_offer':
+        def accept_offer(s):
+            offer_id = fixtures.take('accept_offers')
+            if offer_id is None:
+                return None
+            return s.post(f'/offer/{offer_id}/accept')
+        return 'seller', accept_offer
+
+    def create_post(s):
+        status, body = s.get('/post/new')
+        token = CSRF.search(body)
+        data = {
+            'trash_type': 'benchmark plastic', 'quantity': '25', 'price_per_kg': '12.50', 'location': 'Mirpur, Dhaka',
+            'description': 'Created by the benchmark suite.', 'phone_number': '01700000000', 'is_negotiable': 'y',
+        }
+        if token:
+            data['csrf_token'] = token.group(1)
+        return s.post('/post/new', data=data, files={'picture': ('bench.png', image, 'image/png')})
+    return 'seller', create_post
+
+
+def run_scenario(call, sessions, requests, concurrency, warmup=0):
+    for session in sessions[:concurrency]:
+        for _ in range(warmup):
+            call(session)
+    latencies, errors = [], []
+    lock = threading.Lock()
+    remaining = [requests]
+
+    def worker(session):
+        while True:
+            with lock:
+                if remaining[0] <= 0:
+                    return
+                remaining[0] -= 1
+            started = time.perf_counter()
+            result = call(session)
+            elapsed = time.perf_counter() - started
+            if result is None:
+                return
+            with lock:
+                latencies.append(elapsed)
+                # Form posts answer with a redirect on success.
+                if result[0] >= 400:
+                    errors.append(result[0])
+
+    started = time.perf_counter()
+    threads = [threading.Thread(target=worker, args=(session,)) for session in sessions[:concurrency]]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    wall = time.perf_counter() - started
+    return {
+        'requests': len(latencies),
+        'errors': len(errors),
+        'p50_ms': round(percentile(latencies, 0.50) * 1000, 2),
+        'p99_ms': round(percentile(latencies, 0.99) * 1000, 2),
+        'rps': round(len(latencies) / wall, 1) if wall else 0.0,
+    }
+
+
+def _free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def _children(pid):
+    found = []
+    for entry in os.listdir('/proc'):
+        if entry.isdigit():
+            try:
+                with open(f'/proc/{entry}/stat') as f:
+                    if int(f.read().rsplit(')', 1)[1].split()[1]) == pid:
+                        found.append(int(entry))
+            except (OSError, IndexError, ValueError):
+                pass
+    return found
+
+
+def _peak_rss_mb(pid):
+    try:
+        with open(f'/proc/{pid}/status') as f:
+            for line in f:
+                if line.startswith('VmHWM:'):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return 0.0
+
+
+class Gunicorn:
+    def __init__(self, workers, database_url):
+        if shutil.which('gunicorn') is None:
+            raise SystemExit('gunicorn is not installed; pip install -r requirements_for_vscode.txt or use --target client.')
+        self.port = _free_port()
+        root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+        env = dict(os.environ, DATABASE_URL=database_url)
+        self.process = subprocess.Popen(
+            ['gunicorn', '-w', str(workers), '-b', f'127.0.0.1:{self.port}', '--log-level', 'warning', 'main:app'],
+            cwd=root, env=env,
+        )
+        deadline = time.time() + 30
+        while time.time() < deadline:
+            try:
+                urllib.request.urlopen(f'{self.base_url}/how-it-works', timeout=2).read()
+                return
+            except OSError:
+                time.sleep(0.2)
+        self.stop()
+        raise SystemExit('gunicorn did not start within 30s')
+
+    @property
+    def base_url(self):
+        return f'http://127.0.0.1:{self.port}'
+
+    def peak_rss_mb(self):
+        return round(sum(_peak_rss_mb(pid) for pid in [self.process.pid] + _children(self.process.pid)), 1)
+
+    def stop(self):
+        self.process.send_signal(signal.SIGTERM)
+        try:
+            self.process.wait(10)
+        except subprocess.TimeoutExpired:
+            self.process.kill()
+
+
+def compare(results, baseline, threshold):
+    regressions = []
+    for name, current in results.items():
+        previous = baseline.get('scenarios', {}).get(name)
+        if not previous:
+            continue
+        for metric in METRICS:
+            before, after = previous.get(metric), current.get(metric)
+            if not before or after is None:
+                continue
+            # Latency regresses upwards, throughput downwards.
+            change = (after - before) / before if metric != 'rps' else (before - after) / before
+            current.setdefault('change', {})[metric] = round(change * 100, 1)
+            if change > threshold:
+                regressions.append(f'{name} {metric}: {before} -> {after} ({change * 100:+.0f}%)')
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Drive the hot pages and form posts and report latency, throughput and memory.')
+    parser.add_argument('--target', choices=('client', 'gunicorn'), default='client')
+    parser.add_argument('--database', help='SQLite file to benchmark (default: a fresh generated one)')
+    parser.add_argument('--scale', type=float, default=0.01, help='generator scale when no --database is given')
+    parser.add_argument('--requests', type=int, default=200, help='requests per scenario')
+    parser.add_argument('--write-requests', type=int, default=50, help='requests for make_offer, accept_offer and create_post')
+    parser.add_argument('--warmup', type=int, default=10, help='untimed read requests per client before each read scenario')
+    parser.add_argument('--concurrency', type=int, default=4, help='client threads (gunicorn target only)')
+    parser.add_argument('--workers', type=int, default=4, help='gunicorn workers')
+    parser.add_argument('--scenario', action='append', choices=SCENARIOS, help='run only these (repeatable)')
+    parser.add_argument('--trace-memory', action='store_true', help='report the Python heap peak per scenario (client target; slows requests)')
+    parser.add_argument('--save-baseline', metavar='PATH')
+    parser.add_argument('--compare', metavar='PATH')
+    parser.add_argument('--threshold', type=float, default=20.0, help='percent change that counts as a regression')
+    args = parser.parse_args()
+
+    folder = tempfile.mkdtemp()
+    if args.database:
+        database = os.path.abspath(args.database)
+    else:
+        database = os.path.join(folder, 'bench.db')
+    os.environ['DATABASE_URL'] = 'sqlite:///' + database
+
+    from app import create_app
+    from images import image_pipeline
+    from generate_data import PASSWORD, generate
+
+    # Keep benchmark uploads out of the working tree.
+    app = create_app({'UPLOAD_FOLDER': os.path.join(folder, 'post_pics')})
+    if not args.database:
+        generate(app, *(max(1, int(n * args.scale)) for n in (100_000, 1_000_000, 500_000)))
+
+    scenarios = args.scenario or SCENARIOS
+    writes = {'make_offer', 'accept_offer', 'create_post'}
+    fixtures = Fixtures(app, args.write_requests, PASSWORD)
+    image = png_bytes()
+
+    server = None
+    if args.target == 'gunicorn':
+        server = Gunicorn(args.workers, os.environ['DATABASE_URL'])
+        new_session = lambda: HttpSession(server.base_url)
+        concurrency = args.concurrency
+    else:
+        # The test client runs requests in this thread, so there is nothing to overlap.
+        new_session = lambda: ClientSession(app)
+        concurrency = 1
+
+    emails = {'seller': fixtures.seller_email, 'collector': fixtures.collector_email}
+    sessions = {}
+    for role in ('anonymous', 'seller', 'collector'):
+        sessions[role] = [new_session() for _ in range(concurrency)]
+        if role != 'anonymous':
+            for session in sessions[role]:
+                login(session, emails[role], PASSWORD)
+
+    results = {}
+    try:
+        for name in scenarios:
+            role, call = scenario_calls(name, fixtures, image)
+            if args.trace_memory and server is None:
+                tracemalloc.start()
+            if name in writes:
+                result = run_scenario(call, sessions[role], args.write_requests, concurrency)
+            else:
+                result = run_scenario(call, sessions[role], args.requests, concurrency, args.warmup)
+            if tracemalloc.is_tracing():
+                result['heap_peak_mb'] = round(tracemalloc.get_traced_memory()[1] / 2 ** 20, 1)
+                tracemalloc.stop()
+            results[name] = result
+        peak = server.peak_rss_mb() if server else round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1)
+    finally:
+        if server:
+            server.stop()
+        # Let queued thumbnails finish before their folder goes away.
+        image_pipeline.wait()
+
+    print(f"target={args.target} concurrency={concurrency} database={database}")
+    print(f"{'scenario':<20} {'reqs':>6} {'errs':>5} {'p50 ms':>9} {'p99 ms':>9} {'req/s':>8}")
+    for name, result in results.items():
+        print(f"{name:<20} {result['requests']:>6} {result['errors']:>5} {result['p50_ms']:>9.2f} {result['p99_ms']:>9.2f} {result['rps']:>8.1f}"
+              + (f"  heap peak {result['heap_peak_mb']} MB" if 'heap_peak_mb' in result else ''))
+    print(f"peak RSS: {peak} MB")
+
+    report = {'target': args.target, 'concurrency': concurrency, 'peak_rss_mb': peak, 'scenarios': results}
+    status = 0
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        if baseline.get('target') != args.target:
+            print(f"warning: baseline was taken against {baseline.get('target')}")
+        regressions = compare(results, baseline, args.threshold / 100)
+        print('\n'.join(['regressions:'] + regressions) if regressions else f'no regressions over {args.threshold:.0f}%')
+        status = 1 if regressions else 0
+    if args.save_baseline:
+        with open(args.save_baseline, 'w') as f:
+            json.dump(report, f, indent=2, sort_keys=True)
+        print(f'baseline written to {args.save_baseline}')
+    if any(result['errors'] for result in results.values()):
+        status = 1
+    shutil.rmtree(folder, ignore_errors=True)
+    return status
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,12 @@
+from app import create_app
+from assets import build_assets
+
+app = create_app()
+
+def build():
+    manifest = build_assets(app.static_folder, app.config['ASSETS_FOLDER'])
+    for name, hashed in sorted(manifest.items()):
+        print(f"{name} -> {hashed}")
+
+if __name__ == '__main__':
+    build()
@@ -0,0 +1,259 @@
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from functools import wraps
+from flask import current_app, make_response, render_template, request, session
+from flask_login import current_user
+from markupsafe import Markup
+
+
+class MemoryBackend:
+    def __init__(self, max_entries=2048):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._versions = {}
+        self._lock = threading.Lock()
+
+    def get_many(self, keys):
+        now = time.time()
+        found = {}
+        with self._lock:
+            for key in keys:
+                item = self._entries.get(key)
+                if item is None:
+                    continue
+                if item[1] < now:
+                    del self._entries[key]
+                    continue
+                self._entries.move_to_end(key)
+                found[key] = item[0]
+        return found
+
+    def set(self, key, value, ttl):
+        with self._lock:
+            self._entries[key] = (value, time.time() + ttl)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def delete(self, keys):
+        with self._lock:
+            for key in keys:
+                self._entries.pop(key, None)
+
+    def versions(self, names):
+        with self._lock:
+            return {name: self._versions.get(name, 0) for name in names}
+
+    def bump(self, names):
+        with self._lock:
+            for name in names:
+                self._versions[name] = self._versions.get(name, 0) + 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+class SQLiteBackend:
+    # One small SQLite file shared by every gunicorn worker on the host.
+
+    def __init__(self, path, max_entries=20000):
+        self.path = path
+        self.max_entries = max_entries
+        self._local = threading.local()
+        self._writes = 0
+        connection = self._connection()
+        connection.executescript(
+            "CREATE TABLE IF NOT EXISTS entries (key TEXT PRIMARY KEY, value BLOB, expires REAL);"
+            "CREATE INDEX IF NOT EXISTS ix_entries_expires ON entries (expires);"
+            "CREATE TABLE IF NOT EXISTS versions (name TEXT PRIMARY KEY, version INTEGER NOT NULL);"
+        )
+
+    def _connection(self):
+        connection = getattr(self._local, 'connection', None)
+        if connection is None or getattr(self._local, 'pid', None) != os.getpid():
+            connection = sqlite3.connect(self.path, timeout=5, isolation_level=None, check_same_thread=False)
+            connection.execute('PRAGMA journal_mode=WAL')
+            connection.execute('PRAGMA synchronous=NORMAL')
+            self._local.connection = connection
+            self._local.pid = os.getpid()
+        return connection
+
+    def get_many(self, keys):
+        if not keys:
+            return {}
+        placeholders = ','.join('?' * len(keys))
+        rows = self._connection().execute(
+            f"SELECT key, value FROM entries WHERE key IN ({placeholders}) AND expires >= ?", (*keys, time.time())
+        ).fetchall()
+        return {key: value.decode() if isinstance(value, bytes) else value for key, value in rows}
+
+    def set(self, key, value, ttl):
+        connection = self._connection()
+        connection.execute(
+            "INSERT OR REPLACE INTO entries (key, value, expires) VALUES (?, ?, ?)",
+            (key, value.encode() if isinstance(value, str) else value, time.time() + ttl)
+        )
+        self._writes += 1
+        if self._writes % 256 == 0:
+            # Entries that expire soonest go first, which approximates LRU for a fixed TTL.
+            connection.execute("DELETE FROM entries WHERE expires < ?", (time.time(),))
+            connection.execute(
+                "DELETE FROM entries WHERE key IN (SELECT key FROM entries ORDER BY expires DESC LIMIT -1 OFFSET ?)",
+                (self.max_entries,)
+            )
+
+    def delete(self, keys):
+        if keys:
+            self._connection().execute(f"DELETE FROM entries WHERE key IN ({','.join('?' * len(keys))})", tuple(keys))
+
+    def versions(self, names):
+        if not names:
+            return {}
+        placeholders = ','.join('?' * len(names))
+        rows = dict(self._connection().execute(
+            f"SELECT name, version FROM versions WHERE name IN ({placeholders})", tuple(names)
+        ).fetchall())
+        return {name: rows.get(name, 0) for name in names}
+
+    def bump(self, names):
+        self._connection().executemany(
+            "INSERT INTO versions (name, version) VALUES (?, 1) ON CONFLICT(name) DO UPDATE SET version = version + 1",
+            [(name,) for name in names]
+        )
+
+    def clear(self):
+        self._connection().execute("DELETE FROM entries")
+
+
+class PageCache:
+    def __init__(self, app=None):
+        self.app = None
+        self.local = None
+        self.shared = None
+        self.counters = {}
+        self._lock = threading.Lock()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.app = app
+        app.config.setdefault('PAGE_CACHE_ENABLED', True)
+        app.config.setdefault('PAGE_CACHE_TTL', 300)
+        app.config.setdefault('PAGE_CACHE_MAX_ENTRIES', 2048)
+        app.config.setdefault('PAGE_CACHE_BACKEND', os.environ.get('PAGE_CACHE_BACKEND', 'memory'))
+        app.config.setdefault('PAGE_CACHE_PATH', os.path.join(app.instance_path, 'page_cache.db'))
+
+        self.local = MemoryBackend(app.config['PAGE_CACHE_MAX_ENTRIES'])
+        if app.config['PAGE_CACHE_BACKEND'] == 'sqlite':
+            self.shared = SQLiteBackend(app.config['PAGE_CACHE_PATH'])
+        # Templates change on deploy; folding their mtimes into every key retires stale pages.
+        templates = os.path.join(app.root_path, app.template_folder)
+        self.salt = str(int(max(
+            (os.path.getmtime(os.path.join(root, name)) for root, _, names in os.walk(templates) for name in names),
+            default=0
+        )))
+        app.add_template_global(self.post_cards)
+
+    @property
+    def enabled(self):
+        return self.app is not None and self.app.config['PAGE_CACHE_ENABLED']
+
+    def _count(self, kind, outcome, n=1):
+        with self._lock:
+            self.counters[(kind, outcome)] = self.counters.get((kind, outcome), 0) + n
+
+    def stats(self):
+        with self._lock:
+            return {f'{kind}_{outcome}': n for (kind, outcome), n in sorted(self.counters.items())}
+
+    def _versions(self, names):
+        names = ['global'] + list(names)
+        return (self.shared or self.local).versions(names)
+
+    def _key(self, kind, ident, versions):
+        stamp = ','.join(f'{name}={version}' for name, version in sorted(versions.items()))
+        return f'{self.salt}:{kind}:{ident}:{stamp}'
+
+    def get_many(self, keys):
+        found = self.local.get_many(keys)
+        missing = [key for key in keys if key not in found]
+        if missing and self.shared:
+            shared = self.shared.get_many(missing)
+            for key, value in shared.items():
+                self.local.set(key, value, self.app.config['PAGE_CACHE_TTL'])
+            found.update(shared)
+        return found
+
+    def set(self, key, value):
+        ttl = self.app.config['PAGE_CACHE_TTL']
+        self.local.set(key, value, ttl)
+        if self.shared:
+            self.shared.set(key, value, ttl)
+
+    def bump(self, *names):
+        (self.shared or self.local).bump(names)
+
+    def invalidate_post(self, post_id):
+        self.invalidate_posts([post_id])
+
+    def invalidate_posts(self, post_ids):
+        self.bump('listings', *(f'post:{post_id}' for post_id in post_ids))
+
+    def invalidate_listings(self):
+        self.bump('listings')
+
+    def invalidate_all(self):
+        self.bump('global')
+
+    def post_cards(self, posts, template='partials/post_card.html'):
+        posts = list(posts)
+        if not self.enabled:
+            return [Markup(render_template(template, post=post)) for post in posts]
+
+        versions = self._versions([f'post:{post.id}' for post in posts])
+        keys = [self._key('card', post.id, {'global': versions['global'], 'post': versions[f'post:{post.id}']}) for post in posts]
+        found = self.get_many(keys)
+        self._count('fragment', 'hits', len(found))
+        self._count('fragment', 'misses', len(keys) - len(found))
+
+        cards = []
+        for post, key in zip(posts, keys):
+            html = found.get(key)
+            if html is None:
+                html = render_template(template, post=post)
+                self.set(key, html)
+            cards.append(Markup(html))
+        return cards
+
+    def cached_page(self, depends=lambda **view_args: ['listings']):
+        def decorator(view):
+            @wraps(view)
+            def wrapper(*args, **kwargs):
+                # Only anonymous GETs are shared; anything user-specific renders fresh.
+                if (not self.enabled or request.method != 'GET' or '_flashes' in session
+                        or current_user.is_authenticated):
+                    return view(*args, **kwargs)
+
+                key = self._key('page', request.full_path, self._versions(depends(**kwargs)))
+                body = self.get_many([key]).get(key)
+                if body is not None:
+                    self._count('page', 'hits')
+                    response = current_app.response_class(body, mimetype='text/html')
+                    response.headers['X-Cache'] = 'HIT'
+                    return response
+
+                self._count('page', 'misses')
+                response = make_response(view(*args, **kwargs))
+                if response.status_code == 200 and not response.is_streamed and response.mimetype == 'text/html':
+                    self.set(key, response.get_data(as_text=True))
+                response.headers['X-Cache'] = 'MISS'
+                return response
+            return wrapper
+        return decorator
+
+
+page_cache = PageCache()
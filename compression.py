@@ -0,0 +1,190 @@
+import zlib
+from werkzeug.http import parse_accept_header
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+COMPRESSIBLE_TYPES = frozenset((
+    'text/html', 'text/plain', 'text/css', 'text/csv', 'text/javascript', 'text/xml',
+    'application/javascript', 'application/json', 'application/xml', 'image/svg+xml',
+))
+
+
+class GzipStream:
+    def __init__(self, level):
+        # wbits 16+MAX_WBITS writes a gzip header and trailer around the deflate stream.
+        self._compressor = zlib.compressobj(level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+
+    def compress(self, data, flush=False):
+        out = self._compressor.compress(data)
+        return out + self._compressor.flush(zlib.Z_SYNC_FLUSH) if flush else out
+
+    def finish(self):
+        return self._compressor.flush()
+
+
+class BrotliStream:
+    def __init__(self, quality):
+        self._compressor = brotli.Compressor(quality=quality)
+
+    def compress(self, data, flush=False):
+        out = self._compressor.process(data)
+        return out + self._compressor.flush() if flush else out
+
+    def finish(self):
+        return self._compressor.finish()
+
+
+class CompressionMiddleware:
+    def __init__(self, app, level=6, brotli_quality=4, minimum_size=500, types=COMPRESSIBLE_TYPES):
+        self.app = app
+        self.level = level
+        self.brotli_quality = brotli_quality
+        self.minimum_size = minimum_size
+        self.types = types
+
+    def choose_encoding(self, accept_encoding):
+        accepted = parse_accept_header(accept_encoding or '')
+        if brotli is not None and accepted['br'] > 0:
+            return 'br'
+        if accepted['gzip'] > 0:
+            return 'gzip'
+        return None
+
+    def stream(self, encoding):
+        return BrotliStream(self.brotli_quality) if encoding == 'br' else GzipStream(self.level)
+
+    def _compressible(self, status, headers):
+        code = int(status.split(' ', 1)[0])
+        if code < 200 or code in (204, 206, 304):
+            return False
+        found = {name.lower(): value for name, value in headers}
+        content_type = found.get('content-type', '').split(';', 1)[0].strip().lower()
+        return (content_type in self.types
+                and 'content-encoding' not in found
+                and 'no-transform' not in found.get('cache-control', ''))
+
+    def __call__(self, environ, start_response):
+        if environ.get('REQUEST_METHOD') == 'HEAD':
+            return self.app(environ, start_response)
+        encoding = self.choose_encoding(environ.get('HTTP_ACCEPT_ENCODING'))
+
+        captured = {}
+        written = []
+
+        def capture(status, headers, exc_info=None):
+            captured.update(status=status, headers=headers, exc_info=exc_info)
+            return written.append
+
+        body = self.app(environ, capture)
+        return self._respond(body, written, captured, encoding, start_response)
+
+    def _respond(self, body, written, captured, encoding, start_response):
+        iterator = iter(body)
+        try:
+            # start_response may be called lazily, on the first chunk of a streamed body.
+            chunks = list(written)
+            while not captured:
+                chunks.append(next(iterator))
+        except StopIteration:
+            pass
+        except BaseException:
+            _close(body)
+            raise
+
+        status, headers = captured['status'], list(captured['headers'])
+        if not self._compressible(status, headers):
+            start_response(status, headers, captured['exc_info'])
+            return _passthrough(chunks, iterator, body)
+
+        headers = _vary_on_encoding(headers)
+        if encoding is None:
+            start_response(status, headers, captured['exc_info'])
+            return _passthrough(chunks, iterator, body)
+
+        length = next((value for name, value in headers if name.lower() == 'content-length'), None)
+        if length is not None and int(length) < self.minimum_size:
+            start_response(status, headers, captured['exc_info'])
+            return _passthrough(chunks, iterator, body)
+
+        if length is not None:
+            # The whole body is already in memory; compress it in one pass and keep a Content-Length.
+            try:
+                data = b''.join(chunks) + b''.join(iterator)
+            finally:
+                _close(body)
+            stream = self.stream(encoding)
+            data = stream.compress(data) + stream.finish()
+            headers = _encoded_headers(headers, encoding) + [('Content-Length', str(len(data)))]
+            start_response(status, headers, captured['exc_info'])
+            return [data]
+
+        # Streamed bodies: hold back small ones so they can still skip compression.
+        size = sum(map(len, chunks))
+        try:
+            while size < self.minimum_size:
+                chunk = next(iterator)
+                chunks.append(chunk)
+                size += len(chunk)
+        except StopIteration:
+            _close(body)
+            data = b''.join(chunks)
+            headers = [(n, v) for n, v in headers if n.lower() != 'content-length'] + [('Content-Length', str(len(data)))]
+            start_response(status, headers, captured['exc_info'])
+            return [data]
+        except BaseException:
+            _close(body)
+            raise
+
+        start_response(status, _encoded_headers(headers, encoding), captured['exc_info'])
+        return self._compress_stream(self.stream(encoding), chunks, iterator, body)
+
+    def _compress_stream(self, stream, chunks, iterator, body):
+        try:
+            if chunks:
+                yield stream.compress(b''.join(chunks), flush=True)
+            for chunk in iterator:
+                if chunk:
+                    # Flushing per chunk keeps streamed pages progressive at a small cost in ratio.
+                    yield stream.compress(chunk, flush=True)
+            yield stream.finish()
+        finally:
+            _close(body)
+
+
+def _close(body):
+    close = getattr(body, 'close', None)
+    if close is not None:
+        close()
+
+
+def _passthrough(chunks, iterator, body):
+    try:
+        yield from chunks
+        yield from iterator
+    finally:
+        _close(body)
+
+
+def _vary_on_encoding(headers):
+    for i, (name, value) in enumerate(headers):
+        if name.lower() == 'vary':
+            if 'accept-encoding' not in value.lower() and value.strip() != '*':
+                headers[i] = (name, f'{value}, Accept-Encoding')
+            return headers
+    return headers + [('Vary', 'Accept-Encoding')]
+
+
+def _encoded_headers(headers, encoding):
+    encoded = []
+    for name, value in headers:
+        lower = name.lower()
+        if lower == 'content-length':
+            continue
+        if lower == 'etag' and not value.startswith('W/'):
+            # The bytes differ from the identity encoding, so a strong validator no longer holds.
+            value = 'W/' + value
+        encoded.append((name, value))
+    return encoded + [('Content-Encoding', encoding)]
@@ -0,0 +1,66 @@
+import hashlib
+from datetime import timezone
+from functools import wraps
+from flask import current_app, make_response, request, session
+from app import db
+from models import TrashPost, ArchivedPost
+from cache import page_cache
+
+
+def _http_date(value):
+    return value.replace(tzinfo=timezone.utc, microsecond=0) if value else None
+
+
+def _finish(response, etag, last_modified):
+    response.set_etag(etag, weak=True)
+    if last_modified:
+        response.last_modified = last_modified
+    # Browsers keep the page but must ask again, which the validator makes a cheap question.
+    response.cache_control.no_cache = True
+    response.vary.add('Cookie')
+    return response
+
+
+def conditional(validator):
+    # validator(**view_args) -> (parts, last_modified), or None when there is nothing to validate.
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            if request.method != 'GET':
+                return view(*args, **kwargs)
+            result = validator(**kwargs)
+            if result is None:
+                return view(*args, **kwargs)
+
+            parts, last_modified = result
+            # The navigation bar differs per visitor, so the session's user is part of the tag.
+            seed = '|'.join(map(str, (page_cache.salt, session.get('_user_id', ''), *parts)))
+            etag = hashlib.sha1(seed.encode()).hexdigest()[:20]
+            last_modified = _http_date(last_modified)
+
+            if request.if_none_match:
+                fresh = request.if_none_match.contains_weak(etag)
+            else:
+                fresh = bool(last_modified and request.if_modified_since and last_modified <= request.if_modified_since)
+            if fresh:
+                return _finish(current_app.response_class(status=304), etag, last_modified)
+            response = make_response(view(*args, **kwargs))
+            return _finish(response, etag, last_modified) if response.status_code == 200 else response
+        return wrapper
+    return decorator
+
+
+def listing_validator(**view_args):
+    count, newest, updated, completed = TrashPost.listing_validator()
+    # No Last-Modified: deleting or archiving a post shrinks the list without moving any of these times
+    # forward, so an If-Modified-Since answer would keep showing it. Only the ETag carries the count.
+    return (count, newest, updated, completed), None
+
+
+def post_validator(post_id):
+    updated = db.session.execute(db.select(TrashPost.updated_at).where(TrashPost.id == post_id)).scalar()
+    if updated is None:
+        updated = db.session.execute(db.select(ArchivedPost.updated_at).where(ArchivedPost.id == post_id)).scalar()
+    if updated is None:
+        return None
+    return (post_id, updated), updated
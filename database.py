@@ -0,0 +1,59 @@
+import os
+import sqlite3
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+SQLITE_PRAGMAS = {
+    'journal_mode': 'WAL',
+    'synchronous': 'NORMAL',
+    'busy_timeout': 5000,
+    'mmap_size': 256 * 1024 * 1024,
+    'cache_size': -64000,
+    'temp_store': 'MEMORY',
+}
+
+
+def apply_sqlite_pragmas(dbapi_connection, pragmas=None):
+    cursor = dbapi_connection.cursor()
+    for name, value in (pragmas or SQLITE_PRAGMAS).items():
+        cursor.execute(f'PRAGMA {name}={value}')
+    cursor.close()
+
+
+@event.listens_for(Engine, 'connect')
+def _on_connect(dbapi_connection, connection_record):
+    if isinstance(dbapi_connection, sqlite3.Connection):
+        apply_sqlite_pragmas(dbapi_connection)
+
+
+def include_in_migrations(name, type_, parent_names):
+    # The FTS5 table and its shadow tables are managed by search.py, not by Alembic.
+    return not (type_ == 'table' and name.startswith('trash_post_fts'))
+
+
+def database_uri(default_path):
+    uri = os.environ.get('DATABASE_URL', 'sqlite:///' + default_path)
+    # Some hosts still hand out the pre-SQLAlchemy-1.4 scheme.
+    if uri.startswith('postgres://'):
+        uri = 'postgresql://' + uri[len('postgres://'):]
+    return uri
+
+
+def engine_options(uri):
+    if uri.startswith('sqlite'):
+        # Give pysqlite's own lock wait the same budget as busy_timeout.
+        return {'connect_args': {'timeout': SQLITE_PRAGMAS['busy_timeout'] / 1000}}
+    return {
+        'pool_size': int(os.environ.get('DB_POOL_SIZE', 5)),
+        'max_overflow': int(os.environ.get('DB_MAX_OVERFLOW', 10)),
+        'pool_timeout': int(os.environ.get('DB_POOL_TIMEOUT', 30)),
+        'pool_recycle': int(os.environ.get('DB_POOL_RECYCLE', 1800)),
+        'pool_pre_ping': True,
+    }
+
+
+def configure_database(app, default_path):
+    SQLITE_PRAGMAS['busy_timeout'] = int(os.environ.get('SQLITE_BUSY_TIMEOUT', SQLITE_PRAGMAS['busy_timeout']))
+    uri = database_uri(default_path)
+    app.config['SQLALCHEMY_DATABASE_URI'] = uri
+    app.config.setdefault('SQLALCHEMY_ENGINE_OPTIONS', engine_options(uri))
@@ -0,0 +1,139 @@
+import csv
+import importlib.util
+import io
+from functools import partial
+from app import db
+from models import User, TrashPost, ArchivedPost
+
+# pyarrow is a heavy import; only the Arrow and Parquet exports load it.
+HAS_PYARROW = importlib.util.find_spec('pyarrow') is not None
+
+EXPORT_BATCH = 2000
+COLUMNS = (
+    'post_id', 'completed_at', 'trash_type', 'location', 'seller_id', 'seller', 'collector_id', 'collector',
+    'quantity', 'final_weight_kg', 'price_per_kg', 'final_price_per_kg', 'total_transaction_value',
+    'platform_profit', 'seller_earnings',
+)
+FORMULA_PREFIXES = ('=', '+', '-', '@', '\t', '\r')
+
+
+def _completed(model, start, end, trash_type, seller_id, collector_id):
+    seller, collector = db.aliased(User), db.aliased(User)
+    query = db.select(
+        model.id, model.completed_at, model.trash_type, model.location,
+        model.user_id, seller.username, model.collector_id, collector.username,
+        model.quantity, model.final_weight_kg, model.price_per_kg, model.final_price_per_kg,
+        model.total_transaction_value, model.platform_profit
+    ).outerjoin(seller, seller.id == model.user_id).outerjoin(
+        collector, collector.id == model.collector_id
+    ).where(model.status == 'completed')
+    if start is not None:
+        query = query.where(model.completed_at >= start)
+    if end is not None:
+        query = query.where(model.completed_at < end)
+    if trash_type:
+        query = query.where(db.func.lower(db.func.trim(model.trash_type)) == trash_type.strip().lower())
+    if seller_id is not None:
+        query = query.where(model.user_id == seller_id)
+    if collector_id is not None:
+        query = query.where(model.collector_id == collector_id)
+    return query.order_by(model.completed_at, model.id)
+
+
+def transactions(start=None, end=None, trash_type=None, seller_id=None, collector_id=None, batch=EXPORT_BATCH):
+    # Yields lists of rows off a server-side cursor, so memory stays flat however long the history is.
+    # Archived sales come first: the archive only ever takes the oldest ones, so the output stays in time order.
+    for model in (ArchivedPost, TrashPost):
+        result = db.session.execute(
+            _completed(model, start, end, trash_type, seller_id, collector_id).execution_options(yield_per=batch)
+        )
+        for rows in result.partitions():
+            yield [_values(row) for row in rows]
+
+
+def _values(row):
+    value, profit = row[-2], row[-1]
+    earnings = value - profit if value is not None and profit is not None else None
+    return (*row, earnings)
+
+
+def _cell(value):
+    # Spreadsheets run a cell that starts with one of these as a formula; the quote makes it plain text.
+    if isinstance(value, str) and value.startswith(FORMULA_PREFIXES):
+        return "'" + value
+    return value
+
+
+def csv_stream(batches):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(COLUMNS)
+    for rows in batches:
+        writer.writerows([_cell(value) for value in row] for row in rows)
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+    yield buffer.getvalue()
+
+
+class _Chunks(io.RawIOBase):
+    # A write-only file that hands back whatever the writer has produced since the last drain.
+
+    def __init__(self):
+        self._chunks = []
+        self._position = 0
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        self._position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self._position
+
+    def drain(self):
+        data = b''.join(self._chunks)
+        self._chunks.clear()
+        return data
+
+
+def arrow_schema():
+    import pyarrow
+
+    money = pyarrow.decimal128(12, 2)
+    return pyarrow.schema([
+        ('post_id', pyarrow.int64()), ('completed_at', pyarrow.timestamp('us')),
+        ('trash_type', pyarrow.string()), ('location', pyarrow.string()),
+        ('seller_id', pyarrow.int64()), ('seller', pyarrow.string()),
+        ('collector_id', pyarrow.int64()), ('collector', pyarrow.string()),
+        ('quantity', pyarrow.int64()), ('final_weight_kg', pyarrow.float64()),
+        ('price_per_kg', money), ('final_price_per_kg', money), ('total_transaction_value', money),
+        ('platform_profit', money), ('seller_earnings', money),
+    ])
+
+
+def arrow_stream(batches, parquet=False):
+    import pyarrow
+    import pyarrow.ipc
+    import pyarrow.parquet
+
+    # Each batch becomes one Parquet row group (or one IPC record batch) and is sent as soon as it is written.
+    schema = arrow_schema()
+    sink = _Chunks()
+    writer = pyarrow.parquet.ParquetWriter(sink, schema) if parquet else pyarrow.ipc.new_stream(sink, schema)
+    for rows in batches:
+        writer.write_batch(pyarrow.record_batch(
+            [pyarrow.array(column, type=field.type) for column, field in zip(zip(*rows), schema)], schema=schema
+        ))
+        yield sink.drain()
+    writer.close()
+    yield sink.drain()
+
+
+FORMATS = {'csv': ('text/csv', csv_stream)}
+if HAS_PYARROW:
+    FORMATS['parquet'] = ('application/vnd.apache.parquet', partial(arrow_stream, parquet=True))
+    FORMATS['arrow'] = ('application/vnd.apache.arrow.stream', arrow_stream)
@@ -0,0 +1,234 @@
+import json
+import os
+import queue
+import sqlite3
+import threading
+import time
+from flask import current_app, request, url_for
+from flask_login import login_required
+
+# Events every client gets regardless of its filters: they only name posts the page may be showing.
+UNFILTERED = ('post_removed',)
+
+
+class EventLog:
+    # Append-only SQLite file next to the app database; every gunicorn worker on the host reads and writes it.
+
+    def __init__(self, path, retention=10000):
+        self.path = path
+        self.retention = retention
+        self._local = threading.local()
+        self._writes = 0
+        self._connection().executescript(
+            "CREATE TABLE IF NOT EXISTS events ("
+            " id INTEGER PRIMARY KEY AUTOINCREMENT, created REAL NOT NULL, kind TEXT NOT NULL,"
+            " trash_type TEXT, location TEXT, data TEXT NOT NULL);"
+        )
+
+    def _connection(self):
+        connection = getattr(self._local, 'connection', None)
+        if connection is None or getattr(self._local, 'pid', None) != os.getpid():
+            connection = sqlite3.connect(self.path, timeout=5, isolation_level=None, check_same_thread=False)
+            connection.execute('PRAGMA journal_mode=WAL')
+            connection.execute('PRAGMA synchronous=NORMAL')
+            self._local.connection = connection
+            self._local.pid = os.getpid()
+        return connection
+
+    def append(self, kind, data, trash_type=None, location=None):
+        connection = self._connection()
+        event_id = connection.execute(
+            "INSERT INTO events (created, kind, trash_type, location, data) VALUES (?, ?, ?, ?, ?)",
+            (time.time(), kind, trash_type, location, json.dumps(data, default=str))
+        ).lastrowid
+        self._writes += 1
+        if self._writes % 256 == 0:
+            connection.execute("DELETE FROM events WHERE id <= ?", (event_id - self.retention,))
+        return event_id
+
+    def since(self, last_id, limit=500):
+        return self._connection().execute(
+            "SELECT id, kind, trash_type, location, data FROM events WHERE id > ? ORDER BY id LIMIT ?", (last_id, limit)
+        ).fetchall()
+
+    def bounds(self):
+        oldest, newest = self._connection().execute("SELECT min(id), max(id) FROM events").fetchone()
+        return oldest or 0, newest or 0
+
+
+class FeedHub:
+    # One poller thread per worker reads the log and fans each batch out to that worker's open streams.
+
+    def __init__(self, app=None):
+        self.app = None
+        self.log = None
+        self._subscribers = set()
+        self._lock = threading.Lock()
+        self._thread = None
+        self._pid = None
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.app = app
+        app.config.setdefault('FEED_PATH', os.path.join(app.instance_path, 'feed.db'))
+        app.config.setdefault('FEED_RETENTION', 10000)
+        app.config.setdefault('FEED_POLL_INTERVAL', 0.5)
+        app.config.setdefault('FEED_HEARTBEAT', 15)
+        # Every open stream holds a server thread for its whole life. Under gunicorn's gthread workers
+        # (gunicorn.conf.py) that is one of GUNICORN_THREADS, so streams may take half of them and the rest
+        # stay free for page requests. Streams still end after a while and the browser resumes with
+        # Last-Event-ID, which lets a worker restart without waiting on them.
+        app.config.setdefault('FEED_MAX_SECONDS', 300)
+        app.config.setdefault('FEED_MAX_CLIENTS', max(1, int(os.environ.get('GUNICORN_THREADS', 16)) // 2))
+        # A single-threaded server (gunicorn's sync worker) is blocked by the stream and kills the worker
+        # after its 30s timeout, so there a stream gives the worker back well before that.
+        app.config.setdefault('FEED_SYNC_MAX_SECONDS', 20)
+        self.log = EventLog(app.config['FEED_PATH'], app.config['FEED_RETENTION'])
+        app.add_url_rule('/feed', 'feed', login_required(stream_feed))
+
+    def publish(self, kind, post=None, **data):
+        if self.log is None:
+            return None
+        trash_type = location = None
+        if post is not None:
+            trash_type, location = post.trash_type, post.location
+            data.setdefault('post_id', post.id)
+        return self.log.append(kind, data, trash_type, location)
+
+    def post_created(self, post):
+        return self.publish(
+            'post_created', post,
+            trash_type=post.trash_type, location=post.location, quantity=post.quantity,
+            price_per_kg=post.price_per_kg, seller=post.owner.username,
+            latitude=post.latitude, longitude=post.longitude,
+            url=url_for('main.view_post', post_id=post.id),
+        )
+
+    def posts_removed(self, post_ids, reason):
+        if post_ids:
+            return self.publish('post_removed', post_ids=list(post_ids), reason=reason)
+
+    def subscribe(self):
+        subscriber = queue.Queue(maxsize=100)
+        with self._lock:
+            if len(self._subscribers) >= self.app.config['FEED_MAX_CLIENTS']:
+                return None
+            self._subscribers.add(subscriber)
+            # A forked worker inherits the attribute but not the thread.
+            if self._thread is None or not self._thread.is_alive() or self._pid != os.getpid():
+                self._pid = os.getpid()
+                self._thread = threading.Thread(target=self._poll, name='feed-hub', daemon=True)
+                self._thread.start()
+        return subscriber
+
+    def unsubscribe(self, subscriber):
+        with self._lock:
+            self._subscribers.discard(subscriber)
+
+    def is_subscribed(self, subscriber):
+        with self._lock:
+            return subscriber in self._subscribers
+
+    def _poll(self):
+        last_id = self.log.bounds()[1]
+        interval = self.app.config['FEED_POLL_INTERVAL']
+        while True:
+            with self._lock:
+                subscribers = list(self._subscribers)
+                if not subscribers:
+                    self._thread = None
+                    return
+            rows = self.log.since(last_id)
+            if rows:
+                last_id = rows[-1][0]
+                for subscriber in subscribers:
+                    try:
+                        subscriber.put_nowait(rows)
+                    except queue.Full:
+                        # A stalled client gets dropped; its browser resumes from Last-Event-ID.
+                        self.unsubscribe(subscriber)
+            time.sleep(interval)
+
+
+feed_hub = FeedHub()
+
+
+def _terms(name):
+    return [term.strip().lower() for value in request.args.getlist(name) for term in value.split(',') if term.strip()]
+
+
+def matches(row, trash_types, areas):
+    _, kind, trash_type, location, _ = row
+    if kind in UNFILTERED:
+        return True
+    if trash_types and not any(term in (trash_type or '').lower() for term in trash_types):
+        return False
+    if areas and not any(term in (location or '').lower() for term in areas):
+        return False
+    return True
+
+
+def format_event(row):
+    event_id, kind, _, _, data = row
+    return f'id: {event_id}\nevent: {kind}\ndata: {data}\n\n'
+
+
+def stream_feed():
+    config = current_app.config
+    heartbeat, max_seconds = config['FEED_HEARTBEAT'], config['FEED_MAX_SECONDS']
+    if not request.environ.get('wsgi.multithread'):
+        max_seconds = min(max_seconds, config['FEED_SYNC_MAX_SECONDS'])
+    trash_types, areas = _terms('trash_type'), _terms('area')
+    log = feed_hub.log
+    oldest, newest = log.bounds()
+
+    resume = request.headers.get('Last-Event-ID') or request.args.get('last_event_id')
+    try:
+        last_id = int(resume) if resume else newest
+    except ValueError:
+        last_id = newest
+
+    subscriber = feed_hub.subscribe()
+    if subscriber is None:
+        return current_app.response_class('retry: 30000\n\n', status=503, mimetype='text/event-stream')
+
+    def generate():
+        sent = last_id
+        try:
+            yield f'retry: {int(config["FEED_POLL_INTERVAL"] * 1000) + 2000}\n\n'
+            if resume and (sent > newest or (oldest and sent < oldest - 1)):
+                # The log no longer reaches back that far; the page has to reload to catch up.
+                yield f'id: {newest}\nevent: reset\ndata: {{}}\n\n'
+                sent = newest
+            # Subscribed before replaying, so nothing published in between can fall through the gap.
+            backlog = log.since(sent)
+            while backlog:
+                for row in backlog:
+                    if matches(row, trash_types, areas):
+                        yield format_event(row)
+                sent = backlog[-1][0]
+                backlog = log.since(sent)
+
+            deadline = time.monotonic() + max_seconds
+            while time.monotonic() < deadline:
+                try:
+                    rows = subscriber.get(timeout=max(0, min(heartbeat, deadline - time.monotonic())))
+                except queue.Empty:
+                    if not feed_hub.is_subscribed(subscriber):
+                        return
+                    yield ': ping\n\n'
+                    continue
+                for row in rows:
+                    if row[0] > sent:
+                        sent = row[0]
+                        if matches(row, trash_types, areas):
+                            yield format_event(row)
+        finally:
+            feed_hub.unsubscribe(subscriber)
+
+    response = current_app.response_class(generate(), mimetype='text/event-stream')
+    response.headers['Cache-Control'] = 'no-cache'
+    # Tell nginx-style proxies not to buffer the stream.
+    response.headers['X-Accel-Buffering'] = 'no'
+    return response
@@ -1,7 +1,7 @@
 from flask_wtf import FlaskForm
 from flask_wtf.file import FileField, FileAllowed 
-from wtforms import StringField, PasswordField, SubmitField, BooleanField, TextAreaField, DecimalField, IntegerField, SelectField
-from wtforms.validators import DataRequired, Length, Email, EqualTo, ValidationError, Optional
+from wtforms import StringField, PasswordField, SubmitField, BooleanField, TextAreaField, DecimalField, IntegerField, SelectField, FloatField
+from wtforms.validators import DataRequired, Length, Email, EqualTo, ValidationError, Optional, NumberRange
 from models import User
 
 class RegistrationForm(FlaskForm):
@@ -42,6 +42,8 @@ class PostForm(FlaskForm):
     
     phone_number = StringField('Contact Phone Number', validators=[DataRequired(), Length(min=11, max=15)])
     google_map_link = StringField('Google Maps Link (Optional)', validators=[Optional(), Length(max=500)])
+    latitude = FloatField('Latitude (Optional)', validators=[Optional(), NumberRange(min=-90, max=90)])
+    longitude = FloatField('Longitude (Optional)', validators=[Optional(), NumberRange(min=-180, max=180)])
     
     is_negotiable = BooleanField('Price is Negotiable')
     
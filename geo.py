@@ -0,0 +1,104 @@
+import math
+import re
+from urllib.parse import parse_qs, unquote, urlparse
+
+EARTH_RADIUS_KM = 6371.0088
+KM_PER_DEGREE = 111.32
+GEOHASH_PRECISION = 9
+BASE32 = '0123456789bcdefghjkmnpqrstuvwxyz'
+
+_COORDS = r'(-?\d{1,2}(?:\.\d+)?),\s*(-?\d{1,3}(?:\.\d+)?)'
+# Google Maps puts the pin in several places depending on how the link was copied.
+MAP_LINK_PATTERNS = (
+    re.compile(r'!3d(-?\d+(?:\.\d+)?)!4d(-?\d+(?:\.\d+)?)'),
+    re.compile(r'@' + _COORDS),
+)
+MAP_LINK_PARAMS = ('q', 'query', 'll', 'center', 'destination', 'daddr')
+
+
+def valid_coordinates(latitude, longitude):
+    return latitude is not None and longitude is not None and -90 <= latitude <= 90 and -180 <= longitude <= 180
+
+
+def parse_map_link(link):
+    if not link:
+        return None
+    link = unquote(link.strip())
+    for pattern in MAP_LINK_PATTERNS:
+        match = pattern.search(link)
+        if match:
+            coordinates = float(match.group(1)), float(match.group(2))
+            return coordinates if valid_coordinates(*coordinates) else None
+
+    query = parse_qs(urlparse(link).query)
+    for name in MAP_LINK_PARAMS:
+        for value in query.get(name, ()):
+            match = re.fullmatch(r'\s*(?:loc:)?' + _COORDS + r'\s*', value)
+            if match:
+                coordinates = float(match.group(1)), float(match.group(2))
+                if valid_coordinates(*coordinates):
+                    return coordinates
+    # Short links (maps.app.goo.gl/...) only resolve over the network, which we do not do here.
+    return None
+
+
+def encode_geohash(latitude, longitude, precision=GEOHASH_PRECISION):
+    lat_range, lon_range = [-90.0, 90.0], [-180.0, 180.0]
+    chars, bits, value, even = [], 0, 0, True
+    while len(chars) < precision:
+        target, bounds = (longitude, lon_range) if even else (latitude, lat_range)
+        middle = (bounds[0] + bounds[1]) / 2
+        value <<= 1
+        if target >= middle:
+            value |= 1
+            bounds[0] = middle
+        else:
+            bounds[1] = middle
+        even = not even
+        bits += 1
+        if bits == 5:
+            chars.append(BASE32[value])
+            bits, value = 0, 0
+    return ''.join(chars)
+
+
+def cell_size(precision):
+    # Height and width in degrees of one geohash cell; longitude gets the extra bit on odd lengths.
+    lon_bits = (precision * 5 + 1) // 2
+    lat_bits = precision * 5 // 2
+    return 180.0 / 2 ** lat_bits, 360.0 / 2 ** lon_bits
+
+
+def haversine_km(lat1, lon1, lat2, lon2):
+    phi1, phi2 = math.radians(lat1), math.radians(lat2)
+    dphi, dlambda = phi2 - phi1, math.radians(lon2 - lon1)
+    a = math.sin(dphi / 2) ** 2 + math.cos(phi1) * math.cos(phi2) * math.sin(dlambda / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * math.asin(min(1.0, math.sqrt(a)))
+
+
+def degree_spans(latitude, radius_km):
+    # Half the height and width, in degrees, of the box around a circle of radius_km.
+    return radius_km / KM_PER_DEGREE, radius_km / max(KM_PER_DEGREE * math.cos(math.radians(latitude)), 1e-6)
+
+
+def covering_prefixes(latitude, longitude, radius_km, max_cells=32):
+    # Every cell of the finest precision that covers the circle's bounding box in at most max_cells cells.
+    # Each prefix is one range scan on the (status, geohash) index, so the scan stays close to the box
+    # instead of reaching into neighbouring cells as big as the radius.
+    lat_span, lon_span = degree_spans(latitude, radius_km)
+    south, north = max(-90.0, latitude - lat_span), min(90.0, latitude + lat_span)
+    west, east = longitude - lon_span, longitude + lon_span
+    for precision in range(GEOHASH_PRECISION, 0, -1):
+        height, width = cell_size(precision)
+        rows = range(int((south + 90.0) // height), min(int((north + 90.0) // height), int(180.0 / height) - 1) + 1)
+        columns = range(int((west + 180.0) // width), int((east + 180.0) // width) + 1)
+        if len(rows) * len(columns) <= max_cells or precision == 1:
+            break
+
+    prefixes = set()
+    for row in rows:
+        for column in columns:
+            # Columns past either edge wrap around the antimeridian.
+            lon = (column % round(360.0 / width) + 0.5) * width - 180.0
+            prefixes.add(encode_geohash((row + 0.5) * height - 90.0, lon, precision))
+    return sorted(prefixes)
@@ -0,0 +1,13 @@
+import os
+
+# Build the app once in the master so workers fork with it already imported and share those pages
+# copy-on-write; create_app() gives each worker its own database pool after the fork.
+preload_app = os.environ.get('GUNICORN_PRELOAD', '1') == '1'
+
+# /feed keeps a request open for minutes. A sync worker would be tied up by one stream and killed at the
+# timeout; gthread serves it from one thread while the others take normal requests, and its timeout only
+# fires when the whole worker stops responding. feed.py lets streams take at most half of these threads.
+worker_class = os.environ.get('GUNICORN_WORKER_CLASS', 'gthread')
+threads = int(os.environ.get('GUNICORN_THREADS', 16))
+timeout = int(os.environ.get('GUNICORN_TIMEOUT', 30))
+keepalive = 5
@@ -0,0 +1,145 @@
+import json
+import os
+from datetime import datetime
+from decimal import Decimal
+from sqlalchemy import event, inspect
+from sqlalchemy.orm import Session, make_transient_to_detached
+from cache import MemoryBackend, SQLiteBackend
+from metrics import record_user_lookup, record_user_shared_trip
+
+# What the session user needs for a request; the password hash never goes into the cache.
+CACHED_FIELDS = ('username', 'email', 'user_type', 'is_admin', 'total_earnings', 'created_at', 'rating_sum', 'rating_count', 'is_suspended')
+WATCHED_FIELDS = CACHED_FIELDS + ('password_hash',)
+
+
+def _dump(user):
+    snapshot = {'id': user.id}
+    for name in CACHED_FIELDS:
+        value = getattr(user, name)
+        if isinstance(value, Decimal):
+            value = str(value)
+        elif isinstance(value, datetime):
+            value = value.isoformat()
+        snapshot[name] = value
+    return json.dumps(snapshot)
+
+
+def _load(model, raw):
+    snapshot = json.loads(raw)
+    if snapshot['total_earnings'] is not None:
+        snapshot['total_earnings'] = Decimal(snapshot['total_earnings'])
+    if snapshot['created_at'] is not None:
+        snapshot['created_at'] = datetime.fromisoformat(snapshot['created_at'])
+    user = model(**snapshot)
+    # Turn the copy into a clean detached instance so merge(load=False) can attach it without a SELECT.
+    make_transient_to_detached(user)
+    return user
+
+
+class IdentityCache:
+    def __init__(self, app=None):
+        self.app = None
+        self.local = None
+        self.shared = None
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.app = app
+        app.config.setdefault('USER_CACHE_ENABLED', True)
+        app.config.setdefault('USER_CACHE_TTL', 60)
+        app.config.setdefault('USER_CACHE_MAX_ENTRIES', 4096)
+        # Shared by default: with only the in-process cache, a change committed by another worker or by a
+        # script such as make_admin.py would not reach this worker until the entry expired.
+        app.config.setdefault('USER_CACHE_BACKEND', os.environ.get('USER_CACHE_BACKEND', 'sqlite'))
+        app.config.setdefault('USER_CACHE_PATH', os.path.join(app.instance_path, 'user_cache.db'))
+        # How long a worker trusts its copy of a user's version before asking the shared file again. A change
+        # made in this process shows at once; one made in another worker or script within this many seconds.
+        app.config.setdefault('USER_CACHE_VERSION_POLL', 1.0)
+
+        self.local = MemoryBackend(app.config['USER_CACHE_MAX_ENTRIES'])
+        if app.config['USER_CACHE_BACKEND'] == 'sqlite':
+            self.shared = SQLiteBackend(app.config['USER_CACHE_PATH'])
+
+    @property
+    def enabled(self):
+        return self.app is not None and self.app.config['USER_CACHE_ENABLED']
+
+    def _key(self, user_id):
+        name = f'user:{user_id}'
+        if self.shared is None:
+            return f'{name}:{self.local.versions([name])[name]}'
+        # With a shared backend the version lives in the shared file; a short-lived local copy keeps that
+        # read off most requests.
+        version_key = f'{name}:version'
+        version = self.local.get_many([version_key]).get(version_key)
+        if version is None:
+            version = self.shared.versions([name])[name]
+            record_user_shared_trip('version')
+            self.local.set(version_key, version, self.app.config['USER_CACHE_VERSION_POLL'])
+        return f'{name}:{version}'
+
+    def load(self, user_id):
+        from app import db
+        from models import User
+
+        if not self.enabled:
+            return db.session.get(User, user_id)
+
+        key = self._key(user_id)
+        raw = self.local.get_many([key]).get(key)
+        if raw is None and self.shared:
+            raw = self.shared.get_many([key]).get(key)
+            record_user_shared_trip('get')
+            if raw is not None:
+                self.local.set(key, raw, self.app.config['USER_CACHE_TTL'])
+        if raw is not None:
+            record_user_lookup('hit')
+            return db.session.merge(_load(User, raw), load=False)
+
+        user = db.session.get(User, user_id)
+        record_user_lookup('miss' if user is not None else 'gone')
+        if user is not None:
+            raw = _dump(user)
+            self.local.set(key, raw, self.app.config['USER_CACHE_TTL'])
+            if self.shared:
+                self.shared.set(key, raw, self.app.config['USER_CACHE_TTL'])
+                record_user_shared_trip('set')
+        return user
+
+    def invalidate(self, *user_ids):
+        if self.app is not None and user_ids:
+            names = [f'user:{user_id}' for user_id in user_ids]
+            (self.shared or self.local).bump(names)
+            if self.shared:
+                self.local.delete([f'{name}:version' for name in names])
+
+    def invalidate_on_commit(self, session, *user_ids):
+        # Bumping before the commit would let a concurrent request cache the old row again.
+        session.info.setdefault('identity_invalidate', set()).update(user_ids)
+
+
+identity_cache = IdentityCache()
+
+
+@event.listens_for(Session, 'before_flush')
+def _watch_users(session, flush_context, instances):
+    from models import User
+
+    for obj in list(session.dirty) + list(session.deleted):
+        if isinstance(obj, User):
+            state = inspect(obj)
+            if obj in session.deleted or any(state.attrs[name].history.has_changes() for name in WATCHED_FIELDS):
+                identity_cache.invalidate_on_commit(session, obj.id)
+
+
+@event.listens_for(Session, 'after_commit')
+def _flush_invalidations(session):
+    user_ids = session.info.pop('identity_invalidate', None)
+    if user_ids:
+        identity_cache.invalidate(*user_ids)
+
+
+@event.listens_for(Session, 'after_rollback')
+def _drop_invalidations(session):
+    session.info.pop('identity_invalidate', None)
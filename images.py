@@ -0,0 +1,212 @@
+import json
+import os
+import secrets
+import shutil
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from metrics import time_image
+
+PENDING_IMAGE = 'pending'
+DEFAULT_IMAGE = 'default.jpg'
+
+# Longest edge of the stored copy; the listing and detail sizes are cut from it on demand by variants.py.
+MAX_EDGE = 800
+# Older uploads also left a _thumb copy next to the image, so removal and archiving still handle it.
+STORED_SUFFIXES = ('', '_thumb')
+
+
+def output_format():
+    from PIL import features
+    if features.check('webp'):
+        return 'WEBP', '.webp', {'quality': 80, 'method': 4}
+    return 'JPEG', '.jpg', {'quality': 82, 'optimize': True, 'progressive': True}
+
+
+def variant_name(image_file, suffix):
+    root, ext = os.path.splitext(image_file)
+    return root + suffix + ext
+
+
+def remove_images(image_files, folder):
+    removed = 0
+    for image_file in image_files:
+        if image_file in (DEFAULT_IMAGE, PENDING_IMAGE) or os.path.basename(image_file) != image_file:
+            continue
+        for suffix in STORED_SUFFIXES:
+            try:
+                os.remove(os.path.join(folder, variant_name(image_file, suffix)))
+                removed += 1
+            except OSError:
+                pass
+    return removed
+
+
+def move_images(image_files, source, target):
+    moved = 0
+    os.makedirs(target, exist_ok=True)
+    for image_file in image_files:
+        if image_file in (DEFAULT_IMAGE, PENDING_IMAGE) or os.path.basename(image_file) != image_file:
+            continue
+        for suffix in STORED_SUFFIXES:
+            name = variant_name(image_file, suffix)
+            try:
+                # shutil.move falls back to copy-and-delete when the cold folder is on another disk.
+                shutil.move(os.path.join(source, name), os.path.join(target, name))
+                moved += 1
+            except OSError:
+                pass
+    return moved
+
+
+def process_image(source_path, output_folder, name):
+    from PIL import Image, ImageOps
+
+    fmt, ext, options = output_format()
+    image_file = name + ext
+    with Image.open(source_path) as original:
+        # Bake the EXIF rotation into the pixels; the re-encode below drops EXIF (and any GPS tags) entirely.
+        image = ImageOps.exif_transpose(original)
+        if image.mode not in ('RGB', 'L'):
+            background = Image.new('RGB', image.size, (255, 255, 255))
+            background.paste(image, mask=image.convert('RGBA').split()[-1])
+            image = background
+        image.thumbnail((MAX_EDGE, MAX_EDGE), Image.LANCZOS)
+        image.save(os.path.join(output_folder, image_file), fmt, **options)
+    return image_file
+
+
+class ImagePipeline:
+    def __init__(self, app=None):
+        self.app = None
+        self._executor = None
+        self._pid = None
+        self._lock = threading.Lock()
+        self._recovered = False
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.app = app
+        app.config.setdefault('IMAGE_QUEUE_FOLDER', os.path.join(app.instance_path, 'image_queue'))
+        app.config.setdefault('IMAGE_WORKERS', 2)
+        app.config.setdefault('IMAGE_PIPELINE_SYNC', False)
+        app.config.setdefault('IMAGE_JOB_TIMEOUT', 600)
+        os.makedirs(app.config['IMAGE_QUEUE_FOLDER'], exist_ok=True)
+
+        @app.before_request
+        def _recover_image_jobs():
+            if not self._recovered:
+                self.recover()
+
+    @property
+    def queue_folder(self):
+        return self.app.config['IMAGE_QUEUE_FOLDER']
+
+    def _get_executor(self):
+        with self._lock:
+            # A worker forked from a preloaded master inherits the executor object but none of its threads.
+            if self._executor is None or self._pid != os.getpid():
+                self._pid = os.getpid()
+                self._executor = ThreadPoolExecutor(max_workers=self.app.config['IMAGE_WORKERS'], thread_name_prefix='image-pipeline')
+            return self._executor
+
+    def spool(self, form_picture):
+        _, f_ext = os.path.splitext(form_picture.filename)
+        job_id = secrets.token_hex(8)
+        source = os.path.join(self.queue_folder, job_id + f_ext.lower())
+        form_picture.save(source)
+        return job_id, source
+
+    def submit(self, post_id, spooled):
+        job_id, source = spooled
+        job_path = os.path.join(self.queue_folder, job_id + '.job')
+        with open(job_path + '.tmp', 'w') as job_file:
+            json.dump({'post_id': post_id, 'source': source, 'name': job_id}, job_file)
+        os.replace(job_path + '.tmp', job_path)
+
+        if self.app.config['IMAGE_PIPELINE_SYNC']:
+            self._run(job_path)
+        else:
+            self._get_executor().submit(self._run, job_path)
+
+    def discard(self, spooled):
+        if spooled:
+            try:
+                os.remove(spooled[1])
+            except OSError:
+                pass
+
+    def _claim(self, job_path):
+        # Several gunicorn workers may scan the same queue; rename is the atomic claim.
+        working = job_path[:-len('.job')] + '.working'
+        try:
+            os.rename(job_path, working)
+        except OSError:
+            return None
+        return working
+
+    def _run(self, job_path):
+        working = self._claim(job_path)
+        if working is None:
+            return
+        with open(working) as job_file:
+            job = json.load(job_file)
+
+        with self.app.app_context():
+            from app import db
+            from models import TrashPost
+
+            output_folder = self.app.config['UPLOAD_FOLDER']
+            try:
+                with time_image('upload'):
+                    image_file = process_image(job['source'], output_folder, job['name'])
+            except Exception:
+                self.app.logger.exception('Image processing failed for post %s', job['post_id'])
+                image_file = DEFAULT_IMAGE
+
+            updated = db.session.execute(
+                db.update(TrashPost).where(TrashPost.id == job['post_id']).values(image_file=image_file)
+            ).rowcount
+            db.session.commit()
+            if updated:
+                from cache import page_cache
+                page_cache.invalidate_post(job['post_id'])
+            if not updated:
+                # The post was deleted while its picture was in the queue.
+                remove_images([image_file], output_folder)
+
+        for path in (job['source'], working):
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+    def recover(self):
+        self._recovered = True
+        stale_before = time.time() - self.app.config['IMAGE_JOB_TIMEOUT']
+        for entry in os.scandir(self.queue_folder):
+            if entry.name.endswith('.working') and entry.stat().st_mtime < stale_before:
+                # A worker died mid-job; put it back in the queue.
+                job_path = entry.path[:-len('.working')] + '.job'
+                try:
+                    os.rename(entry.path, job_path)
+                except OSError:
+                    continue
+            elif not entry.name.endswith('.job'):
+                continue
+            else:
+                job_path = entry.path
+            if self.app.config['IMAGE_PIPELINE_SYNC']:
+                self._run(job_path)
+            else:
+                self._get_executor().submit(self._run, job_path)
+
+    def wait(self):
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=True)
+
+
+image_pipeline = ImagePipeline()
@@ -1,7 +1,9 @@
 import sys
-from app import app, db
+from app import create_app, db
 from models import User
 
+app = create_app()
+
 def make_admin(email):
     with app.app_context():
         user = User.query.filter_by(email=email).first()
@@ -0,0 +1,252 @@
+import cProfile
+import os
+import random
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from flask import current_app, g, has_request_context, request, template_rendered, before_render_template
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+COUNT_BUCKETS = (1, 2, 4, 8, 16, 32, 64, 128)
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _labels(names, values, extra=()):
+    pairs = list(zip(names, values)) + list(extra)
+    if not pairs:
+        return ''
+    return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in pairs) + '}'
+
+
+class Counter:
+    kind = 'counter'
+
+    def __init__(self, name, documentation, labels=()):
+        self.name, self.documentation, self.label_names = name, documentation, tuple(labels)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *labels, amount=1):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def samples(self):
+        with self._lock:
+            return [f'{self.name}{_labels(self.label_names, key)} {value}' for key, value in sorted(self._values.items())]
+
+
+class Histogram:
+    kind = 'histogram'
+
+    def __init__(self, name, documentation, labels=(), buckets=LATENCY_BUCKETS):
+        self.name, self.documentation, self.label_names = name, documentation, tuple(labels)
+        self.buckets = tuple(buckets)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value, *labels):
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            counts, total = self._values.get(labels, ([0] * (len(self.buckets) + 1), 0.0))
+            counts[index] += 1
+            self._values[labels] = (counts, total + value)
+
+    def samples(self):
+        lines = []
+        with self._lock:
+            items = sorted((key, list(counts), total) for key, (counts, total) in self._values.items())
+        for key, counts, total in items:
+            running = 0
+            for bound, count in zip(self.buckets + ('+Inf',), counts):
+                running += count
+                lines.append(f'{self.name}_bucket{_labels(self.label_names, key, [("le", bound)])} {running}')
+            lines.append(f'{self.name}_sum{_labels(self.label_names, key)} {total:.6f}')
+            lines.append(f'{self.name}_count{_labels(self.label_names, key)} {running}')
+        return lines
+
+
+REQUESTS = Counter('http_requests_total', 'Requests handled.', ('endpoint', 'method', 'status'))
+REQUEST_SECONDS = Histogram('http_request_duration_seconds', 'Time to build the response.', ('endpoint', 'method'))
+SQL_SECONDS = Histogram('db_request_seconds', 'SQL time spent per request.', ('endpoint',))
+SQL_STATEMENTS = Histogram('db_statements_per_request', 'SQL statements per request.', ('endpoint',), COUNT_BUCKETS)
+TEMPLATE_SECONDS = Histogram('template_render_seconds', 'Top-level template render time.', ('template',))
+IMAGE_SECONDS = Histogram('image_processing_seconds', 'Upload resizing and variant rendering time.', ('kind',))
+PROFILES = Counter('slow_request_profiles_total', 'Profiles written for slow requests.', ('endpoint',))
+USER_LOOKUPS = Counter('user_cache_lookups_total', 'Session user loads; every hit is a User SELECT saved.', ('outcome',))
+USER_SHARED_TRIPS = Counter('user_cache_shared_trips_total', 'Reads and writes of the shared user cache file, which hits pay too.', ('kind',))
+
+REGISTRY = [REQUESTS, REQUEST_SECONDS, SQL_SECONDS, SQL_STATEMENTS, TEMPLATE_SECONDS, IMAGE_SECONDS, PROFILES, USER_LOOKUPS, USER_SHARED_TRIPS]
+
+
+def render_metrics():
+    lines = []
+    for metric in REGISTRY:
+        lines.append(f'# HELP {metric.name} {metric.documentation}')
+        lines.append(f'# TYPE {metric.name} {metric.kind}')
+        lines.extend(metric.samples())
+    return '\n'.join(lines) + '\n'
+
+
+class RequestTimings:
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.sql_count = 0
+        self.sql_seconds = 0.0
+        self.template_seconds = 0.0
+        self.template_depth = 0
+        self.template_started = 0.0
+        self.image_seconds = 0.0
+        self.user_lookup = None
+        self.user_shared_trips = 0
+        self.profiler = None
+
+
+def _timings():
+    return g.get('_timings') if has_request_context() else None
+
+
+@event.listens_for(Engine, 'before_cursor_execute')
+def _sql_started(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault('_metrics_started', []).append(time.perf_counter())
+
+
+@event.listens_for(Engine, 'after_cursor_execute')
+def _sql_finished(conn, cursor, statement, parameters, context, executemany):
+    started = conn.info.get('_metrics_started')
+    if not started:
+        return
+    elapsed = time.perf_counter() - started.pop()
+    timings = _timings()
+    if timings is not None:
+        timings.sql_count += 1
+        timings.sql_seconds += elapsed
+
+
+def _template_started(sender, template, context, **extra):
+    timings = _timings()
+    if timings is not None:
+        # Partials rendered from inside a page (listing cards) are part of the page's time.
+        if timings.template_depth == 0:
+            timings.template_started = time.perf_counter()
+        timings.template_depth += 1
+
+
+def _template_finished(sender, template, context, **extra):
+    timings = _timings()
+    if timings is None or timings.template_depth == 0:
+        return
+    timings.template_depth -= 1
+    if timings.template_depth == 0:
+        elapsed = time.perf_counter() - timings.template_started
+        timings.template_seconds += elapsed
+        TEMPLATE_SECONDS.observe(elapsed, template.name or 'string')
+
+
+@contextmanager
+def time_image(kind):
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - started
+        IMAGE_SECONDS.observe(elapsed, kind)
+        timings = _timings()
+        if timings is not None:
+            timings.image_seconds += elapsed
+
+
+def record_user_lookup(outcome):
+    USER_LOOKUPS.inc(outcome)
+    timings = _timings()
+    if timings is not None:
+        timings.user_lookup = outcome
+
+
+def record_user_shared_trip(kind):
+    USER_SHARED_TRIPS.inc(kind)
+    timings = _timings()
+    if timings is not None:
+        timings.user_shared_trips += 1
+
+
+def server_timing(timings, total):
+    parts = [f'app;dur={total * 1000:.1f}']
+    if timings.sql_count:
+        parts.append(f'db;dur={timings.sql_seconds * 1000:.1f};desc="{timings.sql_count} queries"')
+    if timings.template_seconds:
+        parts.append(f'tpl;dur={timings.template_seconds * 1000:.1f}')
+    if timings.image_seconds:
+        parts.append(f'img;dur={timings.image_seconds * 1000:.1f}')
+    if timings.user_lookup:
+        shared = f', {timings.user_shared_trips} shared' if timings.user_shared_trips else ''
+        parts.append(f'user;desc="{timings.user_lookup}{shared}"')
+    return ', '.join(parts)
+
+
+def _write_profile(profiler, endpoint, elapsed):
+    folder = current_app.config['PROFILE_DIR']
+    os.makedirs(folder, exist_ok=True)
+    name = f'{time.strftime("%Y%m%d-%H%M%S")}-{endpoint}-{int(elapsed * 1000)}ms-{os.getpid()}.prof'
+    # Open with: python -m pstats <file>, or snakeviz <file>.
+    profiler.dump_stats(os.path.join(folder, name))
+    PROFILES.inc(endpoint)
+
+
+def metrics_view():
+    token = current_app.config['METRICS_TOKEN']
+    if token and request.headers.get('Authorization') != f'Bearer {token}':
+        return current_app.response_class('unauthorized\n', status=401, mimetype='text/plain')
+    return current_app.response_class(render_metrics(), mimetype='text/plain; version=0.0.4')
+
+
+def init_metrics(app):
+    app.config.setdefault('SERVER_TIMING_HEADER', True)
+    app.config.setdefault('METRICS_TOKEN', os.environ.get('METRICS_TOKEN'))
+    # Profiling is off unless a threshold is set; then a sample of requests runs under cProfile
+    # and any of those slower than the threshold leaves a .prof file behind.
+    app.config.setdefault('PROFILE_SLOW_REQUEST_MS', float(os.environ['PROFILE_SLOW_REQUEST_MS']) if os.environ.get('PROFILE_SLOW_REQUEST_MS') else None)
+    app.config.setdefault('PROFILE_SAMPLE_RATE', float(os.environ.get('PROFILE_SAMPLE_RATE', 0.1)))
+    app.config.setdefault('PROFILE_DIR', os.path.join(app.instance_path, 'profiles'))
+
+    template_rendered.connect(_template_finished, app)
+    before_render_template.connect(_template_started, app)
+
+    @app.before_request
+    def _start_timing():
+        g._timings = timings = RequestTimings()
+        if app.config['PROFILE_SLOW_REQUEST_MS'] is not None and random.random() < app.config['PROFILE_SAMPLE_RATE']:
+            try:
+                timings.profiler = cProfile.Profile()
+                timings.profiler.enable()
+            except ValueError:
+                # Another profiler is already active in this thread.
+                timings.profiler = None
+
+    @app.after_request
+    def _record_timing(response):
+        timings = g.pop('_timings', None)
+        if timings is None:
+            return response
+        elapsed = time.perf_counter() - timings.started
+        endpoint = request.endpoint or 'unmatched'
+
+        REQUESTS.inc(endpoint, request.method, str(response.status_code))
+        REQUEST_SECONDS.observe(elapsed, endpoint, request.method)
+        SQL_SECONDS.observe(timings.sql_seconds, endpoint)
+        SQL_STATEMENTS.observe(timings.sql_count, endpoint)
+        if app.config['SERVER_TIMING_HEADER']:
+            response.headers['Server-Timing'] = server_timing(timings, elapsed)
+
+        if timings.profiler is not None:
+            timings.profiler.disable()
+            if elapsed * 1000 >= app.config['PROFILE_SLOW_REQUEST_MS']:
+                _write_profile(timings.profiler, endpoint, elapsed)
+        return response
+
+    app.add_url_rule('/metrics', 'metrics', metrics_view)
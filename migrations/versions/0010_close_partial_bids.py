@@ -0,0 +1,28 @@
+"""close bids that do not cover the whole lot
+
+Revision ID: 0010
+Revises: 0009
+Create Date: 2026-10-19 09:14:05.118342
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0010'
+down_revision = '0009'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # A bid now buys the whole lot, so an open bid for any other weight could never be accepted.
+    op.execute(
+        "UPDATE offer SET status = 'closed', decided_at = CURRENT_TIMESTAMP "
+        "WHERE status = 'pending' AND weight_kg != (SELECT quantity FROM trash_post WHERE trash_post.id = offer.post_id)"
+    )
+
+
+def downgrade():
+    pass
@@ -1,10 +1,21 @@
+import math
 from flask_login import UserMixin
 from werkzeug.security import generate_password_hash, check_password_hash
+from sqlalchemy import event
+from sqlalchemy.orm import object_session
+from sqlalchemy.ext.hybrid import hybrid_property
 from app import db
+from pagination import keyset_paginate
+from images import PENDING_IMAGE
+from identity import identity_cache
+from geo import GEOHASH_PRECISION, covering_prefixes, degree_spans, encode_geohash, haversine_km, parse_map_link, valid_coordinates
 from datetime import datetime
-import statistics
 
 class User(UserMixin, db.Model):
+    __table_args__ = (
+        db.Index('ix_user_created_at', 'created_at', 'id'),
+    )
+
     id = db.Column(db.Integer, primary_key=True)
     username = db.Column(db.String(64), unique=True, nullable=False)
     email = db.Column(db.String(120), unique=True, nullable=False)
@@ -13,6 +24,9 @@ class User(UserMixin, db.Model):
     is_admin = db.Column(db.Boolean, default=False)
     total_earnings = db.Column(db.Numeric(10, 2), default=0.00)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    rating_sum = db.Column(db.Integer, default=0, server_default='0', nullable=False)
+    rating_count = db.Column(db.Integer, default=0, server_default='0', nullable=False)
+    is_suspended = db.Column(db.Boolean, default=False, server_default=db.false(), nullable=False)
     
     posts = db.relationship('TrashPost', foreign_keys='TrashPost.user_id', backref='owner', lazy='dynamic', cascade="all, delete-orphan")
     collections = db.relationship('TrashPost', foreign_keys='TrashPost.collector_id', backref='collector', lazy='dynamic')
@@ -27,23 +41,44 @@ class User(UserMixin, db.Model):
     
     def __init__(self, **kwargs):
         super(User, self).__init__(**kwargs)
+
+    @property
+    def is_active(self):
+        return not self.is_suspended
         
-    def average_rating(self):
-        reviews = self.reviews_received.all()
-        if not reviews:
+    @hybrid_property
+    def rating_average(self):
+        if not self.rating_count:
             return 0
-        return round(statistics.mean([review.rating for review in reviews]), 1)
+        return self.rating_sum / self.rating_count
+
+    @rating_average.expression
+    def rating_average(cls):
+        return db.case((cls.rating_count > 0, cls.rating_sum * 1.0 / cls.rating_count), else_=0)
+
+    def average_rating(self):
+        return round(self.rating_average, 1)
+
+    @staticmethod
+    def rating_update(user_id, rating, count=1):
+        # Applied in SQL so concurrent reviews for the same user never overwrite each other.
+        return db.update(User).where(User.id == user_id).values(
+            rating_sum=User.rating_sum + rating * count,
+            rating_count=User.rating_count + count
+        )
     
     @staticmethod
     def create(username, email, password, user_type='user'):
         user = User(username=username, email=email, user_type=user_type)
         user.set_password(password)
         db.session.add(user)
+        import stats
+        stats.record(users=1)
         db.session.commit()
         return user
 
-class TrashPost(db.Model):
-    id = db.Column(db.Integer, primary_key=True)
+class PostFields:
+    # Shared by live posts and their archived copies, so an archived row reads exactly like the original.
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
     trash_type = db.Column(db.String(50), nullable=False)
     quantity = db.Column(db.Integer, nullable=False)
@@ -55,6 +90,8 @@ class TrashPost(db.Model):
     is_negotiable = db.Column(db.Boolean, default=False, nullable=False)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     completed_at = db.Column(db.DateTime)
+    # Bumped by every ORM and Core UPDATE of the row; it is the post's cache validator.
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     
     final_weight_kg = db.Column(db.Float, nullable=True)
     final_price_per_kg = db.Column(db.Numeric(10, 2), nullable=True)
@@ -63,9 +100,32 @@ class TrashPost(db.Model):
     
     phone_number = db.Column(db.String(20), nullable=True)
     google_map_link = db.Column(db.String(500), nullable=True)
+    latitude = db.Column(db.Float, nullable=True)
+    longitude = db.Column(db.Float, nullable=True)
+    geohash = db.Column(db.String(GEOHASH_PRECISION), nullable=True)
     image_file = db.Column(db.String(30), nullable=False, default='default.jpg')
+
+    @property
+    def image_pending(self):
+        return self.image_file == PENDING_IMAGE
+
+class TrashPost(PostFields, db.Model):
+    __table_args__ = (
+        db.Index('ix_trash_post_status_created', 'status', 'created_at', 'id'),
+        db.Index('ix_trash_post_status_completed', 'status', 'completed_at'),
+        db.Index('ix_trash_post_user_created', 'user_id', 'created_at'),
+        db.Index('ix_trash_post_user_status', 'user_id', 'status'),
+        db.Index('ix_trash_post_collector_status_completed', 'collector_id', 'status', 'completed_at'),
+        db.Index('ix_trash_post_status_updated', 'status', 'updated_at'),
+        db.Index('ix_trash_post_status_geohash', 'status', 'geohash'),
+        # Ids are never handed out twice, so a new post can't collide with an archived one.
+        {'sqlite_autoincrement': True},
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
     
-    reviews = db.relationship('Review', backref='post', lazy='dynamic', cascade="all, delete-orphan")
+    reviews = db.relationship('Review', primaryjoin='TrashPost.id == foreign(Review.post_id)', backref='post', lazy='dynamic', cascade="all, delete-orphan")
+    offers = db.relationship('Offer', backref='post', lazy='dynamic', cascade="all, delete-orphan")
 
     def __init__(self, user_id, trash_type, quantity, location, description, price_per_kg, is_negotiable, phone_number, google_map_link, image_file='default.jpg'):
         self.user_id = user_id
@@ -78,28 +138,248 @@ class TrashPost(db.Model):
         self.phone_number = phone_number
         self.google_map_link = google_map_link
         self.image_file = image_file
+        self.locate()
     
     @staticmethod
-    def get_available():
-        return TrashPost.query.filter_by(status='available').order_by(TrashPost.created_at.desc()).all()
+    def find(post_id):
+        # Old posts move to archived_post; anything that addresses a post by id should look there too.
+        post = TrashPost.query.options(db.joinedload(TrashPost.owner)).filter(TrashPost.id == post_id).first()
+        if post is None:
+            post = ArchivedPost.query.options(db.joinedload(ArchivedPost.owner)).filter(ArchivedPost.id == post_id).first()
+        return post
+
+    @staticmethod
+    def kg_sold(user_id):
+        sold = db.union_all(*(
+            db.select(model.final_weight_kg).where(model.user_id == user_id, model.status == 'completed')
+            for model in (TrashPost, ArchivedPost)
+        )).subquery()
+        return db.session.execute(db.select(db.func.sum(sold.c.final_weight_kg))).scalar() or 0.0
+
+    @staticmethod
+    def get_available(cursor=None, per_page=24, min_seller_rating=None):
+        query = TrashPost.query.filter_by(status='available')
+        if min_seller_rating:
+            query = query.join(TrashPost.owner).filter(User.rating_average >= min_seller_rating).options(db.contains_eager(TrashPost.owner))
+        else:
+            query = query.options(db.joinedload(TrashPost.owner))
+        return keyset_paginate(query, TrashPost, cursor, per_page)
+
+    def locate(self, latitude=None, longitude=None):
+        # Explicit coordinates win; otherwise fall back to whatever the map link pins.
+        if not valid_coordinates(latitude, longitude):
+            latitude, longitude = parse_map_link(self.google_map_link) or (None, None)
+        self.latitude, self.longitude = latitude, longitude
+        self.geohash = encode_geohash(latitude, longitude) if latitude is not None else None
+
+    @staticmethod
+    def get_near(latitude, longitude, radius_km=10, limit=24, min_seller_rating=None):
+        cells = [db.and_(TrashPost.geohash >= prefix, TrashPost.geohash < prefix + '~')
+                 for prefix in covering_prefixes(latitude, longitude, radius_km)]
+        lat_span, lon_span = degree_spans(latitude, radius_km)
+        # Flat-earth distance in degrees of latitude: within 100 km it is off from haversine by metres,
+        # and it lets the database filter, order and cut the candidates before any row is loaded.
+        dlat = TrashPost.latitude - latitude
+        dlon = (TrashPost.longitude - longitude) * math.cos(math.radians(latitude))
+        distance = dlat * dlat + dlon * dlon
+        query = TrashPost.query.filter(
+            TrashPost.status == 'available', db.or_(*cells),
+            TrashPost.latitude.between(latitude - lat_span, latitude + lat_span),
+            TrashPost.longitude.between(longitude - lon_span, longitude + lon_span),
+            distance <= lat_span * lat_span
+        )
+        if min_seller_rating:
+            query = query.join(TrashPost.owner).filter(User.rating_average >= min_seller_rating).options(db.contains_eager(TrashPost.owner))
+        else:
+            query = query.options(db.joinedload(TrashPost.owner))
+
+        nearby = query.order_by(distance, TrashPost.id).limit(limit).all()
+        for post in nearby:
+            post.distance_km = haversine_km(latitude, longitude, post.latitude, post.longitude)
+        return nearby
+
+    @staticmethod
+    def get_nearest(latitude, longitude, k=24, max_radius_km=50, min_seller_rating=None):
+        # Widen the circle until k posts turn up, so dense areas never touch distant cells.
+        radius = min(5.0, max_radius_km)
+        while True:
+            posts = TrashPost.get_near(latitude, longitude, radius, k, min_seller_rating)
+            if len(posts) >= k or radius >= max_radius_km:
+                return posts
+            radius = min(radius * 4, max_radius_km)
+
+    @staticmethod
+    def listing_validator():
+        completed = db.select(db.func.max(TrashPost.completed_at)).where(TrashPost.status == 'completed').scalar_subquery()
+        return db.session.execute(
+            db.select(db.func.count(TrashPost.id), db.func.max(TrashPost.created_at), db.func.max(TrashPost.updated_at), completed)
+            .where(TrashPost.status == 'available')
+        ).one()
+
+    @staticmethod
+    def touch(*post_ids):
+        db.session.execute(
+            db.update(TrashPost).where(TrashPost.id.in_(post_ids))
+            .values(updated_at=datetime.utcnow()).execution_options(synchronize_session=False)
+        )
     
 
     @staticmethod
     def create(user_id, trash_type, quantity, location, description, price_per_kg, is_negotiable, phone_number, google_map_link, image_file='default.jpg'):
         post = TrashPost(user_id=user_id, trash_type=trash_type, quantity=quantity, location=location, description=description, price_per_kg=price_per_kg, is_negotiable=is_negotiable, phone_number=phone_number, google_map_link=google_map_link, image_file=image_file)
         db.session.add(post)
+        import stats
+        stats.record(posts=1)
         db.session.commit()
         return post
 
+class ArchivedPost(PostFields, db.Model):
+    __tablename__ = 'archived_post'
+    __table_args__ = (
+        db.Index('ix_archived_post_user_status', 'user_id', 'status'),
+        db.Index('ix_archived_post_collector_status_completed', 'collector_id', 'status', 'completed_at'),
+        db.Index('ix_archived_post_status_completed', 'status', 'completed_at'),
+    )
+
+    # Keeps the id the post had while it was live, so links and reviews still point at it.
+    id = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    archived_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+
+    owner = db.relationship('User', foreign_keys='ArchivedPost.user_id')
+    collector = db.relationship('User', foreign_keys='ArchivedPost.collector_id')
+    reviews = db.relationship('Review', primaryjoin='ArchivedPost.id == foreign(Review.post_id)', viewonly=True, lazy='dynamic')
+
+class Offer(db.Model):
+    __table_args__ = (
+        db.Index('ix_offer_book', 'post_id', 'status', 'price_per_kg'),
+        db.Index('ix_offer_collector_status', 'collector_id', 'status'),
+        db.Index('ix_offer_status_expires', 'status', 'expires_at'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    post_id = db.Column(db.Integer, db.ForeignKey('trash_post.id'), nullable=False)
+    collector_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    weight_kg = db.Column(db.Float, nullable=False)
+    price_per_kg = db.Column(db.Numeric(10, 2), nullable=False)
+    total_value = db.Column(db.Numeric(10, 2), nullable=False)
+    status = db.Column(db.String(20), default='pending', nullable=False)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    expires_at = db.Column(db.DateTime, nullable=True)
+    decided_at = db.Column(db.DateTime, nullable=True)
+
+    collector = db.relationship('User', foreign_keys=[collector_id])
+
+    @staticmethod
+    def open_filter(now=None):
+        now = now or datetime.utcnow()
+        return db.and_(Offer.status == 'pending', db.or_(Offer.expires_at.is_(None), Offer.expires_at > now))
+
+    @staticmethod
+    def book(post_id):
+        # Best price first; earlier bids win ties.
+        return Offer.query.filter(Offer.post_id == post_id, Offer.open_filter()).order_by(
+            Offer.price_per_kg.desc(), Offer.created_at, Offer.id
+        )
+
+    @staticmethod
+    def best_for(post_id):
+        return Offer.book(post_id).first()
+
+    @staticmethod
+    def summary(post_id):
+        best, count = db.session.query(db.func.max(Offer.price_per_kg), db.func.count(Offer.id)).filter(
+            Offer.post_id == post_id, Offer.open_filter()
+        ).one()
+        return {'best_price': best, 'count': count}
+
+    @staticmethod
+    def pending_for_seller(user_id):
+        return Offer.query.join(TrashPost, Offer.post_id == TrashPost.id).filter(
+            TrashPost.user_id == user_id, TrashPost.status == 'available', Offer.open_filter()
+        ).options(db.contains_eager(Offer.post), db.joinedload(Offer.collector)).order_by(
+            Offer.post_id, Offer.price_per_kg.desc(), Offer.created_at
+        ).all()
+
 class Review(db.Model):
+    __table_args__ = (
+        db.Index('ix_review_post_reviewer', 'post_id', 'reviewer_id'),
+        db.Index('ix_review_reviewee', 'reviewee_id'),
+        db.Index('ix_review_reviewer', 'reviewer_id'),
+    )
+
     id = db.Column(db.Integer, primary_key=True)
     rating = db.Column(db.Integer, nullable=False)
     comment = db.Column(db.Text, nullable=True)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     
-    post_id = db.Column(db.Integer, db.ForeignKey('trash_post.id'), nullable=False)
+    # No foreign key: the post may live in trash_post or, once archived, in archived_post.
+    post_id = db.Column(db.Integer, nullable=False)
     reviewer_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
     reviewee_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
 
     def __repr__(self):
-        return f"Review(rating={self.rating})"
\ No newline at end of file
+        return f"Review(rating={self.rating})"
+
+@event.listens_for(Review, 'after_delete')
+def _remove_rating(mapper, connection, target):
+    connection.execute(User.rating_update(target.reviewee_id, target.rating, count=-1))
+    # Core updates skip the before_flush watcher, so the cached reviewee has to be dropped here.
+    identity_cache.invalidate_on_commit(object_session(target), target.reviewee_id)
+
+class PlatformStats(db.Model):
+    __tablename__ = 'platform_stats'
+    id = db.Column(db.Integer, primary_key=True)
+    total_users = db.Column(db.Integer, default=0, nullable=False)
+    total_posts = db.Column(db.Integer, default=0, nullable=False)
+    total_sales = db.Column(db.Numeric(14, 2), default=0, nullable=False)
+    total_profit = db.Column(db.Numeric(14, 2), default=0, nullable=False)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    @staticmethod
+    def current():
+        return db.session.get(PlatformStats, 1) or PlatformStats(id=1, total_users=0, total_posts=0, total_sales=0, total_profit=0)
+
+class DailyStats(db.Model):
+    __tablename__ = 'daily_stats'
+    day = db.Column(db.Date, primary_key=True)
+    new_users = db.Column(db.Integer, default=0, nullable=False)
+    new_posts = db.Column(db.Integer, default=0, nullable=False)
+    completed_transactions = db.Column(db.Integer, default=0, nullable=False)
+    sales = db.Column(db.Numeric(14, 2), default=0, nullable=False)
+    profit = db.Column(db.Numeric(14, 2), default=0, nullable=False)
+class TransactionRollup(db.Model):
+    __tablename__ = 'transaction_rollup'
+    # One row per period bucket and dimension value, e.g. ('week', 'seller', 2026-10-12, '42').
+    period = db.Column(db.String(8), primary_key=True)
+    dimension = db.Column(db.String(20), primary_key=True)
+    period_start = db.Column(db.Date, primary_key=True)
+    key = db.Column(db.String(64), primary_key=True)
+    transactions = db.Column(db.Integer, default=0, nullable=False)
+    weight_kg = db.Column(db.Float, default=0, nullable=False)
+    sales = db.Column(db.Numeric(14, 2), default=0, nullable=False)
+    profit = db.Column(db.Numeric(14, 2), default=0, nullable=False)
+
+    @staticmethod
+    def _in_range(period, dimension, start, end):
+        return TransactionRollup.query.filter(
+            TransactionRollup.period == period, TransactionRollup.dimension == dimension,
+            TransactionRollup.period_start >= start, TransactionRollup.period_start <= end,
+            TransactionRollup.transactions > 0
+        )
+
+    @staticmethod
+    def report(period, dimension, start, end, limit=500):
+        return TransactionRollup._in_range(period, dimension, start, end).order_by(
+            TransactionRollup.period_start.desc(), TransactionRollup.sales.desc(), TransactionRollup.key
+        ).limit(limit).all()
+
+    @staticmethod
+    def totals(period, start, end):
+        # Every sale lands in exactly one trash_type bucket, so summing that dimension counts each once.
+        return TransactionRollup._in_range(period, 'trash_type', start, end).with_entities(
+            TransactionRollup.period_start,
+            db.func.sum(TransactionRollup.transactions),
+            db.func.sum(TransactionRollup.weight_kg),
+            db.func.sum(TransactionRollup.sales),
+            db.func.sum(TransactionRollup.profit)
+        ).group_by(TransactionRollup.period_start).order_by(TransactionRollup.period_start.desc()).all()
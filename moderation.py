@@ -0,0 +1,94 @@
+from flask import current_app
+from app import db
+from models import User, TrashPost, ArchivedPost, Review, Offer
+from images import remove_images
+from identity import identity_cache
+import search
+import stats
+
+
+def _removable_users(user_ids):
+    # Admin accounts are never touched by bulk actions.
+    return db.session.scalars(
+        db.select(User.id).where(User.id.in_(user_ids), User.is_admin.isnot(True))
+    ).all()
+
+
+def _remove_ratings(doomed):
+    # One correlated UPDATE backs the doomed reviews out of every reviewee's aggregate.
+    lost = lambda column: db.select(column).where(Review.reviewee_id == User.id, doomed).scalar_subquery()
+    reviewee_ids = db.session.scalars(
+        db.update(User).where(User.id.in_(db.select(Review.reviewee_id).where(doomed)))
+        .values(
+            rating_sum=User.rating_sum - lost(db.func.coalesce(db.func.sum(Review.rating), 0)),
+            rating_count=User.rating_count - lost(db.func.count(Review.id)),
+        ).returning(User.id).execution_options(synchronize_session=False)
+    ).all()
+    identity_cache.invalidate_on_commit(db.session, *reviewee_ids)
+    db.session.execute(db.delete(Review).where(doomed).execution_options(synchronize_session=False))
+
+
+def _delete_posts(condition, model=TrashPost):
+    doomed = db.session.execute(db.select(model.id, model.image_file).where(condition)).all()
+    post_ids = [post_id for post_id, _ in doomed]
+    posts = db.select(model.id).where(condition)
+    _remove_ratings(Review.post_id.in_(posts))
+    if model is TrashPost:
+        db.session.execute(db.delete(Offer).where(Offer.post_id.in_(posts)).execution_options(synchronize_session=False))
+    db.session.execute(db.delete(model).where(condition).execution_options(synchronize_session=False))
+    if model is TrashPost:
+        search.reindex_posts(post_ids)
+    return post_ids, [image_file for _, image_file in doomed]
+
+
+def delete_users(user_ids):
+    user_ids = _removable_users(user_ids)
+    if not user_ids:
+        return [], [], []
+    stats.record_user_removal(*user_ids)
+    _remove_ratings(db.or_(Review.reviewer_id.in_(user_ids), Review.reviewee_id.in_(user_ids)))
+    db.session.execute(db.delete(Offer).where(Offer.collector_id.in_(user_ids)).execution_options(synchronize_session=False))
+    post_ids, image_files = _delete_posts(TrashPost.user_id.in_(user_ids))
+    archived_ids, archived_images = _delete_posts(ArchivedPost.user_id.in_(user_ids), ArchivedPost)
+    # Sales the users collected stay on the books; the posts just lose their collector.
+    for model in (TrashPost, ArchivedPost):
+        db.session.execute(
+            db.update(model).where(model.collector_id.in_(user_ids))
+            .values(collector_id=None).execution_options(synchronize_session=False)
+        )
+    db.session.execute(db.delete(User).where(User.id.in_(user_ids)).execution_options(synchronize_session=False))
+    identity_cache.invalidate_on_commit(db.session, *user_ids)
+    return user_ids, post_ids + archived_ids, image_files + archived_images
+
+
+def delete_posts(post_ids):
+    post_ids = list(post_ids)
+    if not post_ids:
+        return [], []
+    stats.record_post_removal(*post_ids)
+    return _delete_posts(TrashPost.id.in_(post_ids))
+
+
+def suspend_users(user_ids, suspended=True):
+    user_ids = _removable_users(user_ids)
+    if user_ids:
+        db.session.execute(
+            db.update(User).where(User.id.in_(user_ids))
+            .values(is_suspended=suspended).execution_options(synchronize_session=False)
+        )
+        identity_cache.invalidate_on_commit(db.session, *user_ids)
+    return user_ids
+
+
+def discard_images(image_files):
+    # Call after the commit, so a rolled back delete never loses its pictures.
+    image_files = set(image_files)
+    if not image_files:
+        return 0
+    still_used = set(db.session.scalars(db.union(*(
+        db.select(model.image_file).where(model.image_file.in_(image_files)) for model in (TrashPost, ArchivedPost)
+    ))))
+    return sum(
+        remove_images(image_files - still_used, current_app.config[folder])
+        for folder in ('UPLOAD_FOLDER', 'COLD_UPLOAD_FOLDER')
+    )
@@ -0,0 +1,117 @@
+import base64
+import binascii
+from datetime import datetime
+from flask import current_app, request, render_template, stream_template
+from app import db
+
+
+class KeysetPage:
+    def __init__(self, items, next_cursor, per_page):
+        self.items = items
+        self.next_cursor = next_cursor
+        self.per_page = per_page
+
+    @property
+    def has_next(self):
+        return self.next_cursor is not None
+
+    def __iter__(self):
+        return iter(self.items)
+
+    def __len__(self):
+        return len(self.items)
+
+
+def pack_token(*parts):
+    raw = '|'.join(str(part) for part in parts).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def unpack_token(token, count):
+    padded = token + '=' * (-len(token) % 4)
+    # Only the leading part can be free text (a username, an email); the rest are numbers.
+    parts = base64.urlsafe_b64decode(padded).decode().rsplit('|', count - 1)
+    if len(parts) != count:
+        raise ValueError('malformed cursor')
+    return parts
+
+
+def encode_cursor(created_at, row_id):
+    return pack_token(created_at.isoformat(), row_id)
+
+
+def decode_cursor(token):
+    if not token:
+        return None
+    try:
+        created_at, row_id = unpack_token(token, 2)
+        return datetime.fromisoformat(created_at), int(row_id)
+    except (binascii.Error, UnicodeDecodeError, ValueError):
+        # A tampered or stale cursor just starts the listing from the top.
+        return None
+
+
+def decode_sorted_cursor(token, column):
+    if not token:
+        return None
+    try:
+        value, row_id = unpack_token(token, 2)
+        kind = column.type.python_type
+        return (datetime.fromisoformat(value) if kind is datetime else kind(value)), int(row_id)
+    except (binascii.Error, UnicodeDecodeError, ValueError, NotImplementedError):
+        return None
+
+
+def sorted_paginate(query, column, id_column, cursor=None, per_page=50, descending=False):
+    # Keyset paging on (column, id) for tables the user can sort; needs an index that starts with column.
+    position = decode_sorted_cursor(cursor, column)
+    before = (lambda a, b: a < b) if descending else (lambda a, b: a > b)
+    if position:
+        value, row_id = position
+        query = query.filter(db.or_(before(column, value), db.and_(column == value, before(id_column, row_id))))
+    order = (column.desc(), id_column.desc()) if descending else (column.asc(), id_column.asc())
+    rows = query.order_by(*order).limit(per_page + 1).all()
+
+    next_cursor = None
+    if len(rows) > per_page:
+        rows = rows[:per_page]
+        last = rows[-1]
+        value = getattr(last, column.key)
+        next_cursor = pack_token(value.isoformat() if isinstance(value, datetime) else value, getattr(last, id_column.key))
+    return KeysetPage(rows, next_cursor, per_page)
+
+
+def page_args():
+    per_page = current_app.config.get('POSTS_PER_PAGE', 24)
+    max_per_page = current_app.config.get('MAX_POSTS_PER_PAGE', 100)
+    requested = request.args.get('per_page', type=int)
+    if requested:
+        per_page = max(1, min(requested, max_per_page))
+    return request.args.get('cursor'), per_page
+
+
+def keyset_paginate(query, model, cursor=None, per_page=24):
+    # Newest first on (created_at, id); id breaks ties between rows created in the same instant.
+    position = decode_cursor(cursor) if isinstance(cursor, str) else cursor
+    if position:
+        created_at, row_id = position
+        query = query.filter(db.or_(
+            model.created_at < created_at,
+            db.and_(model.created_at == created_at, model.id < row_id)
+        ))
+    rows = query.order_by(model.created_at.desc(), model.id.desc()).limit(per_page + 1).all()
+
+    next_cursor = None
+    if len(rows) > per_page:
+        rows = rows[:per_page]
+        next_cursor = encode_cursor(rows[-1].created_at, rows[-1].id)
+    return KeysetPage(rows, next_cursor, per_page)
+
+
+def render_listing(template_name, **context):
+    streaming = current_app.config.get('STREAM_LISTINGS', False)
+    if request.args.get('stream') is not None:
+        streaming = request.args.get('stream') not in ('0', 'false', 'no')
+    if streaming:
+        return current_app.response_class(stream_template(template_name, **context), mimetype='text/html')
+    return render_template(template_name, **context)
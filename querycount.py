@@ -0,0 +1,80 @@
+import threading
+from contextlib import contextmanager
+from functools import wraps
+from flask import current_app, g, has_app_context, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+_local = threading.local()
+
+
+class QueryBudgetExceeded(AssertionError):
+    pass
+
+
+class QueryCounter:
+    def __init__(self):
+        self.count = 0
+        self.statements = []
+        self.parameters = []
+
+    def record(self, statement, parameters=None):
+        self.count += 1
+        self.statements.append(statement)
+        self.parameters.append(parameters)
+
+
+@event.listens_for(Engine, 'before_cursor_execute')
+def _count_statement(conn, cursor, statement, parameters, context, executemany):
+    for counter in getattr(_local, 'counters', ()):
+        counter.record(statement, None if executemany else parameters)
+    if has_app_context() and '_query_counter' in g:
+        g._query_counter.record(statement)
+
+
+@contextmanager
+def count_queries():
+    counter = QueryCounter()
+    counters = _local.__dict__.setdefault('counters', [])
+    counters.append(counter)
+    try:
+        yield counter
+    finally:
+        counters.remove(counter)
+
+
+def query_budget(limit):
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            g._query_budget = limit
+            return view(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def init_query_counter(app):
+    app.config.setdefault('QUERY_COUNT_LIMIT', None)
+    app.config.setdefault('QUERY_COUNT_STRICT', False)
+    app.config.setdefault('QUERY_COUNT_HEADER', None)
+
+    @app.before_request
+    def _start_counting():
+        g._query_counter = QueryCounter()
+
+    @app.after_request
+    def _check_budget(response):
+        counter = g.pop('_query_counter', None)
+        if counter is None:
+            return response
+        show_header = current_app.config['QUERY_COUNT_HEADER']
+        if show_header if show_header is not None else current_app.debug:
+            response.headers['X-Query-Count'] = str(counter.count)
+
+        limit = g.get('_query_budget', current_app.config['QUERY_COUNT_LIMIT'])
+        if limit is not None and counter.count > limit:
+            message = f'{request.endpoint} ran {counter.count} SQL statements (budget {limit})'
+            if current_app.config['QUERY_COUNT_STRICT']:
+                raise QueryBudgetExceeded(message + ':\n' + '\n'.join(counter.statements))
+            current_app.logger.warning(message)
+        return response
@@ -0,0 +1,13 @@
+from app import create_app, db
+from search import rebuild_search_index
+
+app = create_app()
+
+def rebuild():
+    with app.app_context():
+        with db.engine.begin() as connection:
+            indexed = rebuild_search_index(connection)
+        print(f"Search index rebuilt ({indexed} available posts indexed).")
+
+if __name__ == '__main__':
+    rebuild()
@@ -0,0 +1,24 @@
+from app import create_app, db
+from models import User, Review
+from identity import identity_cache
+
+app = create_app()
+
+def reconcile_ratings():
+    with app.app_context():
+        actual_sum = db.select(db.func.coalesce(db.func.sum(Review.rating), 0)).where(Review.reviewee_id == User.id).scalar_subquery()
+        actual_count = db.select(db.func.count(Review.id)).where(Review.reviewee_id == User.id).scalar_subquery()
+
+        drifted = db.session.query(User.id, User.username, User.rating_sum, User.rating_count, actual_sum, actual_count).filter(
+            (User.rating_sum != actual_sum) | (User.rating_count != actual_count)
+        ).all()
+        for user_id, username, stored_sum, stored_count, real_sum, real_count in drifted:
+            print(f"User '{username}' ({user_id}): stored {stored_sum}/{stored_count}, actual {real_sum}/{real_count}")
+
+        db.session.execute(db.update(User).values(rating_sum=actual_sum, rating_count=actual_count))
+        identity_cache.invalidate_on_commit(db.session, *(row[0] for row in drifted))
+        db.session.commit()
+        print(f"Rating aggregates reconciled ({len(drifted)} users corrected).")
+
+if __name__ == '__main__':
+    reconcile_ratings()
@@ -1,84 +1,91 @@
-import secrets
-import os
-from PIL import Image
-from flask import render_template, redirect, url_for, flash, request
+import math
+from flask import Blueprint, current_app, render_template, redirect, url_for, flash, request, abort, stream_with_context
 from flask_login import login_user, logout_user, login_required, current_user
-from app import app, db
-from models import User, TrashPost, Review
+from app import db
+from models import User, TrashPost, Review, Offer, PlatformStats, TransactionRollup
 from forms import LoginForm, RegistrationForm, PostForm
-from decimal import Decimal
-from datetime import datetime
+from pagination import page_args, render_listing, sorted_paginate
+from search import search_posts
+from querycount import query_budget
+import stats
+import transitions
+import moderation
+import export
+from images import image_pipeline, PENDING_IMAGE
+from cache import page_cache
+from identity import identity_cache
+from feed import feed_hub
+from conditional import conditional, listing_validator, post_validator
+from geo import parse_map_link, valid_coordinates
+from decimal import Decimal, InvalidOperation
+from datetime import date, datetime, timedelta
+
+main = Blueprint('main', __name__)
 
 
-def save_picture(form_picture):
-    random_hex = secrets.token_hex(8)
-    _, f_ext = os.path.splitext(form_picture.filename)
-    picture_fn = random_hex + f_ext
-    picture_path = os.path.join(app.root_path, 'static/post_pics', picture_fn)
-
-    output_size = (800, 800)
-    i = Image.open(form_picture)
-    i.thumbnail(output_size)
-    i.save(picture_path)
-    return picture_fn
-
 # Landing Page
-@app.route('/')
+@main.route('/')
+@page_cache.cached_page(depends=lambda: [])
 def home():
     return render_template('home.html')
 
-@app.route('/how-it-works')
+@main.route('/how-it-works')
+@page_cache.cached_page(depends=lambda: [])
 def how_it_works():
     return render_template('how_it_works.html', title='How It Works')
 
-@app.route('/posts')
+@main.route('/posts')
+@conditional(listing_validator)
+@page_cache.cached_page()
+@query_budget(5)
 def all_posts():
     # Search
     query = request.args.get('query', '')
+    cursor, per_page = page_args()
     if query:
-        posts = TrashPost.query.filter(
-            TrashPost.trash_type.ilike(f'%{query}%') | 
-            TrashPost.location.ilike(f'%{query}%')
-        ).filter_by(status='available').order_by(TrashPost.created_at.desc()).all()
+        page = search_posts(query, cursor, per_page)
     else:
-        posts = TrashPost.query.filter_by(status='available').order_by(TrashPost.created_at.desc()).all()
-    return render_template('index.html', posts=posts, title='Available Posts', query=query)
+        page = TrashPost.get_available(cursor, per_page)
+    return render_listing('index.html', posts=page.items, page=page, title='Available Posts', query=query)
 
 
-@app.route('/login', methods=['GET', 'POST'])
+@main.route('/login', methods=['GET', 'POST'])
 def login():
     if current_user.is_authenticated:
         if current_user.is_admin:
-            return redirect(url_for('admin_dashboard'))
-        return redirect(url_for('home'))
+            return redirect(url_for('main.admin_dashboard'))
+        return redirect(url_for('main.home'))
         
     form = LoginForm()
     if form.validate_on_submit():
         user = User.query.filter_by(email=form.email.data).first()
         if user and user.check_password(form.password.data):
+            if user.is_suspended:
+                flash('This account has been suspended.', 'danger')
+                return render_template('login.html', title='Sign In', form=form)
             login_user(user) 
             flash(f'Welcome back, {user.username}!', 'success')
             
             if user.is_admin:
-                return redirect(url_for('admin_dashboard'))
+                return redirect(url_for('main.admin_dashboard'))
             elif user.user_type == 'collector':
-                return redirect(url_for('collector_dashboard'))
+                return redirect(url_for('main.collector_dashboard'))
             else:
-                return redirect(url_for('user_dashboard'))
+                return redirect(url_for('main.user_dashboard'))
         else:
             flash('Login Unsuccessful. Please check email and password', 'danger')
     return render_template('login.html', title='Sign In', form=form)
 
-@app.route('/logout')
+@main.route('/logout')
 @login_required
 def logout():
     logout_user()
-    return redirect(url_for('home'))
+    return redirect(url_for('main.home'))
 
-@app.route('/register', methods=['GET', 'POST'])
+@main.route('/register', methods=['GET', 'POST'])
 def register():
     if current_user.is_authenticated:
-        return redirect(url_for('home'))
+        return redirect(url_for('main.home'))
     form = RegistrationForm()
     if form.validate_on_submit():
         user = User(
@@ -88,19 +95,23 @@ def register():
         )
         user.set_password(form.password.data)
         db.session.add(user)
+        stats.record(users=1)
         db.session.commit()
         flash('Your account has been created! You are now able to log in', 'success')
-        return redirect(url_for('login'))
+        return redirect(url_for('main.login'))
     return render_template('register.html', title='Register', form=form)
 
-@app.route('/post/new', methods=['GET', 'POST'])
+@main.route('/post/new', methods=['GET', 'POST'])
 @login_required
 def create_post():
     form = PostForm()
     if form.validate_on_submit():
         image_file = 'default.jpg'
+        spooled = None
         if form.picture.data:
-            image_file = save_picture(form.picture.data)
+            # Resizing happens in the background; the post shows a placeholder until it is done.
+            spooled = image_pipeline.spool(form.picture.data)
+            image_file = PENDING_IMAGE
         
         post = TrashPost(
             user_id=current_user.id,
@@ -114,30 +125,46 @@ def create_post():
             is_negotiable=form.is_negotiable.data,
             image_file=image_file
         )
+        post.locate(form.latitude.data, form.longitude.data)
         db.session.add(post)
+        stats.record(posts=1)
         db.session.commit()
+        page_cache.invalidate_listings()
+        feed_hub.post_created(post)
+        if spooled:
+            image_pipeline.submit(post.id, spooled)
         flash('Your post has been created!', 'success')
-        return redirect(url_for('user_dashboard'))
+        return redirect(url_for('main.user_dashboard'))
     return render_template('create_post.html', title='New Post', form=form)
 
-@app.route('/post/<int:post_id>')
+@main.route('/post/<int:post_id>')
+@conditional(post_validator)
+@page_cache.cached_page(depends=lambda post_id: [f'post:{post_id}'])
+@query_budget(5)
 def view_post(post_id):
-    post = TrashPost.query.get_or_404(post_id)
-    return render_template('view_post.html', title=post.trash_type, post=post)
+    post = TrashPost.find(post_id) or abort(404)
+    bids = Offer.summary(post.id) if post.status == 'available' else None
+    return render_template('view_post.html', title=post.trash_type, post=post, bids=bids)
 
-@app.route('/post/<int:post_id>/edit', methods=['GET', 'POST'])
+@main.route('/post/<int:post_id>/edit', methods=['GET', 'POST'])
 @login_required
 def edit_post(post_id):
     post = TrashPost.query.get_or_404(post_id)
     if post.owner != current_user or post.status != 'available':
         flash('You cannot edit this post at the moment.', 'danger')
-        return redirect(url_for('user_dashboard'))
+        return redirect(url_for('main.user_dashboard'))
     
     form = PostForm(obj=post)
     if form.validate_on_submit():
+        spooled = None
         if form.picture.data:
-            post.image_file = save_picture(form.picture.data)
+            spooled = image_pipeline.spool(form.picture.data)
+            post.image_file = PENDING_IMAGE
         
+        pin_moved = form.google_map_link.data != post.google_map_link
+        if form.quantity.data != post.quantity:
+            # Open bids were made for the old lot; their collectors have to bid again.
+            transitions.close_offers(post.id)
         post.trash_type = form.trash_type.data
         post.quantity = form.quantity.data
         post.price_per_kg = form.price_per_kg.data
@@ -146,49 +173,87 @@ def edit_post(post_id):
         post.phone_number = form.phone_number.data
         post.google_map_link = form.google_map_link.data
         post.is_negotiable = form.is_negotiable.data
+        # The form is prefilled with the stored coordinates, so a new map link has to take priority over them.
+        if pin_moved and parse_map_link(post.google_map_link):
+            post.locate()
+        else:
+            post.locate(form.latitude.data, form.longitude.data)
         db.session.commit()
+        page_cache.invalidate_post(post.id)
+        if spooled:
+            image_pipeline.submit(post.id, spooled)
         flash('Your post has been updated!', 'success')
-        return redirect(url_for('user_dashboard'))
+        return redirect(url_for('main.user_dashboard'))
         
     return render_template('edit_post.html', title='Edit Post', form=form, post=post)
 
-@app.route('/post/<int:post_id>/delete', methods=['POST'])
+@main.route('/post/<int:post_id>/delete', methods=['POST'])
 @login_required
 def delete_post(post_id):
     post = TrashPost.query.get_or_404(post_id)
     if post.owner != current_user or post.status != 'available':
         flash('You cannot delete this post at the moment.', 'danger')
-        return redirect(url_for('user_dashboard'))
+        return redirect(url_for('main.user_dashboard'))
     
     db.session.delete(post)
+    stats.record(posts=-1, daily=False)
     db.session.commit()
+    page_cache.invalidate_post(post_id)
+    feed_hub.posts_removed([post_id], 'deleted')
     flash('Your post has been deleted.', 'success')
-    return redirect(url_for('user_dashboard'))
+    return redirect(url_for('main.user_dashboard'))
 
-@app.route('/dashboard')
+@main.route('/dashboard')
 @login_required
+@query_budget(6)
 def user_dashboard():
     if current_user.user_type == 'collector':
-        return redirect(url_for('collector_dashboard'))
+        return redirect(url_for('main.collector_dashboard'))
     
-    user_posts = TrashPost.query.filter_by(user_id=current_user.id).order_by(TrashPost.created_at.desc()).all()
-    total_kg_sold = db.session.query(db.func.sum(TrashPost.final_weight_kg)).filter_by(user_id=current_user.id, status='completed').scalar() or 0.0
+    user_posts = TrashPost.query.filter_by(user_id=current_user.id).options(db.joinedload(TrashPost.collector)).order_by(TrashPost.created_at.desc()).all()
+    total_kg_sold = TrashPost.kg_sold(current_user.id)
     total_earnings = current_user.total_earnings or 0.0
+    offers = Offer.pending_for_seller(current_user.id)
+    offer_counts = {}
+    for offer in offers:
+        offer_counts[offer.post_id] = offer_counts.get(offer.post_id, 0) + 1
 
     return render_template('user_dashboard.html', 
                            title='My Dashboard', 
                            user_posts=user_posts,
+                           offers=offers,
+                           offer_counts=offer_counts,
                            total_kg_sold=total_kg_sold,
                            total_earnings=total_earnings)
 
-@app.route('/collector/dashboard')
+@main.route('/collector/dashboard')
 @login_required
+@query_budget(8)
 def collector_dashboard():
     if current_user.user_type != 'collector':
-        return redirect(url_for('user_dashboard'))
+        return redirect(url_for('main.user_dashboard'))
     
-    available_posts = TrashPost.query.filter_by(status='available').all()
-    recent_purchases = TrashPost.query.filter_by(collector_id=current_user.id, status='completed').order_by(TrashPost.completed_at.desc()).limit(10).all()
+    cursor, per_page = page_args()
+    min_rating = request.args.get('min_rating', type=float)
+    near = {
+        'lat': request.args.get('lat', type=float),
+        'lon': request.args.get('lon', type=float),
+        'radius': request.args.get('radius', type=float),
+    }
+    if valid_coordinates(near['lat'], near['lon']):
+        # Nearby pickups come back closest first and are not paged: either everything within
+        # the chosen radius, or the nearest page-full within 100 km.
+        if near['radius']:
+            near['radius'] = max(0.5, min(near['radius'], 100))
+            posts = TrashPost.get_near(near['lat'], near['lon'], near['radius'], per_page, min_seller_rating=min_rating)
+        else:
+            posts = TrashPost.get_nearest(near['lat'], near['lon'], per_page, 100, min_seller_rating=min_rating)
+        page = None
+    else:
+        near = None
+        page = TrashPost.get_available(cursor, per_page, min_seller_rating=min_rating)
+        posts = page.items
+    recent_purchases = TrashPost.query.filter_by(collector_id=current_user.id, status='completed').options(db.joinedload(TrashPost.owner)).order_by(TrashPost.completed_at.desc()).limit(10).all()
     
     completed_count = len(recent_purchases)
     total_spent = sum(p.total_transaction_value for p in recent_purchases if p.total_transaction_value)
@@ -198,158 +263,270 @@ def collector_dashboard():
         'total_spent': total_spent
     }
     
-    return render_template('collector_dashboard.html', 
-                           title='Collector Dashboard', 
-                           available_posts=available_posts, 
-                           recent_purchases=recent_purchases,
-                           stats=stats)
-
-@app.route('/post/<int:post_id>/offer', methods=['POST'])
+    return render_listing('collector_dashboard.html', 
+                          title='Collector Dashboard', 
+                          available_posts=posts, 
+                          page=page,
+                          min_rating=min_rating,
+                          near=near,
+                          recent_purchases=recent_purchases,
+                          stats=stats)
+
+@main.route('/post/<int:post_id>/offer', methods=['POST'])
 @login_required
 def make_offer(post_id):
     post = TrashPost.query.get_or_404(post_id)
     
     if current_user.user_type != 'collector':
         flash('Only collectors can make offers.', 'danger')
-        return redirect(url_for('home'))
+        return redirect(url_for('main.home'))
 
     if post.user_id == current_user.id:
         flash("You cannot make an offer on your own post.", 'warning')
-        return redirect(url_for('collector_dashboard'))
+        return redirect(url_for('main.collector_dashboard'))
         
     try:
         final_weight = float(request.form.get('final_weight'))
-        final_price_per_kg = Decimal(request.form.get('final_price_per_kg'))
-    except (TypeError, ValueError):
+        final_price_per_kg = Decimal(request.form.get('final_price_per_kg')).quantize(Decimal('0.01'))
+        # nan and inf parse fine, but would end up in the offer's total.
+        if not (math.isfinite(final_weight) and final_price_per_kg.is_finite()):
+            raise ValueError('not a finite number')
+    except (TypeError, ValueError, InvalidOperation):
         flash('Invalid input for weight or price.', 'danger')
-        return redirect(url_for('view_post', post_id=post.id))
+        return redirect(url_for('main.view_post', post_id=post.id))
 
 
-    if final_weight > post.quantity:
+    if final_weight != post.quantity:
 
-        error_message = f'Weight cannot be more than the available {post.quantity} Kg.'
+        error_message = f'Offers are for the whole lot of {post.quantity} Kg.'
         return render_template('view_post.html', 
                                title=post.trash_type, 
                                post=post, 
                                weight_error=error_message)
 
-    if final_weight > 0 and final_price_per_kg >= 0:
-        post.status = 'negotiating'
-        post.collector_id = current_user.id
-        post.final_weight_kg = final_weight
-        post.final_price_per_kg = final_price_per_kg
-        post.total_transaction_value = Decimal(final_weight) * final_price_per_kg
+    if final_weight > 0 and final_price_per_kg > 0:
+        transitions.expire_offers()
+        if not transitions.place_offer(post, current_user.id, final_weight, final_price_per_kg):
+            db.session.rollback()
+            flash('This post is no longer accepting offers.', 'warning')
+            return redirect(url_for('main.view_post', post_id=post.id))
         db.session.commit()
+        page_cache.bump(f'post:{post.id}')
+        feed_hub.publish('offer_placed', post, price_per_kg=final_price_per_kg, weight_kg=final_weight)
         flash('Your offer has been sent to the seller!', 'success')
-        return redirect(url_for('collector_dashboard'))
+        return redirect(url_for('main.collector_dashboard'))
     else:
         flash('Weight and Price must be positive.', 'danger')
-        return redirect(url_for('view_post', post_id=post.id))
+        return redirect(url_for('main.view_post', post_id=post.id))
 
-@app.route('/offer/<int:post_id>/accept', methods=['POST'])
+@main.route('/offer/<int:offer_id>/accept', methods=['POST'])
 @login_required
-def accept_offer(post_id):
-    post = TrashPost.query.get_or_404(post_id)
+def accept_offer(offer_id):
+    offer = Offer.query.get_or_404(offer_id)
+    post = offer.post
     if post.owner != current_user:
         flash('You are not authorized to perform this action.', 'danger')
-        return redirect(url_for('user_dashboard'))
-
-    profit = post.total_transaction_value * Decimal('0.10')
-    seller_earning = post.total_transaction_value - profit
+        return redirect(url_for('main.user_dashboard'))
 
-    post.status = 'completed'
-    post.platform_profit = profit
-    post.completed_at = datetime.utcnow()
-    
-    seller = post.owner
-    if seller.total_earnings is None:
-        seller.total_earnings = Decimal('0.0')
-    seller.total_earnings += seller_earning
-    
+    if not transitions.accept_offer(post, offer.id):
+        db.session.rollback()
+        flash('This offer is no longer pending.', 'warning')
+        return redirect(url_for('main.user_dashboard'))
     db.session.commit()
+    page_cache.invalidate_post(post.id)
+    feed_hub.publish('post_claimed', post)
     flash('Offer accepted and transaction is complete!', 'success')
-    return redirect(url_for('user_dashboard'))
+    return redirect(url_for('main.user_dashboard'))
 
-@app.route('/offer/<int:post_id>/reject', methods=['POST'])
+@main.route('/offer/<int:offer_id>/reject', methods=['POST'])
 @login_required
-def reject_offer(post_id):
-    post = TrashPost.query.get_or_404(post_id)
+def reject_offer(offer_id):
+    offer = Offer.query.get_or_404(offer_id)
+    post = offer.post
     if post.owner != current_user:
         flash('You are not authorized to perform this action.', 'danger')
-        return redirect(url_for('user_dashboard'))
+        return redirect(url_for('main.user_dashboard'))
 
-    post.status = 'available'
-    post.collector_id = None
-    post.final_weight_kg = None
-    post.final_price_per_kg = None
-    post.total_transaction_value = None
+    if not transitions.reject_offer(post, offer.id):
+        db.session.rollback()
+        flash('This offer is no longer pending.', 'warning')
+        return redirect(url_for('main.user_dashboard'))
     db.session.commit()
-    flash('Offer has been rejected and your post is available again.', 'info')
-    return redirect(url_for('user_dashboard'))
+    page_cache.bump(f'post:{post.id}')
+    feed_hub.publish('offer_rejected', post)
+    flash('Offer has been rejected.', 'info')
+    return redirect(url_for('main.user_dashboard'))
 
-@app.route('/admin/dashboard')
+@main.route('/admin/dashboard')
 @login_required
+@query_budget(5)
 def admin_dashboard():
     if not current_user.is_admin:
         flash('You do not have permission to access this page.', 'danger')
-        return redirect(url_for('home'))
+        return redirect(url_for('main.home'))
 
-    total_users = User.query.count()
-    total_posts = TrashPost.query.count()
-    total_sales = db.session.query(db.func.sum(TrashPost.total_transaction_value)).filter(TrashPost.status == 'completed').scalar() or 0.0
-    total_profit = db.session.query(db.func.sum(TrashPost.platform_profit)).filter(TrashPost.status == 'completed').scalar() or 0.0
+    platform = PlatformStats.current()
     
     recent_users = User.query.order_by(User.created_at.desc()).limit(5).all()
-    recent_transactions = TrashPost.query.filter(TrashPost.status == 'completed').order_by(TrashPost.completed_at.desc()).limit(5).all()
+    recent_transactions = TrashPost.query.filter(TrashPost.status == 'completed').options(db.joinedload(TrashPost.owner), db.joinedload(TrashPost.collector)).order_by(TrashPost.completed_at.desc()).limit(5).all()
 
     return render_template('admin_dashboard.html', 
                            title='Admin Panel',
-                           total_users=total_users,
-                           total_posts=total_posts,
-                           total_sales=total_sales,
-                           total_profit=total_profit,
+                           total_users=platform.total_users,
+                           total_posts=platform.total_posts,
+                           total_sales=platform.total_sales,
+                           total_profit=platform.total_profit,
                            recent_users=recent_users,
                            recent_transactions=recent_transactions)
 
-@app.route('/admin/users')
+USER_SORTS = {
+    'id': User.id,
+    'username': User.username,
+    'email': User.email,
+    'joined': User.created_at,
+}
+
+@main.route('/admin/users')
 @login_required
+@query_budget(3)
 def manage_users():
     if not current_user.is_admin:
         flash('You do not have permission to access this page.', 'danger')
-        return redirect(url_for('home'))
-    
-    users = User.query.all()
-    return render_template('manage_users.html', title='Manage Users', users=users)
+        return redirect(url_for('main.home'))
+
+    sort = request.args.get('sort') if request.args.get('sort') in USER_SORTS else 'joined'
+    descending = request.args.get('dir', 'desc' if sort == 'joined' else 'asc') == 'desc'
+    search = request.args.get('q', '').strip()
+    query = User.query
+    if search:
+        # A prefix range on the unique index instead of LIKE, which SQLite cannot index case-sensitively.
+        column = User.email if '@' in search else User.username
+        query = query.filter(column >= search, column < search + '\U0010ffff')
+    per_page = max(1, min(request.args.get('per_page', 50, type=int), 200))
+    users = sorted_paginate(query, USER_SORTS[sort], User.id, request.args.get('cursor'), per_page, descending)
+    return render_template('manage_users.html', title='Manage Users', users=users, sort=sort, descending=descending,
+                           search=search, total_users=PlatformStats.current().total_users)
+
+def _admin_users_redirect():
+    # Back to the same page of the table, but never off-site.
+    target = request.form.get('next', '')
+    if not target.startswith('/admin/users') or target.startswith('//'):
+        target = url_for('main.manage_users')
+    return redirect(target)
+
+@main.route('/admin/users/bulk', methods=['POST'])
+@login_required
+def bulk_users():
+    if not current_user.is_admin:
+        flash('Unauthorized access.', 'danger')
+        return redirect(url_for('main.home'))
+
+    user_ids = request.form.getlist('user_ids', type=int)
+    action = request.form.get('action')
+    if not user_ids:
+        flash('Select at least one user.', 'warning')
+        return _admin_users_redirect()
+
+    if action == 'delete':
+        removed, post_ids, image_files = moderation.delete_users(user_ids)
+        db.session.commit()
+        moderation.discard_images(image_files)
+        feed_hub.posts_removed(post_ids, 'deleted')
+        page_cache.invalidate_all()
+        flash(f'{len(removed)} user(s) and their posts have been deleted.', 'success')
+    elif action in ('suspend', 'unsuspend'):
+        changed = moderation.suspend_users(user_ids, suspended=action == 'suspend')
+        db.session.commit()
+        flash(f'{len(changed)} user(s) {action}ed.', 'success')
+    else:
+        flash('Unknown action.', 'danger')
+    return _admin_users_redirect()
 
-@app.route('/admin/user/<int:user_id>/delete', methods=['POST'])
+@main.route('/admin/user/<int:user_id>/delete', methods=['POST'])
 @login_required
 def delete_user(user_id):
     if not current_user.is_admin:
         flash('Unauthorized access.', 'danger')
-        return redirect(url_for('home'))
+        return redirect(url_for('main.home'))
 
     user_to_delete = User.query.get_or_404(user_id)
     if user_to_delete.is_admin:
         flash('Admin users cannot be deleted.', 'warning')
-        return redirect(url_for('manage_users'))
+        return redirect(url_for('main.manage_users'))
 
-    TrashPost.query.filter_by(user_id=user_id).delete()
-    db.session.delete(user_to_delete)
+    _, post_ids, image_files = moderation.delete_users([user_id])
     db.session.commit()
+    moderation.discard_images(image_files)
+    feed_hub.posts_removed(post_ids, 'deleted')
+    page_cache.invalidate_all()
     flash('User and their posts have been deleted.', 'success')
-    return redirect(url_for('manage_users'))
+    return redirect(url_for('main.manage_users'))
 
+def _date_arg(name):
+    try:
+        return datetime.strptime(request.args.get(name, ''), '%Y-%m-%d').date()
+    except ValueError:
+        return None
 
-@app.route('/post/<int:post_id>/review', methods=['POST'])
+@main.route('/admin/reports')
+@login_required
+@query_budget(4)
+def reports():
+    if not current_user.is_admin:
+        flash('You do not have permission to access this page.', 'danger')
+        return redirect(url_for('main.home'))
+
+    period = request.args.get('period') if request.args.get('period') in stats.ROLLUP_PERIODS else 'day'
+    dimension = request.args.get('dimension') if request.args.get('dimension') in stats.ROLLUP_DIMENSIONS else 'trash_type'
+    end = _date_arg('end') or date.today()
+    start = _date_arg('start') or end - timedelta(days=30 if period == 'day' else 84)
+    buckets = (stats.period_start(period, start), end)
+    totals = TransactionRollup.totals(period, *buckets)
+    breakdown = TransactionRollup.report(period, dimension, *buckets)
+
+    names = {}
+    if dimension != 'trash_type':
+        user_ids = {int(row.key) for row in breakdown if row.key}
+        if user_ids:
+            names = {str(user_id): username for user_id, username in
+                     db.session.query(User.id, User.username).filter(User.id.in_(user_ids))}
+    return render_template('reports.html', title='Reports', period=period, dimension=dimension, start=start, end=end,
+                           totals=totals, breakdown=breakdown, names=names, formats=list(export.FORMATS),
+                           span=timedelta(days=6 if period == 'week' else 0),
+                           export_filter='trash_type' if dimension == 'trash_type' else dimension + '_id')
+
+@main.route('/admin/export/transactions.<fmt>')
+@login_required
+def export_transactions(fmt):
+    if not current_user.is_admin:
+        flash('You do not have permission to access this page.', 'danger')
+        return redirect(url_for('main.home'))
+    if fmt not in export.FORMATS:
+        abort(404)
+
+    start, end = _date_arg('start'), _date_arg('end')
+    batches = export.transactions(
+        start=start, end=end + timedelta(days=1) if end else None,
+        trash_type=request.args.get('trash_type'),
+        seller_id=request.args.get('seller_id', type=int),
+        collector_id=request.args.get('collector_id', type=int),
+    )
+    mimetype, stream = export.FORMATS[fmt]
+    response = current_app.response_class(stream_with_context(stream(batches)), mimetype=mimetype)
+    response.headers['Content-Disposition'] = f'attachment; filename=transactions-{start or "all"}-{end or date.today()}.{fmt}'
+    return response
+
+
+@main.route('/post/<int:post_id>/review', methods=['POST'])
 @login_required
 def add_review(post_id):
-    post = TrashPost.query.get_or_404(post_id)
+    post = TrashPost.find(post_id) or abort(404)
     rating = request.form.get('rating')
     comment = request.form.get('comment')
     
     if not rating:
         flash('Rating is required.', 'danger')
-        return redirect(url_for('view_post', post_id=post.id))
+        return redirect(url_for('main.view_post', post_id=post.id))
 
     if current_user.id == post.user_id: 
         reviewee_id = post.collector_id
@@ -357,15 +534,17 @@ def add_review(post_id):
         reviewee_id = post.user_id
     else:
         flash('You are not authorized to review this transaction.', 'danger')
-        return redirect(url_for('view_post', post_id=post.id))
+        return redirect(url_for('main.view_post', post_id=post.id))
         
     existing_review = Review.query.filter_by(post_id=post.id, reviewer_id=current_user.id).first()
     if existing_review:
         flash('You have already submitted a review for this transaction.', 'warning')
-        return redirect(url_for('view_post', post_id=post.id))
+        return redirect(url_for('main.view_post', post_id=post.id))
 
     review = Review(rating=int(rating), comment=comment, post_id=post.id, reviewer_id=current_user.id, reviewee_id=reviewee_id)
     db.session.add(review)
+    db.session.execute(User.rating_update(reviewee_id, review.rating))
+    identity_cache.invalidate_on_commit(db.session, reviewee_id)
     db.session.commit()
     flash('Your review has been submitted.', 'success')
-    return redirect(url_for('view_post', post_id=post.id))
\ No newline at end of file
+    return redirect(url_for('main.view_post', post_id=post.id))
\ No newline at end of file
@@ -0,0 +1,177 @@
+import binascii
+import re
+from sqlalchemy import bindparam, event, inspect, text
+from app import db
+from models import TrashPost
+from pagination import KeysetPage, pack_token, unpack_token
+
+FTS_TABLE = 'trash_post_fts'
+INDEXED_FIELDS = ('trash_type', 'location', 'description')
+
+# Bengali vowel signs and the hasanta are combining marks, which \w alone would split words on.
+TOKEN_RE = re.compile(r'[\wঀ-৿]+')
+
+PG_DOCUMENT = "coalesce(trash_type, '') || ' ' || coalesce(location, '') || ' ' || coalesce(description, '')"
+PG_VECTOR = (
+    "setweight(to_tsvector('simple', coalesce(trash_type, '')), 'A') || "
+    "setweight(to_tsvector('simple', coalesce(location, '')), 'B') || "
+    "setweight(to_tsvector('simple', coalesce(description, '')), 'C')"
+)
+
+
+def _dialect(bind):
+    return bind.dialect.name
+
+
+def create_search_index(bind):
+    dialect = _dialect(bind)
+    if dialect == 'sqlite':
+        bind.execute(text(
+            f"CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5("
+            "trash_type, location, description, "
+            "tokenize='unicode61 remove_diacritics 2', prefix='2 3')"
+        ))
+    elif dialect == 'postgresql':
+        # Expression indexes are maintained by Postgres itself, so no sync hooks are needed.
+        bind.execute(text("CREATE EXTENSION IF NOT EXISTS pg_trgm"))
+        bind.execute(text(f"CREATE INDEX IF NOT EXISTS ix_trash_post_search ON trash_post USING GIN (({PG_VECTOR}))"))
+        bind.execute(text(f"CREATE INDEX IF NOT EXISTS ix_trash_post_search_trgm ON trash_post USING GIN (({PG_DOCUMENT}) gin_trgm_ops)"))
+
+
+def rebuild_search_index(bind):
+    create_search_index(bind)
+    if _dialect(bind) != 'sqlite':
+        return 0
+    bind.execute(text(f"DELETE FROM {FTS_TABLE}"))
+    result = bind.execute(text(
+        f"INSERT INTO {FTS_TABLE} (rowid, trash_type, location, description) "
+        "SELECT id, trash_type, location, coalesce(description, '') FROM trash_post WHERE status = 'available'"
+    ))
+    bind.execute(text(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('optimize')"))
+    return result.rowcount
+
+
+def _index_post(connection, post):
+    connection.execute(text(f"DELETE FROM {FTS_TABLE} WHERE rowid = :id"), {'id': post.id})
+    # Only open listings are searchable, so the index stays as small as the live marketplace.
+    if post.status == 'available':
+        connection.execute(
+            text(f"INSERT INTO {FTS_TABLE} (rowid, trash_type, location, description) VALUES (:id, :trash_type, :location, :description)"),
+            {'id': post.id, 'trash_type': post.trash_type, 'location': post.location, 'description': post.description or ''}
+        )
+
+
+def reindex_post(post_id):
+    reindex_posts([post_id])
+
+
+def reindex_posts(post_ids, chunk=500):
+    # For writes that bypass the ORM (bulk/conditional UPDATEs and DELETEs), which the mapper events never see.
+    if _dialect(db.session.get_bind()) != 'sqlite':
+        return
+    post_ids = list(post_ids)
+    remove = text(f"DELETE FROM {FTS_TABLE} WHERE rowid IN :ids").bindparams(bindparam('ids', expanding=True))
+    insert = text(
+        f"INSERT INTO {FTS_TABLE} (rowid, trash_type, location, description) "
+        "SELECT id, trash_type, location, coalesce(description, '') FROM trash_post WHERE id IN :ids AND status = 'available'"
+    ).bindparams(bindparam('ids', expanding=True))
+    for start in range(0, len(post_ids), chunk):
+        ids = post_ids[start:start + chunk]
+        db.session.execute(remove, {'ids': ids})
+        db.session.execute(insert, {'ids': ids})
+
+
+@event.listens_for(db.metadata, 'after_create')
+def _after_create(target, connection, **kw):
+    create_search_index(connection)
+
+
+@event.listens_for(TrashPost, 'after_insert')
+def _after_insert(mapper, connection, target):
+    if _dialect(connection) == 'sqlite':
+        _index_post(connection, target)
+
+
+@event.listens_for(TrashPost, 'after_update')
+def _after_update(mapper, connection, target):
+    if _dialect(connection) != 'sqlite':
+        return
+    state = inspect(target)
+    if any(state.attrs[field].history.has_changes() for field in INDEXED_FIELDS + ('status',)):
+        _index_post(connection, target)
+
+
+@event.listens_for(TrashPost, 'after_delete')
+def _after_delete(mapper, connection, target):
+    if _dialect(connection) == 'sqlite':
+        connection.execute(text(f"DELETE FROM {FTS_TABLE} WHERE rowid = :id"), {'id': target.id})
+
+
+def query_tokens(query):
+    return TOKEN_RE.findall(query.lower())
+
+
+def _decode_search_cursor(token):
+    if not token:
+        return None
+    try:
+        score, row_id = unpack_token(token, 2)
+        return float(score), int(row_id)
+    except (binascii.Error, UnicodeDecodeError, ValueError):
+        return None
+
+
+def _sqlite_ranked_ids(tokens, position, limit):
+    # Every token is a prefix match, so "plas" finds "plastic" and "কাগ" finds "কাগজ".
+    match = ' '.join('"{}"*'.format(token.replace('"', '""')) for token in tokens)
+    score = f"bm25({FTS_TABLE}, 10.0, 5.0, 1.0)"
+    sql = (
+        f"SELECT {FTS_TABLE}.rowid, {score} FROM {FTS_TABLE} "
+        f"JOIN trash_post ON trash_post.id = {FTS_TABLE}.rowid "
+        f"WHERE {FTS_TABLE} MATCH :match AND trash_post.status = 'available'"
+    )
+    params = {'match': match, 'limit': limit}
+    if position:
+        sql += f" AND ({score} > :score OR ({score} = :score AND {FTS_TABLE}.rowid > :id))"
+        params.update(score=position[0], id=position[1])
+    sql += f" ORDER BY {score}, {FTS_TABLE}.rowid LIMIT :limit"
+    return db.session.execute(text(sql), params).all()
+
+
+def _postgres_ranked_ids(tokens, position, limit):
+    tsquery = ' & '.join(f"{token.replace(':', '').replace(chr(39), '')}:*" for token in tokens)
+    # ts_rank is "higher is better"; negate it so both backends page in ascending score order.
+    score = f"-ts_rank(({PG_VECTOR}), to_tsquery('simple', :tsquery))"
+    sql = (
+        f"SELECT id, {score} FROM trash_post "
+        f"WHERE status = 'available' AND (({PG_VECTOR}) @@ to_tsquery('simple', :tsquery) OR ({PG_DOCUMENT}) ILIKE :like)"
+    )
+    params = {'tsquery': tsquery, 'like': '%' + ' '.join(tokens) + '%', 'limit': limit}
+    if position:
+        sql += f" AND ({score} > :score OR ({score} = :score AND id > :id))"
+        params.update(score=position[0], id=position[1])
+    sql += f" ORDER BY {score}, id LIMIT :limit"
+    return db.session.execute(text(sql), params).all()
+
+
+def search_posts(query, cursor=None, per_page=24):
+    tokens = query_tokens(query)
+    if not tokens:
+        return KeysetPage([], None, per_page)
+
+    position = _decode_search_cursor(cursor)
+    dialect = _dialect(db.session.get_bind())
+    if dialect == 'postgresql':
+        rows = _postgres_ranked_ids(tokens, position, per_page + 1)
+    else:
+        rows = _sqlite_ranked_ids(tokens, position, per_page + 1)
+
+    next_cursor = None
+    if len(rows) > per_page:
+        rows = rows[:per_page]
+        next_cursor = pack_token(repr(rows[-1][1]), rows[-1][0])
+
+    ids = [row[0] for row in rows]
+    posts = TrashPost.query.options(db.joinedload(TrashPost.owner)).filter(TrashPost.id.in_(ids)).all() if ids else []
+    by_id = {post.id: post for post in posts}
+    return KeysetPage([by_id[i] for i in ids if i in by_id], next_cursor, per_page)
@@ -0,0 +1,102 @@
+// Live pickups on the collector dashboard, pushed over Server-Sent Events.
+
+document.addEventListener('DOMContentLoaded', function() {
+    const grid = document.querySelector('[data-feed]');
+    if (!grid || !window.EventSource) {
+        return;
+    }
+    const form = document.getElementById('live-filter');
+    const status = document.getElementById('live-status');
+    const stored = JSON.parse(localStorage.getItem('liveFilter') || '{}');
+    let source = null;
+
+    function element(tag, className, text) {
+        const node = document.createElement(tag);
+        if (className) node.className = className;
+        if (text !== undefined) node.textContent = text;
+        return node;
+    }
+
+    function info(icon, text) {
+        const line = element('p', 'post-card-info');
+        line.appendChild(element('i', 'fas ' + icon));
+        line.appendChild(document.createTextNode(' ' + text));
+        return line;
+    }
+
+    function card(post) {
+        const node = element('div', 'post-card post-card-new');
+        node.dataset.postId = post.post_id;
+        node.appendChild(element('h4', null, post.trash_type));
+        node.appendChild(info('fa-map-marker-alt', post.location));
+        node.appendChild(info('fa-balance-scale', 'Approx. ' + post.quantity + ' Kg/Pcs'));
+        node.appendChild(info('fa-star', 'Seller: ' + post.seller));
+        node.appendChild(element('p', 'post-card-price', 'Asking Price: ৳' + Number(post.price_per_kg).toFixed(2) + '/Kg'));
+        const link = element('a', 'btn-view-post', 'View Details');
+        link.href = post.url;
+        node.appendChild(link);
+        return node;
+    }
+
+    function remove(postIds) {
+        postIds.forEach(function(postId) {
+            const node = grid.querySelector('[data-post-id="' + Number(postId) + '"]');
+            if (node) node.remove();
+        });
+    }
+
+    function connect(filter) {
+        if (source) source.close();
+        const params = new URLSearchParams();
+        if (filter.trash_type) params.set('trash_type', filter.trash_type);
+        if (filter.area) params.set('area', filter.area);
+        source = new EventSource(grid.dataset.feed + '?' + params.toString());
+
+        source.addEventListener('open', function() {
+            if (status) status.textContent = 'Live';
+        });
+        source.addEventListener('error', function() {
+            if (status) status.textContent = 'Reconnecting…';
+        });
+        source.addEventListener('post_created', function(event) {
+            const post = JSON.parse(event.data);
+            if (!grid.querySelector('[data-post-id="' + Number(post.post_id) + '"]')) {
+                grid.prepend(card(post));
+            }
+        });
+        source.addEventListener('post_claimed', function(event) {
+            remove([JSON.parse(event.data).post_id]);
+        });
+        source.addEventListener('post_removed', function(event) {
+            remove(JSON.parse(event.data).post_ids);
+        });
+        source.addEventListener('offer_placed', function(event) {
+            const offer = JSON.parse(event.data);
+            const node = grid.querySelector('[data-post-id="' + Number(offer.post_id) + '"]');
+            if (node) {
+                let badge = node.querySelector('.post-card-bid');
+                if (!badge) {
+                    badge = element('p', 'post-card-info post-card-bid');
+                    node.insertBefore(badge, node.querySelector('.btn-view-post'));
+                }
+                badge.textContent = 'Latest offer: ৳' + Number(offer.price_per_kg).toFixed(2) + '/Kg';
+            }
+        });
+        source.addEventListener('reset', function() {
+            // Too far behind to replay; start over from a fresh page.
+            window.location.reload();
+        });
+    }
+
+    if (form) {
+        form.trash_type.value = stored.trash_type || '';
+        form.area.value = stored.area || '';
+        form.addEventListener('submit', function(event) {
+            event.preventDefault();
+            const filter = {trash_type: form.trash_type.value.trim(), area: form.area.value.trim()};
+            localStorage.setItem('liveFilter', JSON.stringify(filter));
+            connect(filter);
+        });
+    }
+    connect(stored);
+});
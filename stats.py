@@ -0,0 +1,195 @@
+from datetime import datetime, timedelta
+from decimal import Decimal
+from sqlalchemy.dialects import postgresql, sqlite
+from app import db
+from models import User, TrashPost, ArchivedPost, PlatformStats, DailyStats, TransactionRollup
+
+ROLLUP_PERIODS = ('day', 'week')
+ROLLUP_DIMENSIONS = ('trash_type', 'seller', 'collector')
+ROLLUP_CHUNK = 1000
+
+
+def _insert():
+    return postgresql.insert if db.session.get_bind().dialect.name == 'postgresql' else sqlite.insert
+
+
+def _upsert(model, key, deltas, **extra):
+    table = model.__table__
+    stmt = _insert()(table).values(**key, **deltas, **extra)
+    # Counters are bumped in SQL so concurrent workers never overwrite each other's increments.
+    updates = {name: table.c[name] + stmt.excluded[name] for name in deltas}
+    updates.update({name: stmt.excluded[name] for name in extra})
+    db.session.execute(stmt.on_conflict_do_update(index_elements=list(key), set_=updates))
+
+
+def record(users=0, posts=0, sales=0, profit=0, completed=0, daily=True):
+    # Runs inside the caller's transaction; the stats only change if the write they describe commits.
+    _upsert(PlatformStats, {'id': 1}, {
+        'total_users': users,
+        'total_posts': posts,
+        'total_sales': Decimal(sales),
+        'total_profit': Decimal(profit),
+    }, updated_at=datetime.utcnow())
+
+    if daily:
+        _upsert(DailyStats, {'day': datetime.utcnow().date()}, {
+            'new_users': max(users, 0),
+            'new_posts': max(posts, 0),
+            'completed_transactions': completed,
+            'sales': Decimal(sales),
+            'profit': Decimal(profit),
+        })
+
+
+def period_start(period, day):
+    # Weeks start on Monday, like date_trunc('week') and SQLite's 'weekday 0', '-6 days'.
+    return day - timedelta(days=day.weekday()) if period == 'week' else day
+
+
+def _rollup_keys(trash_type, seller_id, collector_id):
+    return {
+        'trash_type': (trash_type or '').strip().lower()[:64],
+        'seller': str(seller_id),
+        'collector': '' if collector_id is None else str(collector_id),
+    }
+
+
+def _add_to_rollups(buckets, completed_at, keys, weight, sales, profit, sign=1):
+    for period in ROLLUP_PERIODS:
+        start = period_start(period, completed_at.date())
+        for dimension, key in keys.items():
+            bucket = buckets.setdefault((period, dimension, start, key), [0, 0.0, Decimal(0), Decimal(0)])
+            bucket[0] += sign
+            bucket[1] += sign * (weight or 0)
+            bucket[2] += sign * Decimal(sales or 0)
+            bucket[3] += sign * Decimal(profit or 0)
+
+
+def _apply_rollups(buckets):
+    table = TransactionRollup.__table__
+    rows = [
+        {'period': period, 'dimension': dimension, 'period_start': start, 'key': key,
+         'transactions': count, 'weight_kg': weight, 'sales': sales, 'profit': profit}
+        for (period, dimension, start, key), (count, weight, sales, profit) in buckets.items()
+    ]
+    for offset in range(0, len(rows), ROLLUP_CHUNK):
+        stmt = _insert()(table).values(rows[offset:offset + ROLLUP_CHUNK])
+        db.session.execute(stmt.on_conflict_do_update(
+            index_elements=['period', 'dimension', 'period_start', 'key'],
+            set_={name: table.c[name] + stmt.excluded[name] for name in ('transactions', 'weight_kg', 'sales', 'profit')}
+        ))
+
+
+def record_transaction(post, collector_id, weight, sales, profit, completed_at):
+    # Same transaction as the sale itself, so a report can never show a sale that rolled back.
+    record(sales=sales, profit=profit, completed=1)
+    buckets = {}
+    _add_to_rollups(buckets, completed_at, _rollup_keys(post.trash_type, post.user_id, collector_id), weight, sales, profit)
+    _apply_rollups(buckets)
+
+
+def _remove_from_rollups(model, condition):
+    completed = db.session.execute(
+        db.select(model.completed_at, model.trash_type, model.user_id, model.collector_id,
+                  model.final_weight_kg, model.total_transaction_value, model.platform_profit)
+        .where(condition, model.status == 'completed', model.completed_at.isnot(None))
+        .execution_options(yield_per=ROLLUP_CHUNK)
+    )
+    buckets = {}
+    for completed_at, trash_type, seller_id, collector_id, weight, sales, profit in completed:
+        _add_to_rollups(buckets, completed_at, _rollup_keys(trash_type, seller_id, collector_id), weight, sales, profit, sign=-1)
+    _apply_rollups(buckets)
+
+
+def _period_column(period, column):
+    if db.session.get_bind().dialect.name == 'postgresql':
+        return db.cast(db.func.date_trunc(period, column), db.Date)
+    return db.func.date(column, 'weekday 0', '-6 days') if period == 'week' else db.func.date(column)
+
+
+def completed_sales():
+    # Live and archived sales as one relation.
+    return db.union_all(*(
+        db.select(model.id, model.completed_at, model.trash_type, model.user_id, model.collector_id,
+                  model.final_weight_kg, model.total_transaction_value, model.platform_profit)
+        .where(model.status == 'completed', model.completed_at.isnot(None))
+        for model in (TrashPost, ArchivedPost)
+    )).subquery()
+
+
+def rebuild_rollups():
+    # Recomputes every bucket from the posts tables; for new installs and after manual data fixes.
+    sales = completed_sales()
+    keys = {
+        'trash_type': db.func.substr(db.func.lower(db.func.trim(sales.c.trash_type)), 1, 64),
+        'seller': db.cast(sales.c.user_id, db.String),
+        'collector': db.func.coalesce(db.cast(sales.c.collector_id, db.String), ''),
+    }
+    db.session.execute(db.delete(TransactionRollup))
+    for period in ROLLUP_PERIODS:
+        start = _period_column(period, sales.c.completed_at)
+        for dimension, key in keys.items():
+            source = db.select(
+                db.literal(period), db.literal(dimension), start, key,
+                db.func.count(sales.c.id),
+                db.func.coalesce(db.func.sum(sales.c.final_weight_kg), 0),
+                db.func.coalesce(db.func.sum(sales.c.total_transaction_value), 0),
+                db.func.coalesce(db.func.sum(sales.c.platform_profit), 0)
+            ).group_by(start, key)
+            db.session.execute(db.insert(TransactionRollup).from_select(
+                ['period', 'dimension', 'period_start', 'key', 'transactions', 'weight_kg', 'sales', 'profit'], source
+            ))
+    db.session.commit()
+    return db.session.query(db.func.count()).select_from(TransactionRollup).scalar()
+
+
+def _removed_totals(model, condition):
+    completed = model.status == 'completed'
+    post_count, sales, profit = db.session.query(
+        db.func.count(model.id),
+        db.func.coalesce(db.func.sum(db.case((completed, model.total_transaction_value), else_=0)), 0),
+        db.func.coalesce(db.func.sum(db.case((completed, model.platform_profit), else_=0)), 0)
+    ).filter(condition).one()
+    return -post_count, -Decimal(sales), -Decimal(profit)
+
+
+def record_user_removal(*user_ids):
+    post_count, sales, profit = 0, Decimal(0), Decimal(0)
+    # Their archived posts go with them, so those sales come off the books too.
+    for model in (TrashPost, ArchivedPost):
+        removed = _removed_totals(model, model.user_id.in_(user_ids))
+        post_count, sales, profit = post_count + removed[0], sales + removed[1], profit + removed[2]
+        _remove_from_rollups(model, model.user_id.in_(user_ids))
+    record(users=-len(user_ids), posts=post_count, sales=sales, profit=profit, daily=False)
+
+
+def record_post_removal(*post_ids):
+    post_count, sales, profit = _removed_totals(TrashPost, TrashPost.id.in_(post_ids))
+    _remove_from_rollups(TrashPost, TrashPost.id.in_(post_ids))
+    record(posts=post_count, sales=sales, profit=profit, daily=False)
+
+
+def source_totals():
+    sales = completed_sales()
+    total_sales, total_profit = db.session.query(
+        db.func.sum(sales.c.total_transaction_value), db.func.sum(sales.c.platform_profit)
+    ).one()
+    return {
+        'total_users': User.query.count(),
+        'total_posts': TrashPost.query.count() + ArchivedPost.query.count(),
+        'total_sales': Decimal(total_sales or 0),
+        'total_profit': Decimal(total_profit or 0),
+    }
+
+
+def reconcile():
+    actual = source_totals()
+    stored = PlatformStats.current()
+    drift = {name: (getattr(stored, name), value) for name, value in actual.items() if Decimal(getattr(stored, name) or 0) != Decimal(value)}
+
+    row = db.session.merge(stored)
+    for name, value in actual.items():
+        setattr(row, name, value)
+    row.updated_at = datetime.utcnow()
+    db.session.commit()
+    return drift
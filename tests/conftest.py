@@ -0,0 +1,72 @@
+import os
+import sys
+from decimal import Decimal
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import create_app, db
+from models import User, TrashPost, Offer
+import transitions
+
+PASSWORD = 'secret1'
+
+
+@pytest.fixture
+def app(tmp_path):
+    # Every file the app writes lives under tmp_path, so tests never touch instance/ or static/.
+    app = create_app({
+        'TESTING': True,
+        'WTF_CSRF_ENABLED': False,
+        'SQLALCHEMY_DATABASE_URI': 'sqlite:///' + str(tmp_path / 'test.db'),
+        'UPLOAD_FOLDER': str(tmp_path / 'post_pics'),
+        'COLD_UPLOAD_FOLDER': str(tmp_path / 'cold_pics'),
+        'IMAGE_QUEUE_FOLDER': str(tmp_path / 'image_queue'),
+        'IMAGE_VARIANT_FOLDER': str(tmp_path / 'image_variants'),
+        'IMAGE_PIPELINE_SYNC': True,
+        'FEED_PATH': str(tmp_path / 'feed.db'),
+        'USER_CACHE_PATH': str(tmp_path / 'user_cache.db'),
+        'PAGE_CACHE_PATH': str(tmp_path / 'page_cache.db'),
+        'PAGE_CACHE_ENABLED': False,
+        'ASSETS_AUTO_BUILD': False,
+        'QUERY_COUNT_STRICT': True,
+    })
+    with app.app_context():
+        db.create_all()
+    yield app
+    with app.app_context():
+        db.session.remove()
+        db.engine.dispose()
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+
+def make_user(username, user_type='user', is_admin=False):
+    user = User.create(username, f'{username}@example.com', PASSWORD, user_type=user_type)
+    if is_admin:
+        user.is_admin = True
+        db.session.commit()
+    return user.id
+
+
+def make_post(user_id, trash_type='plastic bottles', location='Dhaka Mirpur', price='10.00', google_map_link=None):
+    return TrashPost.create(user_id, trash_type, 100, location, '', Decimal(price), True, '01700000000', google_map_link).id
+
+
+def sell(post_id, collector_id, price='12.00'):
+    post = db.session.get(TrashPost, post_id)
+    assert transitions.place_offer(post, collector_id, float(post.quantity), Decimal(price))
+    db.session.commit()
+    offer_id = db.session.scalar(db.select(Offer.id).filter_by(post_id=post_id, collector_id=collector_id, status='pending'))
+    assert transitions.accept_offer(db.session.get(TrashPost, post_id), offer_id)
+    db.session.commit()
+
+
+def login(client, username):
+    response = client.post('/login', data={'email': f'{username}@example.com', 'password': PASSWORD})
+    assert response.status_code == 302, response.status_code
+    return client
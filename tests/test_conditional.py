@@ -0,0 +1,35 @@
+from datetime import datetime, timedelta
+from app import db
+from conftest import make_post, make_user
+import moderation
+
+
+def test_listing_is_not_fresh_after_a_post_is_removed(app, client):
+    with app.app_context():
+        seller = make_user('seller')
+        kept, removed = make_post(seller), make_post(seller)
+
+    first = client.get('/posts')
+    etag = first.headers['ETag']
+    # Removing a post leaves every timestamp where it was, so a date cannot validate the listing.
+    assert 'Last-Modified' not in first.headers
+    assert client.get('/posts', headers={'If-None-Match': etag}).status_code == 304
+
+    with app.app_context():
+        moderation.delete_posts([removed])
+        db.session.commit()
+
+    refreshed = client.get('/posts', headers={'If-None-Match': etag})
+    assert refreshed.status_code == 200
+    assert f'/post/{removed}"' not in refreshed.get_data(as_text=True)
+    assert f'/post/{kept}"' in refreshed.get_data(as_text=True)
+
+    future = (datetime.utcnow() + timedelta(days=1)).strftime('%a, %d %b %Y %H:%M:%S GMT')
+    assert client.get('/posts', headers={'If-Modified-Since': future}).status_code == 200
+
+
+def test_post_page_still_answers_if_modified_since(app, client):
+    with app.app_context():
+        post_id = make_post(make_user('seller'))
+    last_modified = client.get(f'/post/{post_id}').headers['Last-Modified']
+    assert client.get(f'/post/{post_id}', headers={'If-Modified-Since': last_modified}).status_code == 304
@@ -0,0 +1,20 @@
+import csv
+import io
+from conftest import login, make_post, make_user, sell
+
+
+def test_csv_export_keeps_user_text_from_running_as_formulas(app, client):
+    with app.app_context():
+        make_user('admin', is_admin=True)
+        seller, collector = make_user('=cmd|calc'), make_user('@collector', user_type='collector')
+        sell(make_post(seller, '=HYPERLINK("http://evil.example","x")', '+880 Dhaka'), collector)
+        sell(make_post(seller, 'plastic - clean', '-1+1'), collector)
+    login(client, 'admin')
+
+    rows = list(csv.DictReader(io.StringIO(client.get('/admin/export/transactions.csv').get_data(as_text=True))))
+    assert [(row['trash_type'], row['location'], row['seller'], row['collector']) for row in rows] == [
+        ('\'=HYPERLINK("http://evil.example","x")', "'+880 Dhaka", "'=cmd|calc", "'@collector"),
+        ('plastic - clean', "'-1+1", "'=cmd|calc", "'@collector"),
+    ]
+    # Numbers are written as before.
+    assert float(rows[0]['seller_earnings']) > 0
@@ -0,0 +1,29 @@
+import time
+from conftest import login, make_user
+
+
+def test_stream_on_a_single_threaded_server_ends_before_the_worker_timeout(app, client):
+    app.config.update(FEED_MAX_SECONDS=300, FEED_SYNC_MAX_SECONDS=1, FEED_HEARTBEAT=15)
+    with app.app_context():
+        make_user('alice')
+    login(client, 'alice')
+
+    started = time.monotonic()
+    # The test client reports wsgi.multithread False, like gunicorn's sync worker.
+    response = client.get('/feed')
+    assert response.status_code == 200
+    assert response.get_data(as_text=True).startswith('retry:')
+    assert time.monotonic() - started < 5
+
+
+def test_streams_beyond_the_thread_share_are_turned_away(app):
+    app.config.update(FEED_MAX_CLIENTS=1, FEED_SYNC_MAX_SECONDS=1)
+    with app.app_context():
+        make_user('alice')
+    first, second = login(app.test_client(), 'alice'), login(app.test_client(), 'alice')
+
+    held = first.get('/feed', buffered=False)
+    next(held.response)
+    assert second.get('/feed').status_code == 503
+    held.close()
+    assert second.get('/feed').status_code == 200
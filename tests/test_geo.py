@@ -0,0 +1,56 @@
+import random
+from decimal import Decimal
+import pytest
+from sqlalchemy import event
+from app import db
+from models import TrashPost
+from geo import haversine_km
+from conftest import make_user
+
+DHAKA = (23.8103, 90.4125)
+
+
+@pytest.fixture
+def loaded(app):
+    # Counts posts the ORM built from fetched rows.
+    rows = []
+    listener = lambda target, context: rows.append(target.id)
+    event.listen(TrashPost, 'load', listener)
+    yield rows
+    event.remove(TrashPost, 'load', listener)
+
+
+def scatter(seller, count, spread, seed=7):
+    rng = random.Random(seed)
+    points = [(DHAKA[0] + rng.uniform(-spread, spread), DHAKA[1] + rng.uniform(-spread, spread)) for _ in range(count)]
+    db.session.add_all(
+        TrashPost(seller, 'plastic bottles', 10, 'Dhaka', '', Decimal('10.00'), True, '01700000000', f'https://maps.google.com/?q={lat},{lon}')
+        for lat, lon in points
+    )
+    db.session.commit()
+    return points
+
+
+def test_near_search_fetches_only_the_rows_it_returns(app, loaded):
+    with app.app_context():
+        points = scatter(make_user('seller'), 300, spread=0.1)
+        loaded.clear()
+        found = TrashPost.get_near(*DHAKA, radius_km=8, limit=10)
+
+        assert len(loaded) == len(found) == 10
+        expected = sorted(haversine_km(*DHAKA, lat, lon) for lat, lon in points)
+        assert [round(post.distance_km, 3) for post in found] == [round(distance, 3) for distance in expected[:10]]
+
+
+def test_widening_search_in_a_sparse_area_stays_bounded(app, loaded):
+    with app.app_context():
+        # A few posts close by and many far out: the wide rings must not load the far ones.
+        seller = make_user('seller')
+        scatter(seller, 3, spread=0.01, seed=1)
+        scatter(seller, 200, spread=0.8, seed=2)
+        loaded.clear()
+        found = TrashPost.get_nearest(*DHAKA, k=12, max_radius_km=100)
+
+        assert len(found) == 12
+        assert [post.distance_km for post in found] == sorted(post.distance_km for post in found)
+        assert len(loaded) <= 3 * 12
@@ -0,0 +1,99 @@
+import os
+import time
+import pytest
+from app import db
+from models import User, Review
+from identity import identity_cache
+from conftest import login, make_post, make_user, sell
+import moderation
+
+
+def change_in_another_process(app, user_id, **values):
+    # Stands in for make_admin.py or another gunicorn worker: same database and cache file, own memory.
+    pid = os.fork()
+    if pid == 0:
+        status = 1
+        try:
+            with app.app_context():
+                user = db.session.get(User, user_id)
+                for name, value in values.items():
+                    setattr(user, name, value)
+                db.session.commit()
+                status = 0
+        finally:
+            os._exit(status)
+    assert os.waitpid(pid, 0)[1] == 0
+
+
+def test_promotion_from_another_process_reaches_cached_sessions(app, client):
+    app.config['USER_CACHE_VERSION_POLL'] = 0.2
+    with app.app_context():
+        user_id = make_user('alice')
+    login(client, 'alice')
+    assert client.get('/admin/dashboard').status_code == 302
+
+    change_in_another_process(app, user_id, is_admin=True)
+    time.sleep(0.3)
+    assert client.get('/admin/dashboard').status_code == 200
+
+
+def test_suspension_from_another_process_ends_cached_sessions(app, client):
+    app.config['USER_CACHE_VERSION_POLL'] = 0.2
+    with app.app_context():
+        user_id = make_user('alice')
+    login(client, 'alice')
+    assert client.get('/dashboard').status_code == 200
+
+    change_in_another_process(app, user_id, is_suspended=True)
+    time.sleep(0.3)
+    assert client.get('/dashboard').status_code == 302
+
+
+
+def test_a_cached_user_costs_no_trip_to_the_shared_file(app, client):
+    app.config['USER_CACHE_VERSION_POLL'] = 0.5
+    with app.app_context():
+        make_user('alice')
+    login(client, 'alice')
+    client.get('/dashboard')
+
+    # Within the poll interval both the version and the user come from this process.
+    assert 'user;desc="hit"' in client.get('/dashboard').headers['Server-Timing']
+    time.sleep(0.6)
+    assert 'user;desc="hit, 1 shared"' in client.get('/dashboard').headers['Server-Timing']
+
+
+def test_a_change_in_this_process_shows_before_the_poll_interval(app, client):
+    app.config['USER_CACHE_VERSION_POLL'] = 60
+    with app.app_context():
+        user_id = make_user('alice')
+    login(client, 'alice')
+    assert client.get('/admin/dashboard').status_code == 302
+    with app.app_context():
+        db.session.get(User, user_id).is_admin = True
+        db.session.commit()
+    assert client.get('/admin/dashboard').status_code == 200
+
+def remove_by_orm(post_id):
+    db.session.delete(db.session.scalar(db.select(Review).filter_by(post_id=post_id)))
+
+
+def remove_with_the_post(post_id):
+    moderation.delete_posts([post_id])
+
+
+@pytest.mark.parametrize('remove', [remove_by_orm, remove_with_the_post])
+def test_removing_a_review_refreshes_the_cached_reviewee(app, remove):
+    with app.app_context():
+        seller, buyer = make_user('seller'), make_user('buyer', user_type='collector')
+        post_id = make_post(seller)
+        sell(post_id, buyer)
+    assert login(app.test_client(), 'buyer').post(f'/post/{post_id}/review', data={'rating': '4'}).status_code == 302
+    with app.app_context():
+        assert identity_cache.load(seller).rating_count == 1
+
+    with app.app_context():
+        remove(post_id)
+        db.session.commit()
+    with app.app_context():
+        assert identity_cache.load(seller).rating_count == 0
@@ -0,0 +1,38 @@
+import io
+import os
+from PIL import Image
+from app import db
+from models import TrashPost
+from conftest import login, make_user
+
+
+def png(width=1600, height=1200):
+    buffer = io.BytesIO()
+    Image.new('RGB', (width, height), (30, 120, 60)).save(buffer, 'PNG')
+    buffer.seek(0)
+    return buffer
+
+
+def test_upload_stores_one_copy_and_listing_serves_sized_variants(app, client):
+    with app.app_context():
+        make_user('seller')
+    login(client, 'seller')
+    response = client.post('/post/new', data={
+        'trash_type': 'plastic bottles', 'quantity': 10, 'price_per_kg': '5.00', 'location': 'Dhaka',
+        'description': 'clean bottles', 'phone_number': '01700000000', 'google_map_link': '', 'picture': (png(), 'photo.png'),
+    }, content_type='multipart/form-data')
+    assert response.status_code == 302
+
+    with app.app_context():
+        image_file = db.session.scalar(db.select(TrashPost.image_file))
+    assert os.listdir(app.config['UPLOAD_FOLDER']) == [image_file]
+    with Image.open(os.path.join(app.config['UPLOAD_FOLDER'], image_file)) as stored:
+        assert max(stored.size) == 800
+
+    # Listing cards ask /img for the sizes they need instead of a pre-made thumbnail.
+    listing = client.get('/posts').get_data(as_text=True)
+    variant = next(part.split(' ')[0] for part in listing.split('srcset="')[1].split('"')[0].split(', ') if part.endswith(' 200w'))
+    response = client.get(variant)
+    assert response.status_code == 200
+    with Image.open(io.BytesIO(response.data)) as thumbnail:
+        assert max(thumbnail.size) == 200
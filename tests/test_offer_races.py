@@ -0,0 +1,80 @@
+import threading
+from decimal import Decimal
+from app import db
+from models import User, TrashPost, Offer
+from conftest import make_post, make_user
+import transitions
+
+BIDDERS = 6
+LATE_BIDDERS = 3
+ROUNDS = 5
+
+
+def race(app, workers):
+    start = threading.Barrier(len(workers))
+    results, errors = [], []
+
+    def run(kind, action, *args):
+        start.wait()
+        with app.app_context():
+            try:
+                done = action(db.session.get(TrashPost, args[0]), *args[1:])
+                if done:
+                    db.session.commit()
+                else:
+                    db.session.rollback()
+                results.append((kind, args[-1], bool(done)))
+            except Exception as exc:
+                errors.append(repr(exc))
+
+    threads = [threading.Thread(target=run, args=worker) for worker in workers]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert not errors, errors
+    return results
+
+
+def test_concurrent_accept_reject_and_offer_leave_one_winner(app):
+    with app.app_context():
+        seller = make_user('seller')
+        bidders = [make_user(f'bidder{i}', user_type='collector') for i in range(BIDDERS)]
+        late = [make_user(f'late{i}', user_type='collector') for i in range(LATE_BIDDERS)]
+
+    expected_earnings = Decimal(0)
+    for round_ in range(ROUNDS):
+        with app.app_context():
+            post_id = make_post(seller)
+            for i, collector in enumerate(bidders):
+                assert transitions.place_offer(db.session.get(TrashPost, post_id), collector, 100.0, Decimal(f'{10 + i}.00'))
+            db.session.commit()
+            offers = dict(db.session.execute(db.select(Offer.id, Offer.collector_id).filter_by(post_id=post_id)).all())
+
+        # The seller clicks accept on every bid at once, rejects half of them, and new collectors bid meanwhile.
+        workers = [('accept', transitions.accept_offer, post_id, offer_id) for offer_id in offers]
+        workers += [('reject', transitions.reject_offer, post_id, offer_id) for offer_id in list(offers)[::2]]
+        workers += [('offer', lambda post, collector: transitions.place_offer(post, collector, 100.0, Decimal('20.00')), post_id, collector)
+                    for collector in late]
+        results = race(app, workers)
+
+        accepted = [offer_id for kind, offer_id, done in results if kind == 'accept' and done]
+        rejected = {offer_id for kind, offer_id, done in results if kind == 'reject' and done}
+        assert len(accepted) == 1, results
+        winner = accepted[0]
+        assert winner not in rejected
+
+        with app.app_context():
+            post = db.session.get(TrashPost, post_id)
+            statuses = dict(db.session.execute(db.select(Offer.id, Offer.status).filter_by(post_id=post_id)).all())
+            winning = db.session.get(Offer, winner)
+            assert post.status == 'completed'
+            assert post.collector_id == offers[winner]
+            assert post.total_transaction_value == winning.total_value
+            assert [offer_id for offer_id, status in statuses.items() if status == 'accepted'] == [winner]
+            assert 'pending' not in statuses.values()
+            # A reject only counts if it landed first; every other losing bid was closed by the sale.
+            assert {offer_id for offer_id, status in statuses.items() if status == 'rejected'} == rejected
+            assert all(status == 'closed' for offer_id, status in statuses.items() if offer_id != winner and offer_id not in rejected)
+            expected_earnings += post.total_transaction_value - post.platform_profit
+            assert db.session.get(User, seller).total_earnings == expected_earnings, f'round {round_}'
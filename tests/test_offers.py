@@ -0,0 +1,97 @@
+import re
+import pytest
+from decimal import Decimal
+from app import db
+from models import TrashPost, Offer
+from conftest import login, make_post, make_user
+import transitions
+
+OFFER = {'final_weight': '100', 'final_price_per_kg': '15.00'}
+
+
+def dashboard_offer_ids(client):
+    return [int(offer_id) for offer_id in re.findall(r'/offer/(\d+)/accept', client.get('/dashboard').get_data(as_text=True))]
+
+
+def test_accepting_a_bid_that_was_revised_after_the_page_loaded_does_not_sell(app):
+    with app.app_context():
+        post_id = make_post(make_user('seller'))
+        make_user('collector', user_type='collector')
+    seller, collector = login(app.test_client(), 'seller'), login(app.test_client(), 'collector')
+    collector.post(f'/post/{post_id}/offer', data=OFFER)
+    [seen] = dashboard_offer_ids(seller)
+
+    # The collector cuts the price while the seller is looking at the 15.00 bid.
+    collector.post(f'/post/{post_id}/offer', data=dict(OFFER, final_price_per_kg='1.00'))
+    seller.post(f'/offer/{seen}/accept')
+
+    with app.app_context():
+        assert db.session.get(TrashPost, post_id).status == 'available'
+        assert db.session.get(Offer, seen).status == 'superseded'
+        pending = db.session.scalars(db.select(Offer).filter_by(post_id=post_id, status='pending')).all()
+        assert [str(offer.price_per_kg) for offer in pending] == ['1.00']
+    # The seller now sees, and can only accept, the revised bid.
+    assert dashboard_offer_ids(seller) == [pending[0].id]
+
+
+def test_a_bid_has_to_cover_the_whole_lot(app):
+    with app.app_context():
+        post_id = make_post(make_user('seller'))
+        make_user('collector', user_type='collector')
+    collector = login(app.test_client(), 'collector')
+
+    for weight in ('10', '150'):
+        response = collector.post(f'/post/{post_id}/offer', data=dict(OFFER, final_weight=weight))
+        assert 'Offers are for the whole lot of 100 Kg.' in response.get_data(as_text=True)
+    with app.app_context():
+        post = db.session.get(TrashPost, post_id)
+        assert not transitions.place_offer(post, make_user('other', user_type='collector'), 10.0, Decimal('15.00'))
+        assert db.session.scalar(db.select(db.func.count(Offer.id))) == 0
+
+
+def test_changing_the_quantity_closes_bids_made_for_the_old_lot(app):
+    with app.app_context():
+        post_id = make_post(make_user('seller'))
+        make_user('collector', user_type='collector')
+    seller, collector = login(app.test_client(), 'seller'), login(app.test_client(), 'collector')
+    collector.post(f'/post/{post_id}/offer', data=OFFER)
+    [seen] = dashboard_offer_ids(seller)
+
+    edit = {'trash_type': 'plastic bottles', 'price_per_kg': '10.00', 'location': 'Dhaka Mirpur',
+            'description': 'clean bottles', 'phone_number': '01700000000', 'quantity': '40'}
+    assert seller.post(f'/post/{post_id}/edit', data=edit).status_code == 302
+    with app.app_context():
+        assert db.session.get(TrashPost, post_id).quantity == 40
+        assert db.session.get(Offer, seen).status == 'closed'
+
+
+def test_accept_fails_if_the_lot_changed_under_a_pending_bid(app):
+    with app.app_context():
+        post_id = make_post(make_user('seller'))
+        collector_id = make_user('collector', user_type='collector')
+        assert transitions.place_offer(db.session.get(TrashPost, post_id), collector_id, 100.0, Decimal('15.00'))
+        db.session.commit()
+        offer_id = db.session.scalar(db.select(Offer.id))
+
+        # A write that skipped the edit route; the sale must not go through at the old weight.
+        db.session.execute(db.update(TrashPost).values(quantity=40))
+        db.session.commit()
+        assert not transitions.accept_offer(db.session.get(TrashPost, post_id), offer_id)
+        db.session.rollback()
+        assert db.session.get(TrashPost, post_id).status == 'available'
+
+
+@pytest.mark.parametrize('weight, price', [
+    ('100', 'abc'), ('100', 'NaN'), ('100', 'Infinity'), ('100', '-Infinity'), ('100', '1e40'),
+    ('100', '0'), ('100', '-5'), ('100', '0.001'), ('nan', '15.00'), ('inf', '15.00'), ('', '15.00'),
+])
+def test_offer_form_turns_away_prices_and_weights_that_are_not_positive_numbers(app, weight, price):
+    with app.app_context():
+        post_id = make_post(make_user('seller'))
+        make_user('collector', user_type='collector')
+    collector = login(app.test_client(), 'collector')
+
+    response = collector.post(f'/post/{post_id}/offer', data={'final_weight': weight, 'final_price_per_kg': price})
+    assert response.status_code in (200, 302)
+    with app.app_context():
+        assert db.session.scalar(db.select(db.func.count(Offer.id))) == 0
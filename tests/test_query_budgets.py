@@ -0,0 +1,70 @@
+import pytest
+from app import db
+from querycount import count_queries
+from conftest import login, make_post, make_user, sell
+import transitions
+from models import User, TrashPost
+from decimal import Decimal
+
+LIST_VIEWS = [
+    ('anonymous', '/posts'),
+    ('anonymous', '/posts?query=plastic'),
+    ('anonymous', '/api/v1/posts'),
+    ('seller0', '/dashboard'),
+    ('collector0', '/collector/dashboard'),
+    ('admin', '/admin/dashboard'),
+    ('admin', '/admin/users'),
+]
+
+
+def fill(sellers, collectors, posts_each):
+    # Each seller sells one post to the first collector and has open bids from every collector on the rest,
+    # so a lazy load per row would show up as extra statements.
+    for seller in sellers:
+        post_ids = [make_post(seller) for _ in range(posts_each)]
+        sell(post_ids[0], collectors[0])
+        for post_id in post_ids[1:]:
+            for collector in collectors:
+                assert transitions.place_offer(db.session.get(TrashPost, post_id), collector, 100.0, Decimal('11.00'))
+        db.session.commit()
+
+
+def user_id(username):
+    return db.session.scalar(db.select(User.id).filter_by(username=username))
+
+
+def statements(client, path):
+    with count_queries() as counter:
+        response = client.get(path)
+    assert response.status_code == 200, (path, response.status_code)
+    return counter.count
+
+
+@pytest.fixture
+def clients(app):
+    with app.app_context():
+        make_user('admin', is_admin=True)
+        collectors = [make_user(f'collector{i}', user_type='collector') for i in range(2)]
+        fill([make_user(f'seller{i}') for i in range(2)], collectors, posts_each=3)
+    clients = {'anonymous': app.test_client()}
+    for username in ('seller0', 'collector0', 'admin'):
+        clients[username] = login(app.test_client(), username)
+    return clients
+
+
+@pytest.mark.parametrize('user, path', LIST_VIEWS)
+def test_list_view_stays_within_its_budget(clients, user, path):
+    # QUERY_COUNT_STRICT turns a view going over its @query_budget into an exception.
+    statements(clients[user], path)
+
+
+@pytest.mark.parametrize('user, path', LIST_VIEWS)
+def test_list_view_statements_do_not_grow_with_rows(app, clients, user, path):
+    # Selling invalidates the seller's cached session user; load it every time so only the view is compared.
+    app.config['USER_CACHE_ENABLED'] = False
+    before = statements(clients[user], path)
+    with app.app_context():
+        # More of everything, including for the users whose dashboards are being checked.
+        collectors = [user_id('collector0'), user_id('collector1')]
+        fill([user_id('seller0'), make_user('seller2'), make_user('seller3')], collectors, posts_each=4)
+    assert statements(clients[user], path) == before
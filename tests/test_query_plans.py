@@ -0,0 +1,110 @@
+import re
+from datetime import date, datetime, timedelta
+import pytest
+from app import db
+from models import Offer
+from querycount import count_queries
+from conftest import login, make_post, make_user, sell
+import archive
+
+HOT_TABLES = ('trash_post', 'review', 'offer', 'user', 'transaction_rollup', 'archived_post')
+MAP_LINK = 'https://maps.google.com/?q=23.8,90.36'
+
+
+def full_scans(statement, parameters):
+    plan = db.session.connection().exec_driver_sql('EXPLAIN QUERY PLAN ' + statement, parameters or ()).all()
+    details = [row[-1] for row in plan]
+    # "SCAN trash_post USING INDEX ..." walks an index in order; a bare "SCAN trash_post" reads every row.
+    return [d for d in details if any(d == f'SCAN {table}' or d.startswith(f'SCAN {table} ') and 'USING' not in d for table in HOT_TABLES)]
+
+
+def assert_indexed(app, run):
+    # EXPLAINs exactly what the code under test sent to the database, with the same parameters.
+    with count_queries() as counter:
+        run()
+    with app.app_context():
+        for statement, parameters in zip(counter.statements, counter.parameters):
+            if statement.lstrip().split(' ', 1)[0].upper() in ('SELECT', 'UPDATE', 'DELETE', 'INSERT', 'WITH'):
+                scans = full_scans(statement, parameters)
+                assert not scans, f'{scans} in:\n{statement}'
+
+
+@pytest.fixture
+def site(app):
+    with app.app_context():
+        make_user('admin', is_admin=True)
+        seller, buyer = make_user('seller'), make_user('buyer', user_type='collector')
+        bidder = make_user('bidder', user_type='collector')
+        old = [make_post(seller, google_map_link=MAP_LINK) for _ in range(3)]
+        for post_id in old:
+            sell(post_id, buyer)
+        # Pushed far enough into the past that archive.run() moves them.
+        archive.run(now=datetime.utcnow() + timedelta(days=365))
+        sold = make_post(seller, google_map_link=MAP_LINK)
+        sell(sold, buyer)
+        open_post = make_post(seller, google_map_link=MAP_LINK)
+    clients = {name: login(app.test_client(), name) for name in ('admin', 'seller', 'buyer', 'bidder')}
+    clients['anonymous'] = app.test_client()
+    return {'clients': clients, 'archived': old[0], 'sold': sold, 'open': open_post}
+
+
+ROUTES = [
+    ('anonymous', 'GET', '/posts'),
+    ('anonymous', 'GET', '/posts?query=plastic'),
+    ('anonymous', 'GET', '/post/{open}'),
+    ('anonymous', 'GET', '/post/{sold}'),
+    ('anonymous', 'GET', '/post/{archived}'),
+    ('anonymous', 'GET', '/api/v1/posts'),
+    ('anonymous', 'GET', '/api/v1/posts/{archived}'),
+    ('seller', 'GET', '/dashboard'),
+    ('buyer', 'GET', '/collector/dashboard'),
+    ('buyer', 'GET', '/collector/dashboard?lat=23.8&lon=90.36'),
+    ('buyer', 'GET', '/collector/dashboard?lat=23.8&lon=90.36&radius=5'),
+    ('bidder', 'POST', '/post/{open}/offer'),
+    ('seller', 'POST', '/post/{sold}/review'),
+    ('buyer', 'POST', '/post/{archived}/review'),
+    ('admin', 'GET', '/admin/dashboard'),
+    ('admin', 'GET', '/admin/users'),
+    ('admin', 'GET', '/admin/users?sort=username&dir=asc&per_page=1'),
+    ('admin', 'GET', '/admin/users?q=sel'),
+    ('admin', 'GET', '/admin/users?q=seller@'),
+    ('admin', 'GET', '/admin/reports?period=week&dimension=seller'),
+    ('admin', 'GET', '/admin/export/transactions.csv?start=2020-01-01'),
+]
+FORMS = {
+    'offer': {'final_weight': '100', 'final_price_per_kg': '11.00'},
+    'review': {'rating': '5', 'comment': 'on time'},
+}
+
+
+@pytest.mark.parametrize('user, method, path', ROUTES)
+def test_route_queries_use_indexes(app, site, user, method, path):
+    client, url = site['clients'][user], path.format(**site)
+    data = FORMS.get(url.rsplit('/', 1)[-1]) if method == 'POST' else None
+    if user == 'admin' and '/users?' in url and 'per_page=1' in url:
+        # Follow the cursor so the keyset "next page" predicate is exercised as well.
+        url += '&cursor=' + re.search(r'cursor=([^"&]+)', client.get(url).get_data(as_text=True)).group(1)
+
+    def run():
+        response = client.open(url, method=method, data=data)
+        assert response.status_code in (200, 302), (url, response.status_code)
+        assert '/login' not in response.headers.get('Location', '')
+        response.get_data()
+    assert_indexed(app, run)
+
+
+def test_seller_offer_decisions_use_indexes(app, site):
+    for collector in ('buyer', 'bidder'):
+        site['clients'][collector].post(f"/post/{site['open']}/offer", data=FORMS['offer'])
+    with app.app_context():
+        first, second = db.session.scalars(db.select(Offer.id).filter_by(post_id=site['open'], status='pending').order_by(Offer.id)).all()
+    seller = site['clients']['seller']
+    assert_indexed(app, lambda: seller.post(f'/offer/{first}/reject'))
+    assert_indexed(app, lambda: seller.post(f'/offer/{second}/accept'))
+
+
+def test_archive_job_uses_indexes(app, site):
+    def run():
+        with app.app_context():
+            archive.run(now=datetime.combine(date.today(), datetime.min.time()) + timedelta(days=365))
+    assert_indexed(app, run)
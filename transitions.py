@@ -0,0 +1,163 @@
+from datetime import datetime, timedelta
+from decimal import Decimal
+from flask import current_app
+from app import db
+from models import User, TrashPost, Offer
+from identity import identity_cache
+import search
+import stats
+
+PLATFORM_FEE = Decimal('0.10')
+
+# status -> statuses it may move to; bids live in Offer, so a post stays available until one is accepted.
+TRANSITIONS = {
+    'available': ('completed', 'expired'),
+    'completed': (),
+    'expired': (),
+}
+
+
+class TransitionError(Exception):
+    pass
+
+
+def compare_and_set(post_id, expected, new_status, guards=None, returning=(), **values):
+    if new_status not in TRANSITIONS.get(expected, ()):
+        raise TransitionError(f'{expected} -> {new_status} is not a valid post transition')
+
+    # The WHERE clause is the lock: only one writer can see the expected status and win.
+    stmt = db.update(TrashPost).where(TrashPost.id == post_id, TrashPost.status == expected)
+    for column, value in (guards or {}).items():
+        stmt = stmt.where(getattr(TrashPost, column) == value)
+    stmt = stmt.values(status=new_status, **values).execution_options(synchronize_session=False)
+    if returning:
+        stmt = stmt.returning(*returning)
+        row = db.session.execute(stmt).first()
+        won = row is not None
+    else:
+        row = None
+        won = db.session.execute(stmt).rowcount == 1
+
+    if won:
+        search.reindex_post(post_id)
+    return row if returning else won
+
+
+def place_offer(post, collector_id, weight, price_per_kg):
+    now = datetime.utcnow()
+    ttl = current_app.config.get('OFFER_TTL_HOURS', 72)
+    values = {
+        'weight_kg': weight,
+        'price_per_kg': price_per_kg,
+        'total_value': Decimal(weight) * price_per_kg,
+        'created_at': now,
+        'expires_at': now + timedelta(hours=ttl) if ttl else None,
+    }
+
+    # Insert only while the post is still open, so no bid can land on a post that just sold. A bid buys the
+    # whole lot: the post records one buyer's sale, so a bid for part of it would leave the rest unsellable.
+    columns = ['post_id', 'collector_id', 'status'] + list(values)
+    source = db.select(
+        db.literal(post.id), db.literal(collector_id), db.literal('pending'),
+        *[db.literal(value, type_=Offer.__table__.c[name].type) for name, value in values.items()]
+    ).where(db.exists().where(TrashPost.id == post.id, TrashPost.status == 'available', TrashPost.quantity == weight))
+    offer_id = db.session.execute(db.insert(Offer).from_select(columns, source).returning(Offer.id)).scalar()
+    if offer_id is None:
+        return False
+
+    # A collector holds at most one open bid per post. Bidding again replaces the row rather than editing it,
+    # so an accept the seller aimed at the old terms finds nothing pending instead of taking the new price.
+    db.session.execute(
+        db.update(Offer).where(
+            Offer.post_id == post.id, Offer.collector_id == collector_id, Offer.status == 'pending', Offer.id != offer_id
+        ).values(status='superseded', decided_at=now).execution_options(synchronize_session=False)
+    )
+    TrashPost.touch(post.id)
+    return True
+
+
+def accept_offer(post, offer_id):
+    now = datetime.utcnow()
+    offer = db.session.execute(
+        db.update(Offer).where(Offer.id == offer_id, Offer.post_id == post.id, Offer.open_filter(now))
+        .values(status='accepted', decided_at=now)
+        .returning(Offer.collector_id, Offer.weight_kg, Offer.price_per_kg, Offer.total_value)
+        .execution_options(synchronize_session=False)
+    ).first()
+    if offer is None:
+        return False
+
+    total = Decimal(offer.total_value)
+    profit = total * PLATFORM_FEE
+    # The quantity guard catches a seller who changed the lot after this bid was placed.
+    completed = compare_and_set(
+        post.id, 'available', 'completed', guards={'quantity': offer.weight_kg},
+        collector_id=offer.collector_id,
+        final_weight_kg=offer.weight_kg,
+        final_price_per_kg=offer.price_per_kg,
+        total_transaction_value=total,
+        platform_profit=profit,
+        completed_at=now
+    )
+    if not completed:
+        return False
+
+    close_offers(post.id, now)
+    db.session.execute(
+        db.update(User).where(User.id == post.user_id)
+        .values(total_earnings=db.func.coalesce(User.total_earnings, 0) + (total - profit))
+        .execution_options(synchronize_session=False)
+    )
+    identity_cache.invalidate_on_commit(db.session, post.user_id)
+    stats.record_transaction(post, offer.collector_id, offer.weight_kg, total, profit, now)
+    return True
+
+
+def close_offers(post_id, now=None):
+    # Every open bid on the post is closed by one statement rather than row by row.
+    return db.session.execute(
+        db.update(Offer).where(Offer.post_id == post_id, Offer.status == 'pending')
+        .values(status='closed', decided_at=now or datetime.utcnow()).execution_options(synchronize_session=False)
+    ).rowcount
+
+
+def reject_offer(post, offer_id):
+    rejected = db.session.execute(
+        db.update(Offer).where(Offer.id == offer_id, Offer.post_id == post.id, Offer.status == 'pending')
+        .values(status='rejected', decided_at=datetime.utcnow()).execution_options(synchronize_session=False)
+    ).rowcount == 1
+    if rejected:
+        TrashPost.touch(post.id)
+    return rejected
+
+
+def expire_offers(now=None):
+    now = now or datetime.utcnow()
+    expiring = (Offer.status == 'pending', Offer.expires_at <= now)
+    # The bid summary on each affected post changes, so its validator has to move too.
+    db.session.execute(
+        db.update(TrashPost).where(TrashPost.id.in_(db.select(Offer.post_id).where(*expiring)))
+        .values(updated_at=now).execution_options(synchronize_session=False)
+    )
+    return db.session.execute(
+        db.update(Offer).where(*expiring).values(status='expired').execution_options(synchronize_session=False)
+    ).rowcount
+
+
+def expire_posts(post_ids, now=None, untouched_since=None):
+    now = now or datetime.utcnow()
+    condition = [TrashPost.id.in_(post_ids), TrashPost.status == 'available']
+    if untouched_since is not None:
+        # A bid or edit that lands after the post was picked keeps it alive.
+        condition.append(TrashPost.updated_at < untouched_since)
+    expiring = db.select(TrashPost.id).where(*condition)
+    db.session.execute(
+        db.update(Offer).where(Offer.post_id.in_(expiring), Offer.status == 'pending')
+        .values(status='expired', decided_at=now).execution_options(synchronize_session=False)
+    )
+    expired = db.session.execute(
+        db.update(TrashPost).where(*condition)
+        .values(status='expired', updated_at=now).execution_options(synchronize_session=False)
+    ).rowcount
+    search.reindex_posts(post_ids)
+    return expired
@@ -0,0 +1,141 @@
+import hashlib
+import os
+import threading
+from flask import abort, current_app, redirect, send_file, url_for
+from markupsafe import Markup, escape
+from werkzeug.security import safe_join
+from images import DEFAULT_IMAGE, PENDING_IMAGE, output_format
+from metrics import time_image
+
+VARIANT_WIDTHS = (200, 400, 800)
+ONE_YEAR = 365 * 24 * 3600
+
+_digests = {}
+_lock = threading.Lock()
+_cache_bytes = None
+
+
+def _source_path(image_file):
+    # Archived posts keep their pictures in the cold folder; variants are served from either.
+    for folder in (current_app.config['UPLOAD_FOLDER'], current_app.config.get('COLD_UPLOAD_FOLDER')):
+        path = safe_join(folder, image_file) if folder else None
+        if path is not None and os.path.isfile(path):
+            return path
+    return None
+
+
+def content_digest(path):
+    stat = os.stat(path)
+    key = (stat.st_mtime_ns, stat.st_size)
+    cached = _digests.get(path)
+    if cached and cached[0] == key:
+        return cached[1]
+    sha = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(65536), b''):
+            sha.update(chunk)
+    digest = sha.hexdigest()[:16]
+    _digests[path] = (key, digest)
+    return digest
+
+
+def _variant_folder():
+    return current_app.config['IMAGE_VARIANT_FOLDER']
+
+
+def _folder_size(folder):
+    return sum(entry.stat().st_size for entry in os.scandir(folder) if entry.is_file())
+
+
+def _enforce_cap(added, keep):
+    global _cache_bytes
+    folder = _variant_folder()
+    cap = current_app.config['IMAGE_VARIANT_CACHE_BYTES']
+    with _lock:
+        if _cache_bytes is None:
+            _cache_bytes = _folder_size(folder)
+        else:
+            _cache_bytes += added
+        if _cache_bytes <= cap:
+            return
+        # Serving a variant touches its mtime, so the oldest mtime is the least recently used.
+        entries = sorted((e for e in os.scandir(folder) if e.is_file()), key=lambda e: e.stat().st_mtime)
+        total = sum(e.stat().st_size for e in entries)
+        for entry in entries:
+            if total <= cap * 0.9:
+                break
+            if entry.path == keep:
+                continue
+            try:
+                size = entry.stat().st_size
+                os.remove(entry.path)
+                total -= size
+            except OSError:
+                pass
+        _cache_bytes = total
+
+
+def _render_variant(source, target, width):
+    from PIL import Image
+
+    fmt, _, options = output_format()
+    with Image.open(source) as image:
+        image = image.convert('RGB') if image.mode not in ('RGB', 'L') else image.copy()
+        image.thumbnail((width, width), Image.LANCZOS)
+        tmp = f'{target}.{threading.get_ident()}.tmp'
+        image.save(tmp, fmt, **options)
+    os.replace(tmp, target)
+    return os.path.getsize(target)
+
+
+def serve_variant(width, digest, filename):
+    if width not in VARIANT_WIDTHS:
+        abort(404)
+    source = _source_path(filename)
+    if source is None:
+        abort(404)
+    current = content_digest(source)
+    if current != digest:
+        # The URL names an older version of the file; send the client to the current one.
+        return redirect(url_for('image_variant', width=width, digest=current, filename=filename), code=301)
+
+    _, ext, _ = output_format()
+    target = os.path.join(_variant_folder(), f'{digest}_{width}{ext}')
+    if os.path.exists(target):
+        os.utime(target)
+    else:
+        with time_image('variant'):
+            added = _render_variant(source, target, width)
+        _enforce_cap(added, keep=target)
+
+    response = send_file(target, etag=f'{digest}-{width}', conditional=True, max_age=ONE_YEAR)
+    response.cache_control.public = True
+    response.cache_control.immutable = True
+    return response
+
+
+def variant_url(image_file, width):
+    source = _source_path(image_file)
+    if source is None:
+        return url_for('static', filename='post_pics/' + image_file)
+    return url_for('image_variant', width=width, digest=content_digest(source), filename=image_file)
+
+
+def responsive_image(image_file, alt='', sizes='100vw', default_width=400, **attrs):
+    if image_file in (PENDING_IMAGE, DEFAULT_IMAGE) or _source_path(image_file) is None:
+        return Markup('')
+    srcset = ', '.join(f'{variant_url(image_file, width)} {width}w' for width in VARIANT_WIDTHS)
+    extra = ''.join(f' {escape(name.rstrip("_"))}="{escape(value)}"' for name, value in attrs.items())
+    return Markup(
+        f'<img src="{escape(variant_url(image_file, default_width))}" srcset="{escape(srcset)}" '
+        f'sizes="{escape(sizes)}" alt="{escape(alt)}" loading="lazy" decoding="async"{extra} />'
+    )
+
+
+def init_image_variants(app):
+    app.config.setdefault('IMAGE_VARIANT_FOLDER', os.path.join(app.instance_path, 'image_variants'))
+    app.config.setdefault('IMAGE_VARIANT_CACHE_BYTES', 256 * 1024 * 1024)
+    os.makedirs(app.config['IMAGE_VARIANT_FOLDER'], exist_ok=True)
+    app.add_url_rule('/img/<int:width>/<digest>/<path:filename>', 'image_variant', serve_variant)
+    app.add_template_global(responsive_image)
+    app.add_template_global(variant_url)